@@ -0,0 +1,256 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Executor
+from contextlib import asynccontextmanager
+
+# Admission control in front of the upstream transcription API: each client
+# draws from its own token bucket (429 when it is empty), and upstream calls
+# share a global number of in-flight slots with a bounded, deadline-limited
+# wait queue behind them (503 when that overflows). Both fail fast with a
+# Retry-After instead of letting one client's burst queue up everyone else.
+# BoundedExecutor does the same for CPU work (parsing): a bounded queue in
+# front of a fixed pool, shedding requests that would miss their deadline.
+
+
+class AdmissionRejected(Exception):
+    """The request was not admitted; status_code is 429 or 503."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float | None = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, cost: float = 1.0) -> float:
+        """Take `cost` tokens; 0.0 on success, else seconds until they are
+        available (nothing is taken)."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        cost = min(cost, self.burst)  # a request bigger than the bucket waits for a full one
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """Per-client rate limits plus a global cap on in-flight upstream calls.
+    Not thread-safe; use it from the event loop.
+
+    check_rate() charges the client's bucket (`rate` per second, `burst`
+    at most; rate 0 turns it off); buckets for the least recently seen
+    clients are dropped past `max_clients`. slot() holds one of
+    `max_in_flight` upstream slots; when none is free the caller waits, but
+    at most `max_queue` callers wait and none longer than `queue_timeout`.
+    """
+
+    def __init__(self, rate: float = 0.0, burst: float = 20.0, max_in_flight: int = 32,
+                 max_queue: int = 64, queue_timeout: float = 10.0, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_clients = max_clients
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.admitted = 0
+        self.rate_limited = 0
+        self.queue_full = 0
+        self.queue_timeouts = 0
+        self._wait_seconds = 0.0
+        self._hold_seconds = 0.0
+
+    def check_rate(self, client: str, cost: float = 1.0):
+        if not self.rate:
+            return
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.rate, self.burst)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(client)
+        wait = bucket.take(cost)
+        if wait:
+            self.rate_limited += 1
+            raise AdmissionRejected(429, "Rate limit exceeded for this client", retry_after=wait)
+
+    def _retry_after(self) -> float:
+        # Roughly how long the queue ahead takes to drain at the average hold time
+        average = self._hold_seconds / self.admitted if self.admitted else 1.0
+        return max(1.0, average * (self.waiting + 1) / self.max_in_flight)
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._slots.locked():
+            if self.waiting >= self.max_queue:
+                self.queue_full += 1
+                raise AdmissionRejected(503, "Too many transcriptions waiting", self._retry_after())
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            start = time.monotonic()
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.queue_timeouts += 1
+                raise AdmissionRejected(
+                    503, "Timed out waiting for a transcription slot", self._retry_after()
+                ) from None
+            finally:
+                self.waiting -= 1
+                self._wait_seconds += time.monotonic() - start
+        else:
+            await self._slots.acquire()
+
+        self.in_flight += 1
+        self.admitted += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._hold_seconds += time.monotonic() - start
+            self.in_flight -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_waiting,
+            "admitted": self.admitted,
+            "rejected": {
+                "rate_limited": self.rate_limited,
+                "queue_full": self.queue_full,
+                "queue_timeout": self.queue_timeouts,
+            },
+            "avg_queue_wait_ms": self._wait_seconds / self.admitted * 1000 if self.admitted else 0.0,
+            "clients": len(self._buckets),
+        }
+
+
+# ── Bounded Executor ───────────────────────────────────────────────────────────
+
+def _timed(fn, *args):
+    # Runs in the pool (thread or process); CLOCK_MONOTONIC is system-wide
+    started = time.monotonic()
+    result = fn(*args)
+    return started, time.monotonic(), result
+
+
+def _percentile(samples, p: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class BoundedExecutor:
+    """Runs blocking calls on `executor` (`workers` wide) with at most
+    `max_queue` calls waiting behind the running ones.
+
+    run() answers 503 right away when the queue is full or when the queue
+    wait predicted from its depth and recent execution times would exceed
+    `deadline`, and gives up on a call still queued at its deadline. Time
+    spent queued and time spent executing are recorded separately, and passed
+    to `observer(queue_wait, exec_time)` when one is given.
+    """
+
+    def __init__(self, executor: Executor, workers: int, max_queue: int = 64,
+                 deadline: float = 2.0, window: int = 1000, observer=None):
+        self.executor = executor
+        self.observer = observer
+        self.workers = workers
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.pending = 0  # queued + running
+        self.avg_exec = None  # EWMA of shed-able calls, seconds
+        self._waits = deque(maxlen=window)
+        self._execs = deque(maxlen=window)
+        self.completed = 0
+        self.queue_full = 0
+        self.predicted_late = 0
+        self.expired = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.pending - self.workers)
+
+    def _predicted_wait(self) -> float:
+        if self.avg_exec is None or self.pending < self.workers:
+            return 0.0
+        return (self.queue_depth + 1) / self.workers * self.avg_exec
+
+    async def run(self, fn, *args, shed: bool = True):
+        """`fn(*args)` on the pool. With shed=False the call is never
+        rejected or expired (for work that must finish, e.g. after an
+        upstream transcription was already paid for)."""
+        if shed:
+            if self.queue_depth >= self.max_queue:
+                self.queue_full += 1
+                raise AdmissionRejected(503, "Parse queue full", max(1.0, self._predicted_wait()))
+            # Only the wait is predicted: with a worker free a call always gets
+            # in, so one slow call cannot push avg_exec past the deadline and
+            # lock the pool out while it sits idle
+            predicted = self._predicted_wait()
+            if self.deadline and predicted > self.deadline:
+                self.predicted_late += 1
+                raise AdmissionRejected(503, "Parse queue too long to meet the deadline", max(1.0, predicted))
+
+        submitted = time.monotonic()
+        future = self.executor.submit(_timed, fn, *args)
+        self.pending += 1
+        try:
+            waiter = asyncio.wrap_future(future)
+            if shed and self.deadline:
+                done, _ = await asyncio.wait({waiter}, timeout=self.deadline)
+                if not done and future.cancel():
+                    # Still queued at the deadline; running calls are let finish
+                    self.expired += 1
+                    raise AdmissionRejected(503, "Parse deadline exceeded in queue", self._predicted_wait() or 1.0)
+            started, finished, result = await waiter
+        finally:
+            self.pending -= 1
+
+        wait, exec_time = max(0.0, started - submitted), finished - started
+        self._waits.append(wait)
+        self._execs.append(exec_time)
+        if self.observer is not None:
+            self.observer(wait, exec_time)
+        self.completed += 1
+        if shed:
+            self.avg_exec = exec_time if self.avg_exec is None else 0.8 * self.avg_exec + 0.2 * exec_time
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "deadline_ms": self.deadline * 1000,
+            "completed": self.completed,
+            "rejected": {
+                "queue_full": self.queue_full,
+                "predicted_late": self.predicted_late,
+                "expired_in_queue": self.expired,
+            },
+            "queue_wait_ms": {f"p{p}": _percentile(self._waits, p) * 1000 for p in (50, 95, 99)},
+            "exec_ms": {f"p{p}": _percentile(self._execs, p) * 1000 for p in (50, 95, 99)},
+            "avg_exec_ms": self.avg_exec * 1000 if self.avg_exec is not None else None,
+        }
@@ -0,0 +1,228 @@
+import io
+import struct
+import time
+import wave
+
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+
+# NumPy is optional — without it uploads are sent to the API unchanged
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Whisper works on 16 kHz mono internally, so browser recordings (often
+# 44.1/48 kHz stereo, float or 24-bit) are converted before upload instead of
+# paying to send samples the model throws away.
+
+TARGET_RATE = 16000
+FRAME_SECONDS = 0.02          # silence detection frame
+SILENCE_FLOOR_DB = -50.0      # frames below this (dBFS) are silence...
+SILENCE_RELATIVE_DB = -40.0   # ...as are frames this far below the loudest one
+SILENCE_PAD_SECONDS = 0.2     # kept around the speech that remains
+
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_FLOAT = 3
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# What a truncated or nonsensical RIFF/WAVE header can raise while decoding
+_MALFORMED_WAV = (struct.error, wave.Error, ValueError, EOFError)
+
+
+def _read_wav(data: bytes):
+    """(samples as float32 [frames, channels], sample rate), or None when
+    `data` is not PCM/float WAV."""
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+
+    fmt = None
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id, size = struct.unpack_from("<4sI", data, pos)
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            fmt = struct.unpack_from("<HHIIHH", data, body)
+            if fmt[0] == _WAVE_FORMAT_EXTENSIBLE and size >= 40:
+                # Real format code is the first two bytes of the SubFormat GUID
+                fmt = (struct.unpack_from("<H", data, body + 24)[0],) + fmt[1:]
+        elif chunk_id == b"data" and fmt is not None:
+            # A streaming writer leaves 0 (or 0xFFFFFFFF) as a placeholder
+            # size; the samples then run to the end of the file
+            end = body + size if size and body + size <= len(data) else len(data)
+            pcm = data[body:end]
+            break
+        pos = body + size + (size & 1)
+    else:
+        return None
+
+    format_code, channels, rate, _, block_align, bits = fmt
+    if channels <= 0 or rate <= 0 or bits < 8 or block_align != channels * (bits // 8):
+        return None
+    pcm = pcm[:len(pcm) - len(pcm) % block_align]
+    if not pcm:
+        return None  # nothing to convert; send the original
+
+    if format_code == _WAVE_FORMAT_FLOAT and bits in (32, 64):
+        samples = np.frombuffer(pcm, dtype=f"<f{bits // 8}").astype(np.float32)
+    elif format_code == _WAVE_FORMAT_PCM and bits == 8:
+        samples = (np.frombuffer(pcm, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif format_code == _WAVE_FORMAT_PCM and bits in (16, 32):
+        samples = np.frombuffer(pcm, dtype=f"<i{bits // 8}").astype(np.float32) / 2 ** (bits - 1)
+    elif format_code == _WAVE_FORMAT_PCM and bits == 24:
+        raw = np.frombuffer(pcm, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        samples = ints.astype(np.float32) / 2 ** 23
+    else:
+        return None
+
+    return samples.reshape(-1, channels), rate
+
+
+def _resample(mono, rate: int, target: int):
+    """Band-limited resampling through the FFT: the spectrum is cut at the new
+    Nyquist frequency, which is also the anti-aliasing filter."""
+    n_out = round(len(mono) * target / rate)
+    if n_out < 2 or len(mono) < 2:
+        return mono[:n_out]
+    spectrum = np.fft.rfft(mono)[:n_out // 2 + 1]
+    return np.fft.irfft(spectrum, n_out).astype(np.float32) * np.float32(n_out / len(mono))
+
+
+def _trim_silence(mono, rate: int):
+    frame = max(1, int(rate * FRAME_SECONDS))
+    n_frames = len(mono) // frame
+    if not n_frames:
+        return mono
+    frames = mono[:n_frames * frame].reshape(n_frames, frame)
+    rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))
+    level = 20 * np.log10(np.maximum(rms, 1e-10))
+    threshold = max(SILENCE_FLOOR_DB, level.max() + SILENCE_RELATIVE_DB)
+
+    voiced = np.flatnonzero(level > threshold)
+    if not len(voiced):
+        return mono
+    pad = int(rate * SILENCE_PAD_SECONDS)
+    start = max(0, voiced[0] * frame - pad)
+    end = min(len(mono), (voiced[-1] + 1) * frame + pad)
+    return mono[start:end]
+
+
+def _encode_wav(mono, rate: int) -> bytes:
+    pcm = (np.clip(mono, -1.0, 1.0) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def preprocess_wav(data: bytes, trim_silence: bool = True) -> bytes | None:
+    """16 kHz (or lower, never upsampled) mono 16-bit WAV version of `data`
+    with leading/trailing silence trimmed. None when `data` is not a WAV this
+    can read, or the result would not be smaller."""
+    if np is None:
+        return None
+    decoded = _read_wav(data)
+    if decoded is None:
+        return None
+    samples, rate = decoded
+
+    mono = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+    if rate > TARGET_RATE:
+        mono = _resample(mono, rate, TARGET_RATE)
+        rate = TARGET_RATE
+    if trim_silence:
+        mono = _trim_silence(mono, rate)
+
+    encoded = _encode_wav(mono, rate)
+    return encoded if len(encoded) < len(data) else None
+
+
+def preprocess_upload(upload: UploadFile, trim_silence: bool = True) -> tuple[UploadFile, dict]:
+    """Replace a WAV upload with its preprocessed version when that is
+    smaller. Returns the upload to send and a report of bytes and time.
+    Blocking; run it off the event loop."""
+    start = time.perf_counter()
+    f = upload.file
+    f.seek(0)
+    header = f.read(12)
+    f.seek(0)
+    report = {"bytes_in": None, "bytes_out": None, "preprocess_ms": 0.0}
+    if np is None or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        return upload, report
+
+    data = f.read()
+    f.seek(0)
+    try:
+        converted = preprocess_wav(data, trim_silence)
+    except _MALFORMED_WAV:
+        # A broken header goes upstream untouched, as it did before preprocessing
+        return upload, report
+    report["bytes_in"] = len(data)
+    report["bytes_out"] = len(converted) if converted is not None else len(data)
+    report["preprocess_ms"] = (time.perf_counter() - start) * 1000
+    if converted is None:
+        return upload, report
+
+    name = upload.filename or "audio.wav"
+    if not name.lower().endswith(".wav"):
+        name += ".wav"
+    prepared = UploadFile(
+        io.BytesIO(converted), size=len(converted), filename=name,
+        headers=Headers({"content-type": "audio/wav"}),
+    )
+    return prepared, report
+
+
+# ── Chunking ───────────────────────────────────────────────────────────────────
+
+def _frame_levels(mono, frame: int):
+    n_frames = len(mono) // frame
+    frames = mono[:n_frames * frame].reshape(n_frames, frame)
+    return np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))
+
+
+def split_wav(data: bytes, chunk_seconds: float = 30.0, overlap_seconds: float = 1.0,
+              search_seconds: float = 5.0) -> list[bytes] | None:
+    """Split a long WAV into mono 16-bit chunks of at most about
+    `chunk_seconds`, cut at the quietest frame in the last `search_seconds`
+    before each boundary. Neighbouring chunks share `overlap_seconds` of audio
+    on each side of a cut so no word is lost. None when `data` is not a
+    readable WAV or is short enough to send whole."""
+    if np is None or not chunk_seconds:
+        return None
+    try:
+        decoded = _read_wav(data)
+    except _MALFORMED_WAV:
+        return None
+    if decoded is None:
+        return None
+    samples, rate = decoded
+    if len(samples) <= chunk_seconds * rate:
+        return None
+
+    mono = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+    frame = max(1, int(rate * FRAME_SECONDS))
+    chunk = int(chunk_seconds * rate)
+    if chunk <= frame:
+        return None  # every cut must move forward, or the loop below never ends
+    levels = _frame_levels(mono, frame)
+    search = min(int(search_seconds * rate), chunk // 2)
+
+    cuts = [0]
+    while len(mono) - cuts[-1] > chunk:
+        lo = (cuts[-1] + chunk - search) // frame
+        hi = (cuts[-1] + chunk) // frame
+        quietest = lo + int(np.argmin(levels[lo:hi])) if hi > lo else hi
+        cuts.append(quietest * frame + frame // 2)
+    cuts.append(len(mono))
+
+    overlap = int(overlap_seconds * rate)
+    return [
+        _encode_wav(mono[max(0, start - overlap):min(len(mono), end + overlap)], rate)
+        for start, end in zip(cuts, cuts[1:])
+    ]
@@ -0,0 +1,452 @@
+import asyncio
+import csv
+import io
+import multiprocessing
+import os
+import re
+import shutil
+import statistics
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+import numpy as np
+from fastapi import UploadFile
+
+# Run from backend/ so the parser resolves ./output/model-best the same way the API does
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+from parser import (
+    _PATTERNS,
+    FALLBACK_MODEL,
+    MODEL_PATH,
+    _prune_to_ner,
+    cache_stats,
+    configure_result_cache,
+    init_worker,
+    load_model,
+    parse_workout_text,
+    parse_workout_texts,
+)
+from audio import preprocess_wav, split_wav
+from transcription import GroqTranscriber, HedgedTranscriber, transcribe_chunks, transcribe_upload
+
+
+def load_csv_inputs(csv_path="data/comprehensive_training_dataset_randomized_900.csv"):
+    """Return the coach inputs from the training CSV."""
+    with open(csv_path, "r", encoding="utf-8") as f:
+        return [row["Coach Input"] for row in csv.DictReader(f)]
+
+
+def bench_parse(texts, rounds=5):
+    """Parse every text `rounds` times and return the best parses/sec."""
+    best = 0.0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for text in texts:
+            parse_workout_text(text)
+        elapsed = time.perf_counter() - start
+        best = max(best, len(texts) / elapsed)
+    return best
+
+
+# Squad message: 2 athletes × 3 days → 6 assignments from one input
+FANOUT_TEXT = ("Ravi and Neha both need to run 8km Monday Wednesday Friday at 6am, "
+               "easy 5:30/km pace, heart rate below 150, bring water bottle, no excuses")
+SINGLE_TEXT = "Ravi needs to run 8km Monday at 6am, easy 5:30/km pace, heart rate below 150"
+
+
+def bench_fanout(rounds=2000):
+    """Compare the cost of a 6-assignment squad message to a single assignment."""
+    results = {}
+    for label, text in (("single", SINGLE_TEXT), ("fan-out", FANOUT_TEXT)):
+        n_assignments = len(parse_workout_text(text)["assignments"])
+        start = time.perf_counter()
+        for _ in range(rounds):
+            parse_workout_text(text)
+        per_parse = (time.perf_counter() - start) / rounds * 1e6
+        results[label] = (n_assignments, per_parse)
+    return results
+
+
+_SCAN_METHODS = {"search", "match", "fullmatch", "finditer", "findall", "split", "sub"}
+
+
+def count_regex_scans(texts):
+    """Average number of regex scans (compiled-pattern calls) per parse."""
+    calls = 0
+
+    def profiler(frame, event, arg):
+        nonlocal calls
+        if event == "c_call" and isinstance(getattr(arg, "__self__", None), re.Pattern):
+            if arg.__name__ in _SCAN_METHODS:
+                calls += 1
+
+    sys.setprofile(profiler)
+    try:
+        for text in texts:
+            parse_workout_text(text)
+    finally:
+        sys.setprofile(None)
+    return calls / len(texts)
+
+
+def bench_ner_latency(model, texts, rounds=1):
+    """Per-text latency of model(text) in ms: (mean, p50, p95)."""
+    for text in texts[:20]:
+        model(text)
+    samples = []
+    for _ in range(rounds):
+        for text in texts:
+            start = time.perf_counter()
+            model(text)
+            samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.fmean(samples), samples[len(samples) // 2], samples[int(len(samples) * 0.95)]
+
+
+def bench_models(texts, rounds=1):
+    """NER latency of the custom and generic models, full pipeline vs ner-only."""
+    import spacy
+
+    results = []
+    for label, name in (("custom", MODEL_PATH), ("generic", FALLBACK_MODEL)):
+        try:
+            model = spacy.load(name)
+        except OSError:
+            results.append((label, None, None))
+            continue
+        results.append((label, "full: " + "+".join(model.pipe_names), bench_ner_latency(model, texts, rounds)))
+        _prune_to_ner(model)
+        results.append((label, "ner-only: " + "+".join(model.pipe_names), bench_ner_latency(model, texts, rounds)))
+    return results
+
+
+def bench_workers(texts, workers, rounds=1):
+    """Best texts/sec with one /parse-style task per text over `workers` processes."""
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(True, 0),
+    ) as pool:
+        # Start every worker and wait for its model before timing
+        for future in [pool.submit(time.sleep, 0.2) for _ in range(workers)]:
+            future.result()
+        best = 0.0
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in pool.map(parse_workout_text, texts, chunksize=1):
+                pass
+            best = max(best, len(texts) / (time.perf_counter() - start))
+    return best
+
+
+def run_upload(rounds):
+    for mb in (1, 8, 24):
+        size = mb * 1024 * 1024
+        print(f"/transcribe upload of {mb} MB, mean of {rounds} requests...")
+        for label, (peak, read, written, elapsed) in bench_upload(size, rounds).items():
+            print(f"  {label:10} peak heap {peak / 1024:8,.0f} KiB, read {read / 1048576:5.1f} MiB, "
+                  f"written {written / 1048576:5.1f} MiB, {elapsed * 1000:6.1f} ms")
+
+
+def _browser_wav(seconds=10.0, rate=48000, lead_silence=1.5, trail_silence=2.0):
+    """Stereo float32 WAV like a browser recording: a voice-band signal with
+    silence (plus a little noise) before and after."""
+    rng = np.random.default_rng(0)
+    n = int(seconds * rate)
+    t = np.arange(n) / rate
+    voice = (0.3 * np.sin(2 * np.pi * 180 * t) + 0.2 * np.sin(2 * np.pi * 900 * t)
+             + 0.1 * np.sin(2 * np.pi * 2400 * t)) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+    voice[:int(lead_silence * rate)] = 0
+    voice[n - int(trail_silence * rate):] = 0
+    voice += rng.normal(0, 1e-4, n)
+    pcm = np.stack([voice, voice * 0.9], axis=1).astype("<f4").tobytes()
+    fmt = struct.pack("<HHIIHH", 3, 2, rate, rate * 8, 8, 32)
+    return (b"RIFF" + struct.pack("<I", 36 + len(pcm)) + b"WAVE" + b"fmt " + struct.pack("<I", 16) + fmt
+            + b"data" + struct.pack("<I", len(pcm)) + pcm)
+
+
+def run_audio(rounds):
+    uplinks = (2, 10, 50)  # Mbit/s
+    for seconds in (5, 15, 60):
+        data = _browser_wav(seconds)
+        times = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            out = preprocess_wav(data)
+            times.append((time.perf_counter() - start) * 1000)
+        saved = len(data) - len(out)
+        print(f"{seconds:2} s 48 kHz stereo float WAV: {len(data) / 1e6:5.2f} MB → {len(out) / 1e6:5.2f} MB "
+              f"({saved / len(data):.0%} saved), preprocess {min(times):.1f} ms")
+        gains = ", ".join(f"{bw} Mbit/s {saved * 8 / (bw * 1e6) * 1000 - min(times):,.0f} ms" for bw in uplinks)
+        print(f"   upload leg gain net of preprocessing: {gains}")
+
+
+def bench_chunked(seconds, rtf, concurrency, chunk_seconds=30.0):
+    """Wall-clock seconds to transcribe `seconds` of audio whole and chunked,
+    against stub_transcriber.py (in-process) answering after rtf × duration."""
+    import stub_transcriber
+
+    stub_transcriber.control.update(rtf=rtf, latency_ms=0, fail_rate=0)
+    data = preprocess_wav(_browser_wav(seconds, lead_silence=0.5, trail_silence=0.5), trim_silence=False)
+    chunks = split_wav(data, chunk_seconds)
+
+    async def run():
+        transport = httpx.ASGITransport(app=stub_transcriber.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://stub", timeout=600) as client:
+            transcriber = GroqTranscriber(client, url="/openai/v1/audio/transcriptions", api_key="", model="m")
+            upload = UploadFile(io.BytesIO(data), size=len(data), filename="long.wav")
+            start = time.perf_counter()
+            await transcriber.transcribe(upload)
+            whole = time.perf_counter() - start
+            start = time.perf_counter()
+            await transcribe_chunks(transcriber, chunks, concurrency=concurrency)
+            return whole, time.perf_counter() - start, len(chunks)
+
+    return asyncio.run(run())
+
+
+def run_chunks(rounds):
+    rtf = 0.02
+    print(f"Whole vs chunked (30 s chunks) transcription against the stub at {rtf} s per audio second...")
+    for seconds in (60, 180, 300):
+        for concurrency in (4, 16):
+            whole, chunked, n = bench_chunked(seconds, rtf, concurrency)
+            print(f"  {seconds:3} s audio, {n:2} chunks, concurrency {concurrency:2}: "
+                  f"whole {whole:5.2f} s, chunked {chunked:5.2f} s ({whole / chunked:.1f}x)")
+
+
+def _percentiles(samples):
+    ordered = sorted(samples)
+    return {p: ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000 for p in (50, 95, 99)}
+
+
+def bench_hedged(requests=400, concurrency=20, tail_rate=0.03, tail_ms=2000):
+    """Latency percentiles of the primary alone vs hedged with a secondary,
+    against two in-process stubs: the primary is faster but has a tail of
+    `tail_rate` requests taking `tail_ms` longer."""
+    import stub_transcriber
+
+    primary_app, secondary_app = stub_transcriber.create_app(), stub_transcriber.create_app()
+    primary_app.state.control.update(latency_ms=100, jitter_ms=50, tail_rate=tail_rate, tail_ms=tail_ms)
+    secondary_app.state.control.update(latency_ms=150, jitter_ms=50)
+    data = _browser_wav(5, rate=16000)
+
+    def backend(app, name):
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://stub")
+        return GroqTranscriber(client, url="/openai/v1/audio/transcriptions", api_key="", model="m", name=name)
+
+    async def measure(transcriber):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            upload = UploadFile(io.BytesIO(data), size=len(data), filename="a.wav")
+            async with semaphore:
+                start = time.perf_counter()
+                await transcriber.transcribe(upload)
+                return time.perf_counter() - start
+
+        return await asyncio.gather(*(one() for _ in range(requests)))
+
+    async def run():
+        primary = backend(primary_app, "primary")
+        alone = await measure(primary)
+        hedged = HedgedTranscriber(primary, backend(secondary_app, "secondary"),
+                                   min_delay=0.05, initial_delay=0.5, measure_rate=1.0)
+        with_hedge = await measure(hedged)
+        return alone, with_hedge, hedged.stats()
+
+    return asyncio.run(run())
+
+
+def run_hedge(rounds):
+    print("Primary alone vs hedged at p95 (primary 100-150 ms with a 3% +2 s tail, secondary 150-200 ms)...")
+    alone, hedged, stats = bench_hedged()  # every loser measured, see measure_rate
+    for label, samples in (("primary only", alone), ("hedged", hedged)):
+        p = _percentiles(samples)
+        print(f"  {label:12}: p50 {p[50]:6.0f} ms, p95 {p[95]:6.0f} ms, p99 {p[99]:6.0f} ms")
+    print(f"  hedged {stats['hedged']}/{stats['requests']} ({stats['hedge_rate']:.1%}), "
+          f"secondary won {stats['secondary_wins']}, {stats['saved_ms_per_win'] or 0:,.0f} ms saved per win, "
+          f"deadline {stats['deadline_ms']:.0f} ms, secondary requests {stats['secondary']['requests']}")
+
+
+def run_parse(rounds):
+    configure_result_cache(0)
+    texts = load_csv_inputs()
+    print(f"Pattern registry: {len(_PATTERNS)} precompiled patterns")
+    print(f"Parsing {len(texts)} CSV inputs, best of {rounds} rounds...")
+    rate = bench_parse(texts, rounds)
+    print(f"  → {rate:,.0f} parses/sec ({1e6 / rate:,.1f} µs/parse)")
+
+
+def run_fanout(rounds):
+    configure_result_cache(0)
+    print(f"Multi-athlete × multi-day fan-out, {rounds} parses each...")
+    for label, (n, per_parse) in bench_fanout(rounds).items():
+        print(f"  {label:8} {n} assignment(s): {per_parse:,.1f} µs/parse")
+
+
+def run_scans(rounds):
+    configure_result_cache(0)
+    texts = load_csv_inputs()
+    print(f"Counting regex scans over {len(texts)} CSV inputs...")
+    print(f"  → {count_regex_scans(texts):,.1f} regex scans/parse")
+
+
+def run_batch(rounds):
+    configure_result_cache(0)
+    texts = load_csv_inputs()
+    print(f"Single vs batched parsing of {len(texts)} CSV inputs, best of {rounds} rounds...")
+    single = bench_parse(texts, rounds)
+
+    batched = 0.0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        parse_workout_texts(texts)
+        batched = max(batched, len(texts) / (time.perf_counter() - start))
+
+    print(f"  single:  {single:,.0f} texts/sec")
+    print(f"  batched: {batched:,.0f} texts/sec ({batched / single:.1f}x)")
+
+
+def run_cache(rounds):
+    texts = load_csv_inputs()
+    print(f"Cold vs cached parsing of {len(texts)} CSV inputs, best of {rounds} rounds...")
+    configure_result_cache(0)
+    cold = bench_parse(texts, rounds)
+
+    configure_result_cache(len(texts))
+    for text in texts:
+        parse_workout_text(text)
+    warm = bench_parse(texts, rounds)
+
+    stats = cache_stats()
+    print(f"  cold:   {cold:,.0f} parses/sec")
+    print(f"  cached: {warm:,.0f} parses/sec ({warm / cold:.1f}x)")
+    print(f"  hits {stats['hits']:,}, misses {stats['misses']:,}, evictions {stats['evictions']:,}")
+
+
+def run_models(rounds):
+    texts = load_csv_inputs()
+    print(f"NER latency over {len(texts)} CSV inputs, {rounds} round(s)...")
+    for label, pipes, latency in bench_models(texts, rounds):
+        if latency is None:
+            print(f"  {label:8} not installed, skipped")
+            continue
+        mean, p50, p95 = latency
+        print(f"  {label:8} {pipes:45} mean {mean:.2f} ms, p50 {p50:.2f} ms, p95 {p95:.2f} ms")
+
+
+def run_workers(rounds):
+    texts = load_csv_inputs()
+    cores = os.cpu_count() or 1
+    counts = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+    print(f"Process-pool throughput over {len(texts)} CSV inputs, {cores} core(s), best of {rounds}...")
+    configure_result_cache(0)
+    inline = bench_parse(texts, rounds)
+    print(f"  in-process: {inline:,.0f} texts/sec")
+    for workers in counts:
+        rate = bench_workers(texts, workers, rounds)
+        print(f"  {workers:2} worker(s): {rate:,.0f} texts/sec ({rate / inline:.2f}x)")
+
+
+class _DrainTransport(httpx.AsyncBaseTransport):
+    """Reads the request body chunk by chunk and discards it, like a remote
+    API would, so only the client side shows up in the measurements."""
+
+    async def handle_async_request(self, request):
+        async for _ in request.stream:
+            pass
+        return httpx.Response(200, json={"text": "ok"})
+
+
+def _proc_io():
+    """(bytes read, bytes written) through syscalls so far, from /proc/self/io."""
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return int(fields["rchar"]), int(fields["wchar"])
+    except OSError:
+        return 0, 0
+
+
+def _spooled_upload(size):
+    """An UploadFile spooled the way Starlette does (in memory up to 1 MB)."""
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    chunk = os.urandom(64 * 1024)
+    for _ in range(size // len(chunk)):
+        spool.write(chunk)
+    spool.seek(0)
+    return UploadFile(spool, size=size, filename="clip.wav", headers={"content-type": "audio/wav"})
+
+
+async def _legacy_transcribe(client, upload):
+    """The old /transcribe path: copy to temp_<name>, reopen, send."""
+    audio_path = f"temp_{upload.filename}"
+    try:
+        with open(audio_path, "wb") as buffer:
+            shutil.copyfileobj(upload.file, buffer)
+        with open(audio_path, "rb") as audio_file:
+            await client.post("http://transcriber/v1", files={"file": (upload.filename, audio_file, "audio/wav")},
+                              data={"model": "m", "language": "en"})
+    finally:
+        os.remove(audio_path)
+
+
+async def _streaming_transcribe(client, upload):
+    await transcribe_upload(client, upload, url="http://transcriber/v1", api_key="", model="m")
+
+
+def bench_upload(size, rounds=5):
+    """Per-request peak Python memory, syscall I/O and time for both paths."""
+    results = {}
+    for label, send in (("temp file", _legacy_transcribe), ("streaming", _streaming_transcribe)):
+        async def run():
+            async with httpx.AsyncClient(transport=_DrainTransport()) as client:
+                peak = read = written = elapsed = 0
+                for _ in range(rounds):
+                    upload = _spooled_upload(size)
+                    io_before = _proc_io()
+                    tracemalloc.start()
+                    start = time.perf_counter()
+                    await send(client, upload)
+                    elapsed += time.perf_counter() - start
+                    peak = max(peak, tracemalloc.get_traced_memory()[1])
+                    tracemalloc.stop()
+                    io_after = _proc_io()
+                    read += io_after[0] - io_before[0]
+                    written += io_after[1] - io_before[1]
+                    await upload.close()
+                return peak, read / rounds, written / rounds, elapsed / rounds
+        results[label] = asyncio.run(run())
+    return results
+
+
+SECTIONS = {
+    "parse": (run_parse, 5),
+    "fanout": (run_fanout, 2000),
+    "scans": (run_scans, 1),
+    "batch": (run_batch, 3),
+    "cache": (run_cache, 5),
+    "models": (run_models, 1),
+    "workers": (run_workers, 2),
+    "upload": (run_upload, 5),
+    "audio": (run_audio, 5),
+    "chunks": (run_chunks, 1),
+    "hedge": (run_hedge, 1),
+}
+
+
+if __name__ == "__main__":
+    # Usage: python benchmark.py [section] [rounds]
+    load_model()
+    section = sys.argv[1] if len(sys.argv) > 1 else "parse"
+    runner, default_rounds = SECTIONS[section]
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else default_rounds
+    runner(rounds)
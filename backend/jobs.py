@@ -0,0 +1,217 @@
+import asyncio
+import json
+import shutil
+import tempfile
+import time
+import uuid
+
+from fastapi import UploadFile
+
+# Transcription as background jobs: submitting returns a job id at once, a
+# fixed number of worker tasks run the jobs, and results are fetched by
+# polling or over Server-Sent Events. A dropped client connection loses
+# nothing, and jobs in flight are bounded by the pool, not by connections.
+
+_SPOOL_MAX_BYTES = 1024 * 1024  # same as Starlette's upload spooling
+
+
+class JobQueueFull(Exception):
+    """The pending queue is at its limit; retry_after is a hint in seconds."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Too many transcription jobs queued")
+        self.retry_after = retry_after
+
+
+def _copy_to_spool(upload: UploadFile) -> UploadFile:
+    # The request's UploadFile is closed once the response is sent, so the
+    # job gets its own spooled copy
+    upload.file.seek(0)
+    spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_BYTES)
+    shutil.copyfileobj(upload.file, spool)
+    size = spool.tell()
+    spool.seek(0)
+    return UploadFile(spool, size=size, filename=upload.filename, headers=upload.headers)
+
+
+class Job:
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"  # queued | running | done | failed
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None  # {"status_code": int, "detail": str}
+        self._changed = asyncio.Event()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def _set(self, **fields):
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """Bounded queue of transcription jobs run by `workers` asyncio tasks.
+    Not thread-safe; use it from the event loop.
+
+    submit() copies the upload and queues `handler(upload)`; when
+    `max_pending` jobs are already waiting it raises JobQueueFull. Finished
+    jobs are kept for `result_ttl` seconds.
+    """
+
+    def __init__(self, workers: int = 4, max_pending: int = 100, result_ttl: float = 600.0):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._jobs: dict[str, Job] = {}
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.expired = 0
+        self._run_seconds = 0.0
+
+    def start(self):
+        """Start the workers; call from inside the running event loop."""
+        if not self._tasks:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._tasks = [
+                asyncio.create_task(self._worker(), name=f"transcription-job-{i}")
+                for i in range(self.workers)
+            ]
+            self._tasks.append(asyncio.create_task(self._sweep(), name="transcription-job-sweep"))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, kind: str, upload: UploadFile, handler) -> Job:
+        if self._queue.full():
+            self.rejected += 1
+            raise JobQueueFull(self._retry_after())
+        copy = await asyncio.to_thread(_copy_to_spool, upload)
+        job = Job(kind)
+        try:
+            self._queue.put_nowait((job, copy, handler))
+        except asyncio.QueueFull:
+            await copy.close()
+            self.rejected += 1
+            raise JobQueueFull(self._retry_after())
+        self._jobs[job.id] = job
+        self.submitted += 1
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        job = self._jobs.get(job_id)
+        if job is not None and self._expired(job):
+            self._remove(job)
+            return None
+        return job
+
+    def _retry_after(self) -> float:
+        # Time for the workers to get through the queue at the average job time
+        average = self._run_seconds / self.completed if self.completed else 5.0
+        return max(1.0, average * self._queue.qsize() / self.workers)
+
+    def _expired(self, job: Job) -> bool:
+        return job.finished is not None and time.time() - job.finished > self.result_ttl
+
+    def _remove(self, job: Job):
+        if self._jobs.pop(job.id, None) is not None:
+            self.expired += 1
+
+    async def _worker(self):
+        while True:
+            job, upload, handler = await self._queue.get()
+            job._set(status="running", started=time.time())
+            try:
+                result = await handler(upload)
+            except asyncio.CancelledError:
+                job._set(status="failed", finished=time.time(),
+                         error={"status_code": 503, "detail": "Server shutting down"})
+                raise
+            except Exception as e:
+                self.failed += 1
+                job._set(status="failed", finished=time.time(), error={
+                    "status_code": getattr(e, "status_code", 500),
+                    "detail": getattr(e, "detail", str(e)),
+                })
+            else:
+                self.completed += 1
+                self._run_seconds += time.time() - job.started
+                job._set(status="done", finished=time.time(), result=result)
+            finally:
+                await upload.close()
+                self._queue.task_done()
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(min(60.0, max(1.0, self.result_ttl / 4)))
+            for job in [j for j in self._jobs.values() if self._expired(j)]:
+                self._remove(job)
+
+    def stats(self) -> dict:
+        running = sum(1 for j in list(self._jobs.values()) if j.status == "running")
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": running,
+            "kept": len(self._jobs),
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "expired": self.expired,
+            "avg_run_ms": self._run_seconds / self.completed * 1000 if self.completed else 0.0,
+        }
+
+
+# ── Server-Sent Events ─────────────────────────────────────────────────────────
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def job_events(job: Job, keepalive: float = 15.0):
+    """SSE stream for a job: a `status` event on every change, then one
+    `done` or `failed` event carrying the full job, then the stream ends.
+    Comment lines are sent every `keepalive` seconds so proxies keep the
+    connection open."""
+    sent = None
+    while True:
+        # Taken before reading the status, so a change in between is not missed
+        changed = job._changed
+        if job.is_finished:
+            yield _sse(job.status, job.to_dict())
+            return
+        if job.status != sent:
+            sent = job.status
+            yield _sse("status", {"job_id": job.id, "status": sent})
+            continue
+        try:
+            await asyncio.wait_for(changed.wait(), keepalive)
+        except asyncio.TimeoutError:
+            yield ": keepalive\n\n"
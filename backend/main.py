@@ -1,12 +1,17 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import time
+
+_STARTED = time.perf_counter()
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
-import httpx
-import shutil
 import os
-import csv
-from datetime import datetime
 
 # SSL fix for environments with certificate issues
 try:
@@ -15,17 +20,402 @@ try:
 except ImportError:
     pass
 
-from parser import parse_workout_text
+from parser import (
+    DEFAULT_CACHE_SIZE,
+    cache_stats,
+    collect_stage_times,
+    configure_entity_logging,
+    configure_result_cache,
+    init_worker,
+    model_status,
+    parse_workout_text,
+    parse_workout_texts,
+    start_model_loading,
+)
+
+from transcription import (
+    CircuitBreaker,
+    GroqTranscriber,
+    HedgedTranscriber,
+    TranscriptionBackend,
+    TranscriptionError,
+    check_upload_size,
+    make_client,
+    transcribe_chunks,
+)
+from admission import AdmissionController, AdmissionRejected, BoundedExecutor
+from audio import preprocess_upload, split_wav
+from jobs import JobQueue, JobQueueFull, job_events
+from metrics import REGISTRY, Callback, Counter, Histogram, RequestMetricsMiddleware
+from singleflight import SingleFlight
+from transcript_cache import TranscriptCache, hash_upload
+from training_log import CsvTrainingSink, SqliteTrainingSink, TrainingLogger
+
+_IMPORTED = time.perf_counter()
 
 # ── Config ─────────────────────────────────────────────────────────────────────
 
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY", "")
 GROQ_WHISPER_MODEL = "whisper-large-v3-turbo"
-GROQ_API_URL = "https://api.groq.com/openai/v1/audio/transcriptions"
+GROQ_API_URL = os.environ.get("GROQ_API_URL", "https://api.groq.com/openai/v1/audio/transcriptions")
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", 25 * 1024 * 1024))
+
+# One pooled client to Groq for the app's lifetime (point GROQ_API_URL at
+# stub_transcriber.py to run without the real API)
+GROQ_TIMEOUT = float(os.environ.get("GROQ_TIMEOUT", 60.0))
+GROQ_MAX_CONNECTIONS = int(os.environ.get("GROQ_MAX_CONNECTIONS", 20))
+GROQ_MAX_KEEPALIVE = int(os.environ.get("GROQ_MAX_KEEPALIVE", 10))
+GROQ_KEEPALIVE_EXPIRY = float(os.environ.get("GROQ_KEEPALIVE_EXPIRY", 30.0))
+GROQ_RETRIES = int(os.environ.get("GROQ_RETRIES", 2))
+GROQ_RETRY_BACKOFF = float(os.environ.get("GROQ_RETRY_BACKOFF", 0.5))
+GROQ_BREAKER_FAILURES = int(os.environ.get("GROQ_BREAKER_FAILURES", 5))
+GROQ_BREAKER_RESET = float(os.environ.get("GROQ_BREAKER_RESET", 30.0))
+TRANSCRIBE_LANGUAGE = "en"
+
+# Optional second Whisper-compatible endpoint. When set, a request the
+# primary has not answered by the TRANSCRIBE_HEDGE_PERCENTILE of its recent
+# latencies is also sent there, and the first answer wins
+TRANSCRIBE_SECONDARY_URL = os.environ.get("TRANSCRIBE_SECONDARY_URL") or None
+TRANSCRIBE_SECONDARY_API_KEY = os.environ.get("TRANSCRIBE_SECONDARY_API_KEY", GROQ_API_KEY)
+TRANSCRIBE_SECONDARY_MODEL = os.environ.get("TRANSCRIBE_SECONDARY_MODEL", GROQ_WHISPER_MODEL)
+TRANSCRIBE_HEDGE_PERCENTILE = float(os.environ.get("TRANSCRIBE_HEDGE_PERCENTILE", 95.0))
+TRANSCRIBE_HEDGE_MIN_DELAY = float(os.environ.get("TRANSCRIBE_HEDGE_MIN_DELAY", 0.5))
+TRANSCRIBE_HEDGE_MAX_DELAY = float(os.environ.get("TRANSCRIBE_HEDGE_MAX_DELAY", 10.0))
+TRANSCRIBE_HEDGE_INITIAL_DELAY = float(os.environ.get("TRANSCRIBE_HEDGE_INITIAL_DELAY", 3.0))
+
+# WAV uploads are downmixed to mono, resampled to 16 kHz and trimmed of
+# leading/trailing silence before they are sent (AUDIO_PREPROCESS=0 to send
+# them as recorded)
+AUDIO_PREPROCESS = os.environ.get("AUDIO_PREPROCESS", "1") != "0"
+AUDIO_TRIM_SILENCE = os.environ.get("AUDIO_TRIM_SILENCE", "1") != "0"
+
+# WAV longer than TRANSCRIBE_CHUNK_SECONDS is split on silence into overlapping
+# chunks that are transcribed concurrently (0 sends it as one request)
+TRANSCRIBE_CHUNK_SECONDS = float(os.environ.get("TRANSCRIBE_CHUNK_SECONDS", 30.0))
+TRANSCRIBE_CHUNK_OVERLAP = float(os.environ.get("TRANSCRIBE_CHUNK_OVERLAP", 1.0))
+TRANSCRIBE_CHUNK_CONCURRENCY = int(os.environ.get("TRANSCRIBE_CHUNK_CONCURRENCY", 4))
+
+# Admission control for the endpoints that call the transcription API: each
+# client gets ADMISSION_RATE recordings/s with bursts of ADMISSION_BURST (429
+# past that; off by default), at most ADMISSION_MAX_IN_FLIGHT calls to the
+# transcription API run at once, and at most ADMISSION_MAX_QUEUE wait up to
+# ADMISSION_QUEUE_TIMEOUT seconds for a slot (503 past that). Slots are per
+# upstream call (a chunk, a hedge), not per recording, and default to
+# GROQ_MAX_CONNECTIONS so calls queue here, bounded and measured, rather
+# than inside the HTTP client's connection pool.
+# Clients are told apart by peer address, so behind a reverse proxy or load
+# balancer every user shares one bucket: set ADMISSION_CLIENT_HEADER to a
+# header the proxy sets and overwrites (e.g. X-Real-IP) before turning the
+# rate limit on.
+ADMISSION_RATE = float(os.environ.get("ADMISSION_RATE", 0))
+ADMISSION_BURST = float(os.environ.get("ADMISSION_BURST", 20))
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", GROQ_MAX_CONNECTIONS))
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", 64))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", 10.0))
+ADMISSION_CLIENT_HEADER = os.environ.get("ADMISSION_CLIENT_HEADER", "")
+
+admission = AdmissionController(
+    ADMISSION_RATE, ADMISSION_BURST, ADMISSION_MAX_IN_FLIGHT, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT
+)
+if ADMISSION_RATE and not ADMISSION_CLIENT_HEADER:
+    print("ADMISSION_RATE is keyed on peer address; behind a proxy set ADMISSION_CLIENT_HEADER")
+if ADMISSION_MAX_IN_FLIGHT > GROQ_MAX_CONNECTIONS:
+    print("ADMISSION_MAX_IN_FLIGHT exceeds GROQ_MAX_CONNECTIONS; the excess waits in the HTTP pool")
+
+# POST /transcribe/batch takes up to TRANSCRIBE_BATCH_MAX_FILES recordings and
+# transcribes at most TRANSCRIBE_BATCH_CONCURRENCY of them at a time
+TRANSCRIBE_BATCH_MAX_FILES = int(os.environ.get("TRANSCRIBE_BATCH_MAX_FILES", 20))
+TRANSCRIBE_BATCH_CONCURRENCY = int(os.environ.get("TRANSCRIBE_BATCH_CONCURRENCY", 8))
+
+# POST /transcribe/jobs answers with a job id at once; TRANSCRIBE_JOB_WORKERS
+# jobs run at a time, at most TRANSCRIBE_JOB_QUEUE wait (then 503), and
+# results are kept for TRANSCRIBE_JOB_TTL seconds
+TRANSCRIBE_JOB_WORKERS = int(os.environ.get("TRANSCRIBE_JOB_WORKERS", 4))
+TRANSCRIBE_JOB_QUEUE = int(os.environ.get("TRANSCRIBE_JOB_QUEUE", 100))
+TRANSCRIBE_JOB_TTL = float(os.environ.get("TRANSCRIBE_JOB_TTL", 600.0))
+
+transcription_jobs = JobQueue(TRANSCRIBE_JOB_WORKERS, TRANSCRIBE_JOB_QUEUE, TRANSCRIBE_JOB_TTL)
+
+# Transcripts cached by audio hash + model + language; the disk tier is only
+# used when TRANSCRIPT_CACHE_DIR is set
+TRANSCRIPT_CACHE_SIZE = int(os.environ.get("TRANSCRIPT_CACHE_SIZE", 512))
+TRANSCRIPT_CACHE_TTL = float(os.environ.get("TRANSCRIPT_CACHE_TTL", 7 * 24 * 3600))
+TRANSCRIPT_CACHE_DIR = os.environ.get("TRANSCRIPT_CACHE_DIR") or None
+TRANSCRIPT_CACHE_DISK_SIZE = int(os.environ.get("TRANSCRIPT_CACHE_DISK_SIZE", 10000))
+
+# Concurrent identical requests (same audio hash, same normalized text) share
+# one transcription / parse
+transcribe_flights = SingleFlight()
+parse_flights = SingleFlight()
+
+# nlp.pipe batch size for /parse/batch; unset uses the model's [nlp] batch_size
+PARSE_BATCH_SIZE = int(os.environ.get("PARSE_BATCH_SIZE", 0)) or None
+MAX_BATCH_TEXTS = int(os.environ.get("MAX_BATCH_TEXTS", 5000))
+
+# Only ner (and the tok2vec it listens to) runs unless SPACY_NER_ONLY=0
+SPACY_NER_ONLY = os.environ.get("SPACY_NER_ONLY", "1") != "0"
+
+# How long /transcribe-and-parse may wait for NER to go live (counted from
+# when the request arrives, in parallel with transcription) before parsing
+# regex-only
+MODEL_READY_WAIT = float(os.environ.get("MODEL_READY_WAIT", 10.0))
+
+# Parse result LRU size; 0 turns the cache off
+PARSE_CACHE_SIZE = int(os.environ.get("PARSE_CACHE_SIZE", DEFAULT_CACHE_SIZE))
+
+# Parse in N worker processes, each with its own model, so spaCy and the
+# regex passes are not serialized on the GIL; 0 parses in-process on the
+# thread pool
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", 0))
+# Parsing mostly holds the GIL, so threads beyond the core count only contend
+PARSE_THREADS = int(os.environ.get("PARSE_THREADS", min(4, os.cpu_count() or 1)))
+
+# Fraction of parses logged as a JSON line with the entities NER found
+PARSE_LOG_SAMPLE_RATE = float(os.environ.get("PARSE_LOG_SAMPLE_RATE", 0.01))
+
+# Parses run on a dedicated pool (PARSE_WORKERS processes, else PARSE_THREADS
+# threads) with at most PARSE_QUEUE_LIMIT waiting; /parse answers 503 with
+# Retry-After when the queue is full or the predicted wait would exceed
+# PARSE_DEADLINE seconds (0: no deadline)
+PARSE_QUEUE_LIMIT = int(os.environ.get("PARSE_QUEUE_LIMIT", 64))
+PARSE_DEADLINE = float(os.environ.get("PARSE_DEADLINE", 2.0))
+
+# Longest text /parse and /parse/batch accept (413 past that; 0: no limit).
+# 20k characters is ~20 minutes of speech and parses in well under a second
+PARSE_MAX_CHARS = int(os.environ.get("PARSE_MAX_CHARS", 20000))
+
+# Successful parses are logged as training data by a background writer, to
+# SQLite (queryable, see train_model.py) or to a rotating CSV file
+TRAINING_LOG_SINK = os.environ.get("TRAINING_LOG_SINK", "sqlite")
+TRAINING_LOG_DB = os.environ.get("TRAINING_LOG_DB", "parse_log.db")
+TRAINING_LOG_PATH = os.environ.get("TRAINING_LOG_PATH", "training_data.csv")
+TRAINING_LOG_MAX_BYTES = int(os.environ.get("TRAINING_LOG_MAX_BYTES", 50 * 1024 * 1024))
+TRAINING_LOG_BACKUPS = int(os.environ.get("TRAINING_LOG_BACKUPS", 5))
+TRAINING_LOG_QUEUE = int(os.environ.get("TRAINING_LOG_QUEUE", 10000))
+TRAINING_LOG_BATCH = int(os.environ.get("TRAINING_LOG_BATCH", 200))
+TRAINING_LOG_FLUSH_SECONDS = float(os.environ.get("TRAINING_LOG_FLUSH_SECONDS", 2.0))
+
+# ── Metrics ────────────────────────────────────────────────────────────────────
+
+# Exposed at GET /metrics in Prometheus text format (see metrics.py);
+# upstream call latency is recorded in transcription.py
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Request latency by method, route and status",
+    ("method", "route", "status"),
+)
+PARSE_STAGE_SECONDS = Histogram(
+    "parse_stage_seconds", "Per-text parse time by stage (ner: spaCy inference, regex: extraction)",
+    ("stage",),
+)
+PARSE_QUEUE_SECONDS = Histogram(
+    "parse_queue_wait_seconds", "Time parse calls wait for a free parse worker"
+)
+PARSE_EXEC_SECONDS = Histogram(
+    "parse_exec_seconds", "Time parse calls run on a parse worker"
+)
+PARSE_CACHE_LOOKUPS = Counter(
+    "parse_cache_lookups_total", "Parse result cache lookups (all workers)", ("result",)
+)
+AUDIO_PREPROCESS_SECONDS = Histogram(
+    "audio_preprocess_seconds", "WAV downmix/resample/trim time before upload"
+)
+
+
+def _observe_parse_queue(wait: float, exec_time: float):
+    PARSE_QUEUE_SECONDS.observe(wait)
+    PARSE_EXEC_SECONDS.observe(exec_time)
+
+
+def _observe_parse_stages(timings: dict):
+    for stage in ("ner", "regex"):
+        for seconds in timings[stage]:
+            PARSE_STAGE_SECONDS.observe(seconds, (stage,))
+    if timings["cache_hits"]:
+        PARSE_CACHE_LOOKUPS.inc(timings["cache_hits"], ("hit",))
+    if timings["cache_misses"]:
+        PARSE_CACHE_LOOKUPS.inc(timings["cache_misses"], ("miss",))
+
+
+def _parse_cache_hit_ratio() -> float:
+    hits = PARSE_CACHE_LOOKUPS.value(("hit",))
+    lookups = hits + PARSE_CACHE_LOOKUPS.value(("miss",))
+    return hits / lookups if lookups else 0.0
+
+
+Callback("parse_cache_hit_ratio", "Parse result cache hit ratio since start", _parse_cache_hit_ratio)
+Callback(
+    "transcript_cache_lookups_total", "Transcript cache lookups by outcome",
+    lambda: {(k,): transcript_cache.stats()[k] for k in ("memory_hits", "disk_hits", "misses")},
+    type="counter", labelnames=("result",),
+)
+Callback(
+    "transcript_cache_hit_ratio", "Transcript cache hit ratio (memory + disk) since start",
+    lambda: transcript_cache.stats()["hit_ratio"],
+)
+Callback(
+    "training_log_queue_depth", "Training records waiting for the background writer",
+    lambda: training_logger.stats()["queued"],
+)
+Callback(
+    "training_log_records_total", "Training records by outcome",
+    lambda: {(k,): training_logger.stats()[k] for k in ("logged", "dropped")},
+    type="counter", labelnames=("result",),
+)
+Callback("admission_in_flight", "Upstream transcription calls holding a slot", lambda: admission.in_flight)
+Callback("admission_queue_depth", "Upstream transcription calls waiting for a slot", lambda: admission.waiting)
+Callback(
+    "admission_rejected_total", "Requests refused by admission control, by reason",
+    lambda: {(k,): v for k, v in admission.stats()["rejected"].items()},
+    type="counter", labelnames=("reason",),
+)
+Callback("parse_queue_depth", "Parse calls waiting for a parse worker", lambda: _parse_executor.queue_depth)
+Callback(
+    "parse_rejected_total", "/parse requests shed by the parse executor, by reason",
+    lambda: {(k,): v for k, v in _parse_executor.stats()["rejected"].items()},
+    type="counter", labelnames=("reason",),
+)
+Callback(
+    "transcription_jobs", "Transcription jobs by state",
+    lambda: {(k,): transcription_jobs.stats()[k] for k in ("queued", "running")},
+    labelnames=("state",),
+)
+Callback(
+    "coalesced_requests_total", "Requests answered by an identical in-flight computation",
+    lambda: {("parse",): parse_flights.coalesced, ("transcribe",): transcribe_flights.coalesced},
+    type="counter", labelnames=("kind",),
+)
+Callback(
+    "audio_preprocess_bytes_total", "WAV bytes before and after preprocessing",
+    lambda: {("in",): _audio_stats["bytes_in"], ("out",): _audio_stats["bytes_out"]},
+    type="counter", labelnames=("stage",),
+)
+Callback(
+    "transcription_hedged_total", "Transcriptions also sent to the secondary backend",
+    lambda: _transcriber.stats().get("hedged"), type="counter",
+)
+Callback(
+    "transcription_secondary_wins_total", "Hedged transcriptions the secondary answered first",
+    lambda: _transcriber.stats().get("secondary_wins"), type="counter",
+)
+Callback(
+    "transcription_failovers_total", "Transcriptions sent to the secondary after a primary 5xx",
+    lambda: _transcriber.stats().get("failovers"), type="counter",
+)
 
 # ── App Setup ──────────────────────────────────────────────────────────────────
 
-app = FastAPI(title="Coach AI Assistant API", version="1.0.0")
+# Everything that opens files, databases or connections is built in lifespan(),
+# not at import: spawned parse workers re-import this module as __mp_main__
+# under `python main.py`, and should get nothing but the config constants
+_parse_pool: ProcessPoolExecutor | None = None
+_parse_executor: BoundedExecutor | None = None
+_pool_warmup = []
+_http_client = None
+_transcriber: TranscriptionBackend | None = None
+transcript_cache: TranscriptCache | None = None
+training_logger: TrainingLogger | None = None
+
+
+def _make_training_logger() -> TrainingLogger:
+    if TRAINING_LOG_SINK == "csv":
+        sink = CsvTrainingSink(TRAINING_LOG_PATH, TRAINING_LOG_MAX_BYTES, TRAINING_LOG_BACKUPS)
+    else:
+        sink = SqliteTrainingSink(TRAINING_LOG_DB)
+    return TrainingLogger(
+        sink,
+        max_queue=TRAINING_LOG_QUEUE,
+        batch_size=TRAINING_LOG_BATCH,
+        flush_interval=TRAINING_LOG_FLUSH_SECONDS,
+    )
+
+
+def _make_transcriber(client) -> TranscriptionBackend:
+    """The Groq backend, wrapped in hedging when a secondary is configured."""
+    backend = GroqTranscriber(
+        client,
+        url=GROQ_API_URL,
+        api_key=GROQ_API_KEY,
+        model=GROQ_WHISPER_MODEL,
+        language=TRANSCRIBE_LANGUAGE,
+        retries=GROQ_RETRIES,
+        backoff=GROQ_RETRY_BACKOFF,
+        breaker=CircuitBreaker(GROQ_BREAKER_FAILURES, GROQ_BREAKER_RESET),
+        slot=admission.slot,
+    )
+    if not TRANSCRIBE_SECONDARY_URL:
+        return backend
+    secondary = GroqTranscriber(
+        client,
+        url=TRANSCRIBE_SECONDARY_URL,
+        api_key=TRANSCRIBE_SECONDARY_API_KEY,
+        model=TRANSCRIBE_SECONDARY_MODEL,
+        language=TRANSCRIBE_LANGUAGE,
+        retries=GROQ_RETRIES,
+        backoff=GROQ_RETRY_BACKOFF,
+        breaker=CircuitBreaker(GROQ_BREAKER_FAILURES, GROQ_BREAKER_RESET),
+        name="secondary",
+        slot=admission.slot,
+    )
+    return HedgedTranscriber(
+        backend, secondary,
+        percentile=TRANSCRIBE_HEDGE_PERCENTILE,
+        min_delay=TRANSCRIBE_HEDGE_MIN_DELAY,
+        max_delay=TRANSCRIBE_HEDGE_MAX_DELAY,
+        initial_delay=TRANSCRIBE_HEDGE_INITIAL_DELAY,
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _parse_pool, _parse_executor, _http_client, _transcriber, transcript_cache, training_logger
+    configure_result_cache(PARSE_CACHE_SIZE)
+    configure_entity_logging(PARSE_LOG_SAMPLE_RATE)
+    transcript_cache = TranscriptCache(
+        TRANSCRIPT_CACHE_SIZE, TRANSCRIPT_CACHE_TTL, TRANSCRIPT_CACHE_DIR, TRANSCRIPT_CACHE_DISK_SIZE
+    )
+    training_logger = _make_training_logger()
+    training_logger.start()
+    _http_client = make_client(GROQ_MAX_CONNECTIONS, GROQ_MAX_KEEPALIVE, GROQ_KEEPALIVE_EXPIRY, GROQ_TIMEOUT)
+    _transcriber = _make_transcriber(_http_client)
+    transcription_jobs.start()
+    if PARSE_WORKERS > 0:
+        # spawn, not fork: the parent already runs threads
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=PARSE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(SPACY_NER_ONLY, PARSE_CACHE_SIZE, PARSE_LOG_SAMPLE_RATE),
+        )
+        # One task per worker makes the pool start them all now; each
+        # answers once its initializer has loaded the model
+        _pool_warmup[:] = [_parse_pool.submit(model_status) for _ in range(PARSE_WORKERS)]
+        loading = f"{PARSE_WORKERS} parse worker(s) loading the spaCy model"
+    else:
+        # The spaCy model loads on a background thread so the port binds right
+        # away; /parse runs regex-only until it is live (see GET /ready)
+        start_model_loading(ner_only=SPACY_NER_ONLY)
+        loading = "spaCy model loading in background"
+    _parse_executor = BoundedExecutor(
+        _parse_pool or ThreadPoolExecutor(PARSE_THREADS, thread_name_prefix="parse"),
+        workers=PARSE_WORKERS or PARSE_THREADS,
+        max_queue=PARSE_QUEUE_LIMIT,
+        deadline=PARSE_DEADLINE,
+        observer=_observe_parse_queue,
+    )
+    print(
+        f"API startup: imports {(_IMPORTED - _STARTED) * 1000:.0f} ms, "
+        f"serving after {(time.perf_counter() - _STARTED) * 1000:.0f} ms; {loading}"
+    )
+    yield
+    await transcription_jobs.stop()
+    await _http_client.aclose()
+    _parse_executor.executor.shutdown(cancel_futures=True)
+    # Drain queued training records before the process exits
+    training_logger.stop()
+
+
+app = FastAPI(title="Coach AI Assistant API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,12 +424,17 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestMetricsMiddleware, histogram=REQUEST_SECONDS)
 
 # ── Models ─────────────────────────────────────────────────────────────────────
 
 class ParseRequest(BaseModel):
     text: str
 
+class BatchParseRequest(BaseModel):
+    texts: list[str]
+    batch_size: int | None = None
+
 class AssignRequest(BaseModel):
     data: dict
 
@@ -50,74 +445,363 @@ def read_root():
     return {"message": "AI Workout Assignment API"}
 
 
+@app.get("/ready")
+def readiness(ner: bool = False):
+    """Readiness probe. Parsing is available as soon as the app is up
+    (regex-only until the model is live); with ?ner=true it answers 503
+    until NER is live."""
+    status = model_status() if _parse_pool is None else _pool_status()
+    if ner and not status["ner"]:
+        return JSONResponse(status_code=503, content=status)
+    return status
+
+
+def _pool_status() -> dict:
+    """model_status() as reported by the parse workers that have started."""
+    ready = [f.result() for f in _pool_warmup if f.done() and not f.exception()]
+    status = dict(ready[0]) if ready else {"state": "loading", "ner": False}
+    status["workers"] = PARSE_WORKERS
+    status["workers_ready"] = len(ready)
+    return status
+
+
+def _client_id(request: Request) -> str:
+    if ADMISSION_CLIENT_HEADER:
+        value = request.headers.get(ADMISSION_CLIENT_HEADER)
+        if value:
+            return value.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _http_error(e: TranscriptionError | AdmissionRejected) -> HTTPException:
+    headers = None
+    if e.retry_after is not None:
+        headers = {"Retry-After": str(max(1, round(e.retry_after)))}
+    return HTTPException(status_code=e.status_code, detail=e.detail, headers=headers)
+
+
+# Endpoints reading the job queue, admission controller or executors are
+# async: those objects belong to the event loop and are not thread-safe
+
+@app.get("/transcribe/stats")
+async def transcribe_stats():
+    """Groq request/retry/failure counters, circuit breaker state (per
+    backend, plus hedging counters when a secondary is set) and transcript
+    cache hit ratios."""
+    return {
+        **_transcriber.stats(),
+        "cache": transcript_cache.stats(),
+        "audio": _audio_stats,
+        "jobs": transcription_jobs.stats(),
+        "coalescing": transcribe_flights.stats(),
+    }
+
+
+_audio_stats = {"preprocessed": 0, "bytes_in": 0, "bytes_out": 0, "bytes_saved": 0, "preprocess_ms": 0.0}
+
+
+async def _prepare_audio(file: UploadFile) -> UploadFile:
+    """Preprocessed copy of a WAV upload (see audio.py), or the upload itself."""
+    if not AUDIO_PREPROCESS:
+        return file
+    prepared, report = await asyncio.to_thread(preprocess_upload, file, AUDIO_TRIM_SILENCE)
+    if report["bytes_in"] is not None:
+        AUDIO_PREPROCESS_SECONDS.observe(report["preprocess_ms"] / 1000)
+        saved = report["bytes_in"] - report["bytes_out"]
+        _audio_stats["preprocessed"] += 1
+        _audio_stats["bytes_in"] += report["bytes_in"]
+        _audio_stats["bytes_out"] += report["bytes_out"]
+        _audio_stats["bytes_saved"] += saved
+        _audio_stats["preprocess_ms"] += report["preprocess_ms"]
+    return prepared
+
+
+def _split_upload(upload: UploadFile) -> list[bytes] | None:
+    """Chunks of a long WAV upload (see audio.split_wav), or None."""
+    if not TRANSCRIBE_CHUNK_SECONDS:
+        return None
+    f = upload.file
+    f.seek(0)
+    if f.read(4) != b"RIFF":
+        f.seek(0)
+        return None
+    f.seek(0)
+    data = f.read()
+    f.seek(0)
+    return split_wav(data, TRANSCRIBE_CHUNK_SECONDS, TRANSCRIBE_CHUNK_OVERLAP)
+
+
+async def _transcribe_upload(file: UploadFile) -> str:
+    """Transcript for an upload, from the cache when the same audio was seen
+    or from the same audio's transcription when one is already in flight."""
+    key = (await hash_upload(file), GROQ_WHISPER_MODEL, TRANSCRIBE_LANGUAGE)
+    text = await transcript_cache.get(key)
+    if text is None:
+        text = await transcribe_flights.do(key, lambda: _transcribe_uncached(file, key))
+    return text
+
+
+async def _transcribe_uncached(file: UploadFile, key: tuple) -> str:
+    prepared = await _prepare_audio(file)
+    chunks = await asyncio.to_thread(_split_upload, prepared)
+    # Each upstream call takes its own admission slot (see _make_transcriber)
+    if chunks:
+        text = await transcribe_chunks(
+            _transcriber, chunks,
+            concurrency=TRANSCRIBE_CHUNK_CONCURRENCY, overlap_seconds=TRANSCRIBE_CHUNK_OVERLAP,
+        )
+    else:
+        text = await _transcriber.transcribe(prepared)
+    await transcript_cache.put(key, text)
+    return text
+
+
 @app.post("/transcribe")
-async def transcribe_audio(file: UploadFile = File(...)):
+async def transcribe_audio(request: Request, file: UploadFile = File(...)):
     """Transcribe audio using Groq Whisper API (whisper-large-v3-turbo)."""
-    audio_path = f"temp_{file.filename}"
+    try:
+        admission.check_rate(_client_id(request))
+        check_upload_size(file, MAX_UPLOAD_BYTES)
+        # Streamed from the spooled upload; nothing is copied to disk here
+        return {"text": await _transcribe_upload(file)}
+
+    except (TranscriptionError, AdmissionRejected) as e:
+        raise _http_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/transcribe/batch")
+async def transcribe_batch(request: Request, files: list[UploadFile] = File(...)):
+    """Transcribe several recordings concurrently (at most
+    TRANSCRIBE_BATCH_CONCURRENCY in flight). Results are in upload order;
+    each is {"filename", "text"} or {"filename", "error": {"status_code",
+    "detail"}}, so one bad file does not fail the rest."""
+    if len(files) > TRANSCRIBE_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many files in one batch (max {TRANSCRIBE_BATCH_MAX_FILES})"
+        )
+    try:
+        admission.check_rate(_client_id(request), cost=len(files))
+    except AdmissionRejected as e:
+        raise _http_error(e)
+    semaphore = asyncio.Semaphore(TRANSCRIBE_BATCH_CONCURRENCY)
+
+    async def one(file: UploadFile) -> dict:
+        try:
+            check_upload_size(file, MAX_UPLOAD_BYTES)
+            async with semaphore:
+                return {"filename": file.filename, "text": await _transcribe_upload(file)}
+        except (TranscriptionError, AdmissionRejected) as e:
+            return {"filename": file.filename, "error": {"status_code": e.status_code, "detail": e.detail}}
+        except Exception as e:
+            return {"filename": file.filename, "error": {"status_code": 500, "detail": str(e)}}
+
+    return {"results": await asyncio.gather(*(one(file) for file in files))}
+
+
+async def _run_parse(fn, *args, shed: bool = False):
+    """Run a parser entry point on the bounded parse pool (worker processes
+    or threads). With shed=True it may be refused with a 503 instead."""
+    result, timings = await _parse_executor.run(collect_stage_times, fn, *args, shed=shed)
+    _observe_parse_stages(timings)
+    return result
+
+
+async def _parse_and_log(text: str, shed: bool = False) -> dict:
+    """parse_workout_text() on the parse pool, logged as training data.
+    Concurrent calls for the same normalized text share one parse (and one
+    log record)."""
+    async def parse():
+        result = await _run_parse(parse_workout_text, text, shed=shed)
+        training_logger.log([result])
+        return result
+
+    # Same normalization as the parser's result cache
+    result = await parse_flights.do((" ".join(text.split()), shed), parse)
+    if result["original_text"] != text:
+        result = {**result, "original_text": text}
+    return result
+
+
+def _check_text_length(text: str):
+    if PARSE_MAX_CHARS and len(text) > PARSE_MAX_CHARS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Text too long ({len(text)} characters, max {PARSE_MAX_CHARS})"
+        )
+
+
+@app.post("/parse")
+async def parse_workout(request: ParseRequest):
+    _check_text_length(request.text)
+    try:
+        return await _parse_and_log(request.text, shed=True)
+    except AdmissionRejected as e:
+        raise _http_error(e)
+
+
+async def _wait_for_model(timeout: float):
+    """Wait up to `timeout` seconds for the model to finish loading and
+    warming up, in-process or in every parse worker."""
+    if _parse_pool is None:
+        await asyncio.to_thread(start_model_loading(ner_only=SPACY_NER_ONLY).join, timeout)
+    elif _pool_warmup:
+        await asyncio.wait([asyncio.wrap_future(f) for f in _pool_warmup], timeout=timeout)
 
+
+async def _transcribe_and_parse(file: UploadFile) -> dict:
+    """Transcribe, then parse. Waiting for the model overlaps with the
+    upstream transcription call, so on a cold instance the load/warm-up is
+    hidden behind Whisper latency."""
+    model_ready = asyncio.create_task(_wait_for_model(MODEL_READY_WAIT))
     try:
-        # Save uploaded file temporarily
-        with open(audio_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        # Send to Groq Whisper API
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            with open(audio_path, "rb") as audio_file:
-                response = await client.post(
-                    GROQ_API_URL,
-                    headers={
-                        "Authorization": f"Bearer {GROQ_API_KEY}",
-                    },
-                    files={
-                        "file": (file.filename, audio_file, file.content_type or "audio/wav"),
-                    },
-                    data={
-                        "model": GROQ_WHISPER_MODEL,
-                        "language": "en",
-                    },
-                )
-
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=response.status_code,
-                detail=f"Groq API error: {response.text}"
-            )
-
-        result = response.json()
-        return {"text": result.get("text", "").strip()}
-
-    except httpx.TimeoutException:
-        raise HTTPException(status_code=504, detail="Transcription timed out")
-    except HTTPException:
+        text = await _transcribe_upload(file)
+    except BaseException:
+        model_ready.cancel()
         raise
+    await model_ready
+
+    return {"text": text, "parsed": await _parse_and_log(text)}
+
+
+@app.post("/transcribe-and-parse")
+async def transcribe_and_parse(request: Request, file: UploadFile = File(...)):
+    """Transcribe audio and parse the transcript in one round-trip."""
+    try:
+        admission.check_rate(_client_id(request))
+        check_upload_size(file, MAX_UPLOAD_BYTES)
+        return await _transcribe_and_parse(file)
+
+    except (TranscriptionError, AdmissionRejected) as e:
+        raise _http_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
 
 
-@app.post("/parse")
-def parse_workout(request: ParseRequest):
-    structured_data = parse_workout_text(request.text)
-
-    # Log valid transcriptions for dataset collection
-    if structured_data.get("original_text") and not structured_data.get("error"):
-        log_file = "training_data.csv"
-        file_exists = os.path.isfile(log_file)
-
-        with open(log_file, mode="a", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            if not file_exists:
-                writer.writerow(["timestamp", "transcription", "parsed_json"])
-
-            writer.writerow([
-                datetime.now().isoformat(),
-                structured_data["original_text"],
-                str(structured_data)
-            ])
-
-    return structured_data
+async def _transcribe_job(file: UploadFile) -> dict:
+    return {"text": await _transcribe_upload(file)}
+
+
+@app.post("/transcribe/jobs", status_code=202)
+async def submit_transcription_job(request: Request, file: UploadFile = File(...), parse: bool = False):
+    """Queue audio for transcription (and parsing, with ?parse=true) and
+    answer with a job id straight away. Poll GET /transcribe/jobs/{id} or
+    stream GET /transcribe/jobs/{id}/events for the result."""
+    try:
+        admission.check_rate(_client_id(request))
+        check_upload_size(file, MAX_UPLOAD_BYTES)
+    except (TranscriptionError, AdmissionRejected) as e:
+        raise _http_error(e)
+    try:
+        if parse:
+            job = await transcription_jobs.submit("transcribe-and-parse", file, _transcribe_and_parse)
+        else:
+            job = await transcription_jobs.submit("transcribe", file, _transcribe_job)
+    except JobQueueFull as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": str(round(e.retry_after))}
+        )
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/transcribe/jobs/{job.id}",
+        "events_url": f"/transcribe/jobs/{job.id}/events",
+    }
+
+
+def _get_job(job_id: str):
+    job = transcription_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return job
+
+
+@app.get("/transcribe/jobs/{job_id}")
+async def transcription_job(job_id: str):
+    """Job status, with `result` ({"text"} or {"text", "parsed"}) once done
+    or `error` ({"status_code", "detail"}) once failed."""
+    return _get_job(job_id).to_dict()
+
+
+@app.get("/transcribe/jobs/{job_id}/events")
+async def transcription_job_events(job_id: str):
+    """Server-Sent Events: `status` on each change, then `done` or `failed`
+    with the same body as GET /transcribe/jobs/{id}."""
+    return StreamingResponse(
+        job_events(_get_job(job_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/parse/batch")
+async def parse_workout_batch(request: BatchParseRequest):
+    """Parse a list of texts in one call; NER runs over them with nlp.pipe."""
+    if len(request.texts) > MAX_BATCH_TEXTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many texts in one batch (max {MAX_BATCH_TEXTS})"
+        )
+    if request.batch_size is not None and request.batch_size < 1:
+        raise HTTPException(status_code=422, detail="batch_size must be positive")
+    for text in request.texts:
+        _check_text_length(text)
+
+    batch_size = request.batch_size or PARSE_BATCH_SIZE
+    if _parse_pool is None:
+        results = await _run_parse(parse_workout_texts, request.texts, batch_size)
+    else:
+        # One contiguous chunk per worker, reassembled in input order
+        texts = request.texts
+        chunk = -(-len(texts) // PARSE_WORKERS) or 1
+        parts = await asyncio.gather(*(
+            _run_parse(parse_workout_texts, texts[i:i + chunk], batch_size)
+            for i in range(0, len(texts), chunk)
+        ))
+        results = [result for part in parts for result in part]
+
+    training_logger.log(results)
+    return {"results": results}
+
+
+@app.get("/parse/executor")
+async def parse_executor_stats():
+    """Parse pool saturation: pending calls, queue depth, shed requests and
+    queue-wait vs execution time percentiles, plus how many /parse calls
+    were coalesced onto an identical one in flight."""
+    return {**_parse_executor.stats(), "coalescing": parse_flights.stats()}
+
+
+@app.get("/parse/cache")
+def parse_cache_stats():
+    """Hit/miss/eviction counters for the parse result cache.
+
+    With PARSE_WORKERS each worker keeps its own cache; this reports the
+    API process only.
+    """
+    return cache_stats()
+
+
+@app.get("/admission")
+async def admission_stats():
+    """In-flight upstream transcriptions, wait-queue depth and rejection
+    counters for admission control."""
+    return admission.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of request, upstream, parse-stage, cache,
+    queue and admission metrics."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/training-log")
+def training_log_stats():
+    """Queue depth and write counters for the training-data logger."""
+    return training_logger.stats()
 
 
 @app.post("/assign")
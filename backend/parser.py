@@ -1,24 +1,134 @@
+import copy
+import functools
+import json
 import os
+import random
 import re
-from datetime import datetime, timedelta
-
-# SpaCy is optional — parser works with pure regex when unavailable
-try:
-    import spacy
-    model_path = "./output/model-best"
-    if os.path.exists(model_path):
-        nlp = spacy.load(model_path)
-        print(f"Loaded custom model from {model_path}")
-    else:
-        try:
-            nlp = spacy.load("en_core_web_sm")
-            print("Loaded generic model en_core_web_sm")
-        except OSError:
-            nlp = None
-            print("No spaCy base model found, using regex-only parsing")
-except ImportError:
-    nlp = None
-    print("SpaCy not installed — using regex-only parsing")
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+# SpaCy is optional — parser works with pure regex when unavailable.
+# The model is not loaded at import: start_model_loading() (or a blocking
+# load_model() call) loads and warms it up, and only then publishes it as
+# `nlp`. Until that happens every parse takes the regex-only path.
+nlp = None
+
+
+# ─── Pattern Registry ────────────────────────────────────────────────────────
+
+# Every regex the extractors use is compiled once here at import time and
+# registered by name, so a parse never goes through re's internal cache.
+_PATTERNS: dict[str, re.Pattern] = {}
+
+
+def _rx(name: str, pattern: str, flags: int = 0) -> re.Pattern:
+    """Compile `pattern` and register it under `name`."""
+    if name in _PATTERNS:
+        raise ValueError(f"Duplicate pattern name: {name}")
+    compiled = re.compile(pattern, flags)
+    _PATTERNS[name] = compiled
+    return compiled
+
+
+_RE_WORD = _rx("word", r"\w+")
+
+
+# ─── Parse Context ───────────────────────────────────────────────────────────
+
+class ParseContext:
+    """One input as seen by the extractors, built once per request.
+
+    Holds the original and lowercased text, the spaCy doc (or None) and the
+    results of every @_memoized extractor that has run against it.
+    """
+
+    __slots__ = ("text", "lower", "doc", "results", "_tokens", "_words")
+
+    def __init__(self, text: str, doc=None):
+        self.text = text
+        self.lower = text.lower()
+        self.doc = doc
+        self.results = {}
+        self._tokens = None
+        self._words = None
+
+    def segment(self, start: int, end: int) -> "ParseContext":
+        """Context for text[start:end] whose doc is a span of this doc.
+
+        Entity lookups on the segment read the existing parse instead of
+        running the model again.
+        """
+        span = None
+        if self.doc is not None:
+            span = self.doc.char_span(start, end, alignment_mode="expand")
+        return ParseContext(self.text[start:end], span)
+
+    @property
+    def tokens(self) -> list[tuple[int, int]]:
+        """(start, end) offsets of every word in the text."""
+        if self._tokens is None:
+            self._tokens = [m.span() for m in _RE_WORD.finditer(self.lower)]
+        return self._tokens
+
+    @property
+    def words(self) -> frozenset[str]:
+        """Set of lowercased words, for whole-word keyword checks."""
+        if self._words is None:
+            lower = self.lower
+            self._words = frozenset(lower[start:end] for start, end in self.tokens)
+        return self._words
+
+
+def _memoized(extractor):
+    """Compute `extractor(ctx)` at most once per ParseContext."""
+    key = extractor.__name__
+
+    @functools.wraps(extractor)
+    def wrapper(ctx: ParseContext):
+        results = ctx.results
+        if key not in results:
+            results[key] = extractor(ctx)
+        return results[key]
+
+    return wrapper
+
+
+# ─── Keyword Automaton ───────────────────────────────────────────────────────
+
+def _is_word_char(ch: str) -> bool:
+    """Same definition of a word character as re's \\w."""
+    return ch.isalnum() or ch == "_"
+
+
+class _KeywordMatcher:
+    """Finds every occurrence of a fixed set of keywords in a single scan.
+
+    One zero-width alternation, longest keyword first, reports the longest
+    keyword starting at each position; any shorter keyword starting there
+    must be a prefix of it, so those are filled in from a lookup table.
+    """
+
+    def __init__(self, name: str, keywords: list[str]):
+        unique = sorted(set(keywords), key=len, reverse=True)
+        self._pattern = _rx(name, "(?=(" + "|".join(re.escape(kw) for kw in unique) + "))")
+        self._prefixes = {kw: [k for k in unique if kw.startswith(k)] for kw in unique}
+
+    def scan(self, text_lower: str) -> tuple[frozenset[str], frozenset[str]]:
+        """Return (keywords found anywhere, keywords found as whole words)."""
+        found = set()
+        whole_words = set()
+        n = len(text_lower)
+        for m in self._pattern.finditer(text_lower):
+            start = m.start()
+            left_ok = start == 0 or not _is_word_char(text_lower[start - 1])
+            for kw in self._prefixes[m.group(1)]:
+                found.add(kw)
+                end = start + len(kw)
+                if left_ok and (end == n or not _is_word_char(text_lower[end])):
+                    whole_words.add(kw)
+        return frozenset(found), frozenset(whole_words)
 
 
 # ─── Date / Time Inference Helpers ───────────────────────────────────────────
@@ -29,10 +139,14 @@ DAY_MAP = {
     "mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5, "sun": 6,
 }
 
+_RE_IN_X_DAYS = _rx("in_x_days", r"in\s+(\d+)\s+days?")
+_RE_CLOCK_TIME = _rx("clock_time", r"(\d{1,2})(:\d{2})?\s*(am|pm)")
+
 
-def _infer_date(text: str) -> str | None:
+@_memoized
+def _infer_date(ctx: ParseContext) -> str | None:
     """Attempt to infer a concrete date from natural language."""
-    text_lower = text.lower()
+    text_lower = ctx.lower
     today = datetime.now()
 
     # "tomorrow"
@@ -50,7 +164,7 @@ def _infer_date(text: str) -> str | None:
         return d.strftime("%A, %B %d, %Y")
 
     # "in X days"
-    m = re.search(r"in\s+(\d+)\s+days?", text_lower)
+    m = _RE_IN_X_DAYS.search(text_lower)
     if m:
         d = today + timedelta(days=int(m.group(1)))
         return d.strftime("%A, %B %d, %Y")
@@ -73,9 +187,10 @@ def _infer_date(text: str) -> str | None:
         return f"Week of {mon.strftime('%B %d, %Y')}"
 
     # Named day: "monday", "tuesday", etc.
+    words = ctx.words
     for day_name, day_num in DAY_MAP.items():
-        # Use word boundary to avoid partial matches
-        if re.search(rf"\b{day_name}\b", text_lower):
+        # Whole words only, to avoid partial matches
+        if day_name in words:
             days_ahead = (day_num - today.weekday()) % 7
             if days_ahead == 0:
                 days_ahead = 7  # next occurrence
@@ -85,12 +200,13 @@ def _infer_date(text: str) -> str | None:
     return None
 
 
-def _infer_time(text: str) -> str | None:
+@_memoized
+def _infer_time(ctx: ParseContext) -> str | None:
     """Extract or infer time from text."""
-    text_lower = text.lower()
+    text_lower = ctx.lower
 
     # Specific time: "6am", "7:30pm", "6:00 am"
-    m = re.search(r"(\d{1,2})(:\d{2})?\s*(am|pm)", text_lower)
+    m = _RE_CLOCK_TIME.search(text_lower)
     if m:
         hour = int(m.group(1))
         minutes = m.group(2) or ":00"
@@ -134,11 +250,12 @@ _ACTIVITY_PRIORITY = [
 ]
 
 
-def _detect_activity(text: str) -> str | None:
-    text_lower = text.lower()
+@_memoized
+def _detect_activity(ctx: ParseContext) -> str | None:
+    whole_words = _keyword_hits(ctx)[1]
     for activity, keywords in _ACTIVITY_PRIORITY:
         for kw in keywords:
-            if re.search(rf"\b{re.escape(kw)}\b", text_lower):
+            if kw in whole_words:
                 return activity
     return None
 
@@ -156,11 +273,27 @@ _NAME_STOPWORDS = {
     "simulation", "race", "leg", "upper", "mobility", "conditioning",
 }
 
-
-def _extract_athlete(text: str, doc) -> str | None:
+_RE_ATHLETE_LEADING_COMMA = _rx("athlete_leading_comma", r"^\s*([A-ZÀ-ÖØ-Ý][a-zà-öø-ÿ]+)\s*,")
+_RE_ATHLETE_AFTER_VERB = _rx("athlete_after_verb", r"(?:assign|give|schedule)\s+(\w+)", re.IGNORECASE)
+_RE_ATHLETE_TO_NAME = _rx("athlete_to_name", r"(?:assign|give)\s+.*?\s+to\s+(\w+)", re.IGNORECASE)
+_RE_ATHLETE_NEEDS_TO = _rx(
+    "athlete_needs_to", r"^(\w+)\s+(?:needs?\s+to|should|will|has|have|gotta)\b", re.IGNORECASE
+)
+_RE_ATHLETE_FOR_NAME = _rx("athlete_for_name", r"\bfor\s+([A-ZÀ-ÖØ-Ý][a-zà-öø-ÿ]+)\s*[.,!]?\s*$")
+_RE_MULTIPLE_ATHLETES = _rx(
+    "multiple_athletes",
+    r"(\w+)\s+and\s+(\w+)\s+(?:both|all|each)?\s*(?:need|should|will|have)\b",
+    re.IGNORECASE,
+)
+
+
+@_memoized
+def _extract_athlete(ctx: ParseContext) -> str | None:
     """Extract athlete name via NER then regex fallback."""
+    text, doc = ctx.text, ctx.doc
+
     # Priority 1: "Name, ..." pattern (name before first comma)
-    m = re.match(r"^\s*([A-ZÀ-ÖØ-Ý][a-zà-öø-ÿ]+)\s*,", text)
+    m = _RE_ATHLETE_LEADING_COMMA.match(text)
     if m:
         candidate = m.group(1)
         if candidate.lower() not in _NAME_STOPWORDS:
@@ -173,28 +306,28 @@ def _extract_athlete(text: str, doc) -> str | None:
                 return ent.text.title()
 
     # Priority 3: "assign/give/schedule <Name>"
-    m = re.search(r"(?:assign|give|schedule)\s+(\w+)", text, re.IGNORECASE)
+    m = _RE_ATHLETE_AFTER_VERB.search(text)
     if m:
         candidate = m.group(1)
         if candidate.lower() not in _NAME_STOPWORDS:
             return candidate.title()
 
     # Priority 4: "... to <Name>"
-    m = re.search(r"(?:assign|give)\s+.*?\s+to\s+(\w+)", text, re.IGNORECASE)
+    m = _RE_ATHLETE_TO_NAME.search(text)
     if m:
         candidate = m.group(1)
         if candidate.lower() not in _NAME_STOPWORDS:
             return candidate.title()
 
     # Priority 5: "<Name> needs to / should / will"
-    m = re.search(r"^(\w+)\s+(?:needs?\s+to|should|will|has|have|gotta)\b", text, re.IGNORECASE)
+    m = _RE_ATHLETE_NEEDS_TO.search(text)
     if m:
         candidate = m.group(1)
         if candidate.lower() not in _NAME_STOPWORDS:
             return candidate.title()
 
     # Priority 6: "for <Name>" at end
-    m = re.search(r"\bfor\s+([A-ZÀ-ÖØ-Ý][a-zà-öø-ÿ]+)\s*[.,!]?\s*$", text)
+    m = _RE_ATHLETE_FOR_NAME.search(text)
     if m:
         candidate = m.group(1)
         if candidate.lower() not in _NAME_STOPWORDS:
@@ -203,9 +336,10 @@ def _extract_athlete(text: str, doc) -> str | None:
     return None
 
 
-def _extract_multiple_athletes(text: str) -> list[str] | None:
+@_memoized
+def _extract_multiple_athletes(ctx: ParseContext) -> list[str] | None:
     """Check for 'X and Y' pattern to detect multiple athletes."""
-    m = re.search(r"(\w+)\s+and\s+(\w+)\s+(?:both|all|each)?\s*(?:need|should|will|have)\b", text, re.IGNORECASE)
+    m = _RE_MULTIPLE_ATHLETES.search(ctx.text)
     if m:
         stopwords = {"he", "she", "they", "it", "you", "we", "i"}
         a1 = m.group(1)
@@ -215,19 +349,27 @@ def _extract_multiple_athletes(text: str) -> list[str] | None:
     return None
 
 
-def _extract_distance(text: str, doc) -> str | None:
-    text_lower = text.lower()
+_RE_NER_DISTANCE = _rx("ner_distance", r"\d+\s*(?:km|kilometers?|miles?|k\b|meters?|metres?|m\b)")
+_RE_DISTANCE_UNIT = _rx("distance_unit", r"(\d+(?:\.\d+)?)\s*(km|kilometers?|kilometres?|miles?|k)\b")
+_RE_DISTANCE_METERS = _rx("distance_meters", r"(\d+(?:\.\d+)?)\s*(m(?:eters?|etres?)?)\b")
+_RE_CALORIE_CONTEXT = _rx("calorie_context", r"(?:calorie|cal|kcal|burn|target)\s*$")
+
+
+@_memoized
+def _extract_distance(ctx: ParseContext) -> str | None:
+    doc = ctx.doc
+    text_lower = ctx.lower
 
     # First try spaCy NER, but validate it looks like a real distance
     if doc:
         for ent in doc.ents:
             if ent.label_ == "DISTANCE":
                 # Validate: must contain a number + unit
-                if re.search(r"\d+\s*(?:km|kilometers?|miles?|k\b|meters?|metres?|m\b)", ent.text.lower()):
+                if _RE_NER_DISTANCE.search(ent.text.lower()):
                     return ent.text
 
     # Priority 1: Explicit distance units (km, kilometers, miles, k)
-    m = re.search(r"(\d+(?:\.\d+)?)\s*(km|kilometers?|kilometres?|miles?|k)\b", text_lower)
+    m = _RE_DISTANCE_UNIT.search(text_lower)
     if m:
         val = m.group(1)
         unit = m.group(2)
@@ -240,56 +382,67 @@ def _extract_distance(text: str, doc) -> str | None:
         return f"{val} {unit}"
 
     # Priority 2: meters — but only when NOT near calorie/calorie-like context
-    m = re.search(r"(\d+(?:\.\d+)?)\s*(m(?:eters?|etres?)?)\b", text_lower)
+    m = _RE_DISTANCE_METERS.search(text_lower)
     if m:
         val = m.group(1)
         # Check context before the number to skip calorie values
         start_pos = m.start()
         preceding = text_lower[max(0, start_pos - 25):start_pos]
-        if not re.search(r"(?:calorie|cal|kcal|burn|target)\s*$", preceding):
+        if not _RE_CALORIE_CONTEXT.search(preceding):
             return f"{val} meters"
 
     return None
 
 
-def _extract_pace(text: str, doc) -> str | None:
+_RE_DIGIT = _rx("digit", r"\d")
+_RE_SWIM_PACE = _rx("swim_pace", r"(\d{1,2}:\d{2})\s*(?:per|/)\s*(?:100\s*(?:m(?:eters?)?|metres?))")
+_RE_UNIT_PACE = _rx("unit_pace", r"(\d{1,2}:\d{2})\s*(?:pace\s+)?(?:/\s*km|per\s*km|/\s*mile|per\s*mile)")
+_RE_BARE_PACE = _rx("bare_pace", r"(?:at|@)\s+(\d{1,2}:\d{2})\s*(?:pace|min)")
+_RE_KMPH = _rx("kmph", r"(\d+(?:\.\d+)?)\s*(?:km/?h|kmph)")
+_RE_MPH = _rx("mph", r"(\d+(?:\.\d+)?)\s*mph")
+
+
+@_memoized
+def _extract_pace(ctx: ParseContext) -> str | None:
+    doc = ctx.doc
     if doc:
         for ent in doc.ents:
-            if ent.label_ == "PACE" and re.search(r"\d", ent.text):
+            if ent.label_ == "PACE" and _RE_DIGIT.search(ent.text):
                 return ent.text
 
-    text_lower = text.lower()
+    text_lower = ctx.lower
 
     # Swim pace: "1:45 per 100 meters", "1:45/100m"
-    m = re.search(r"(\d{1,2}:\d{2})\s*(?:per|/)\s*(?:100\s*(?:m(?:eters?)?|metres?))", text_lower)
+    m = _RE_SWIM_PACE.search(text_lower)
     if m:
         return f"{m.group(1)}/100m"
 
     # "5:30 pace per km", "5:30/km", "5:00 per km", "5:30 per mile"
-    m = re.search(r"(\d{1,2}:\d{2})\s*(?:pace\s+)?(?:/\s*km|per\s*km|/\s*mile|per\s*mile)", text_lower)
+    m = _RE_UNIT_PACE.search(text_lower)
     if m:
         if "mile" in m.group(0):
             return f"{m.group(1)}/mile"
         return f"{m.group(1)}/km"
 
     # "at 5:30 pace" (standalone pace with no unit — default to /km)
-    m = re.search(r"(?:at|@)\s+(\d{1,2}:\d{2})\s*(?:pace|min)", text_lower)
+    m = _RE_BARE_PACE.search(text_lower)
     if m:
         return f"{m.group(1)}/km"
 
     # "25 km/h", "25 kmph", "10 mph", "30 kmph"
-    m = re.search(r"(\d+(?:\.\d+)?)\s*(?:km/?h|kmph)", text_lower)
+    m = _RE_KMPH.search(text_lower)
     if m:
         return f"{m.group(1)} kmph"
-    m = re.search(r"(\d+(?:\.\d+)?)\s*mph", text_lower)
+    m = _RE_MPH.search(text_lower)
     if m:
         return f"{m.group(1)} mph"
 
     return None
 
 
-def _extract_intensity(text: str) -> str | None:
-    text_lower = text.lower()
+@_memoized
+def _extract_intensity(ctx: ParseContext) -> str | None:
+    text_lower = ctx.lower
     if "easy" in text_lower or "recovery" in text_lower:
         return "Easy"
     if "moderate" in text_lower or "steady" in text_lower:
@@ -303,60 +456,79 @@ def _extract_intensity(text: str) -> str | None:
     return None
 
 
-def _extract_location(text: str) -> str | None:
-    text_lower = text.lower()
-
-    # Qualified locations: "indoor heated pool", "flat road", "running track"
-    qualified_patterns = [
-        (r"indoor\s+heated\s+pool", "Indoor heated pool"),
-        (r"outdoor\s+pool", "Outdoor pool"),
-        (r"indoor\s+pool", "Indoor pool"),
-        (r"heated\s+pool", "Heated pool"),
-        (r"running\s+track", "Running track"),
-        (r"flat\s+road(?:\s+route)?", "Flat road"),
-        (r"flat\s+route", "Flat route"),
-        (r"hilly\s+(?:road|route|terrain)", "Hilly terrain"),
-        (r"trail\s+(?:route|path|run)", "Trail"),
-        (r"sports\s+complex", "Sports complex"),
+# Qualified locations: "indoor heated pool", "flat road", "running track".
+# Each pattern starts with its literal anchor word; the pattern only runs
+# when the keyword automaton has seen that anchor.
+_QUALIFIED_LOCATION_PATTERNS = [
+    (anchor, _rx(f"location:{name}", pat), name)
+    for anchor, pat, name in [
+        ("indoor", r"indoor\s+heated\s+pool", "Indoor heated pool"),
+        ("outdoor", r"outdoor\s+pool", "Outdoor pool"),
+        ("indoor", r"indoor\s+pool", "Indoor pool"),
+        ("heated", r"heated\s+pool", "Heated pool"),
+        ("running", r"running\s+track", "Running track"),
+        ("flat", r"flat\s+road(?:\s+route)?", "Flat road"),
+        ("flat", r"flat\s+route", "Flat route"),
+        ("hilly", r"hilly\s+(?:road|route|terrain)", "Hilly terrain"),
+        ("trail", r"trail\s+(?:route|path|run)", "Trail"),
+        ("sports", r"sports\s+complex", "Sports complex"),
     ]
-    for pat, name in qualified_patterns:
-        if re.search(pat, text_lower):
+]
+
+# Basic locations
+_LOCATION_KEYWORDS = {
+    "gym": "Gym", "pool": "Pool", "track": "Track",
+    "park": "Park", "home": "Home", "studio": "Studio",
+    "outdoor": "Outdoor", "indoor": "Indoor",
+    "trail": "Trail", "road": "Road",
+}
+
+_RE_PREFERRED_TERRAIN = _rx("preferred_terrain", r"(flat|hilly|road|trail)\s+(?:preferred|recommended)")
+_RE_NO_HILLS = _rx("no_hills", r"no\s+hills?\b|avoid\s+hills?\b")
+
+
+@_memoized
+def _extract_location(ctx: ParseContext) -> str | None:
+    text_lower = ctx.lower
+    found, whole_words = _keyword_hits(ctx)
+
+    for anchor, pattern, name in _QUALIFIED_LOCATION_PATTERNS:
+        if anchor in found and pattern.search(text_lower):
             return name
 
-    # Basic locations
-    locations = {
-        "gym": "Gym", "pool": "Pool", "track": "Track",
-        "park": "Park", "home": "Home", "studio": "Studio",
-        "outdoor": "Outdoor", "indoor": "Indoor",
-        "trail": "Trail", "road": "Road",
-    }
-    for kw, name in locations.items():
-        if re.search(rf"\b{kw}\b", text_lower):
+    for kw, name in _LOCATION_KEYWORDS.items():
+        if kw in whole_words:
             return name
 
     # Preferred terrain: "flat road preferred"
-    m = re.search(r"(flat|hilly|road|trail)\s+(?:preferred|recommended)", text_lower)
+    m = _RE_PREFERRED_TERRAIN.search(text_lower)
     if m:
         return m.group(0).title()
 
     # Route constraints: "no hills", "avoid hills"
-    if re.search(r"no\s+hills?\b|avoid\s+hills?\b", text_lower):
+    if _RE_NO_HILLS.search(text_lower):
         return "Flat (no hills)"
 
     return None
 
 
-def _extract_duration(text: str) -> str | None:
+_RE_DURATION_COMPOSITE = _rx("duration_composite", r"(\d+)\s*(?:hours?|hrs?)\s*(\d+)\s*(?:minutes?|mins?)")
+_RE_DURATION_TOTAL = _rx("duration_total", r"total\s+(?:session|duration|time|target\s+time)\s+(\d+)\s*(minutes?|mins?|hours?|hrs?)")
+_RE_DURATION_ANY = _rx("duration_any", r"(\d+)\s*(minutes?|mins?|hours?|hrs?|seconds?|secs?)")
+
+
+@_memoized
+def _extract_duration(ctx: ParseContext) -> str | None:
     """Extract main workout duration, ignoring rest intervals."""
-    text_lower = text.lower()
+    text_lower = ctx.lower
 
     # Composite: "3 hours 30 minutes", "1 hour 45 min"
-    m = re.search(r"(\d+)\s*(?:hours?|hrs?)\s*(\d+)\s*(?:minutes?|mins?)", text_lower)
+    m = _RE_DURATION_COMPOSITE.search(text_lower)
     if m:
         return f"{m.group(1)} hours {m.group(2)} minutes"
 
     # "total session 90 minutes", "total duration 60 min"
-    m = re.search(r"total\s+(?:session|duration|time|target\s+time)\s+(\d+)\s*(minutes?|mins?|hours?|hrs?)", text_lower)
+    m = _RE_DURATION_TOTAL.search(text_lower)
     if m:
         val = m.group(1)
         unit = m.group(2)
@@ -366,7 +538,7 @@ def _extract_duration(text: str) -> str | None:
             return f"{val} hours"
 
     # Skip patterns that are rest intervals
-    for m in re.finditer(r"(\d+)\s*(minutes?|mins?|hours?|hrs?|seconds?|secs?)", text_lower):
+    for m in _RE_DURATION_ANY.finditer(text_lower):
         val = m.group(1)
         unit = m.group(2)
         context_after = text_lower[m.end():m.end()+15]
@@ -385,44 +557,80 @@ def _extract_duration(text: str) -> str | None:
     return None
 
 
-def _extract_calories(text: str) -> str | None:
-    text_lower = text.lower()
+_RE_CALORIES_UNIT = _rx("calories_unit", r"(\d+)\s*(?:calories?|cals?|kcal)")
+_RE_CALORIES_TARGET = _rx("calories_target", r"calorie\s+(?:burn\s+)?(?:target|goal|aim)\s+(\d+)")
+_RE_CALORIES_BURN = _rx("calories_burn", r"(?:target|burn|aim)\s+(?:around\s+|approximately\s+)?(\d+)\s*(?:calories?|cals?|kcal)?")
+_RE_CALORIES_BURN_AROUND = _rx("calories_burn_around", r"calorie\s+burn\s+(?:around\s+)?(\d+)")
+
+
+@_memoized
+def _extract_calories(ctx: ParseContext) -> str | None:
+    text_lower = ctx.lower
     # "1200 calories", "900 cal", "2000 kcal"
-    m = re.search(r"(\d+)\s*(?:calories?|cals?|kcal)", text_lower)
+    m = _RE_CALORIES_UNIT.search(text_lower)
     if m:
         return m.group(1)
     # "calorie target 600", "calorie burn target 900"
-    m = re.search(r"calorie\s+(?:burn\s+)?(?:target|goal|aim)\s+(\d+)", text_lower)
+    m = _RE_CALORIES_TARGET.search(text_lower)
     if m:
         return m.group(1)
     # "target 900 calories", "burn around 1200"
-    m = re.search(r"(?:target|burn|aim)\s+(?:around\s+|approximately\s+)?(\d+)\s*(?:calories?|cals?|kcal)?", text_lower)
+    m = _RE_CALORIES_BURN.search(text_lower)
     if m:
         # Make sure we're not matching a distance or non-calorie number
         val = int(m.group(1))
         if val >= 100:  # calories are typically > 100
             return m.group(1)
     # "calorie burn around 1200"
-    m = re.search(r"calorie\s+burn\s+(?:around\s+)?(\d+)", text_lower)
+    m = _RE_CALORIES_BURN_AROUND.search(text_lower)
     if m:
         return m.group(1)
     return None
 
 
-def _extract_strength_details(text: str) -> dict:
+_RE_STRENGTH_SETS_OF = _rx("strength_sets_of", r"(\d+)\s*(?:sets?\s*(?:of|x)\s*)(\d+)\s*(?:reps?)?")
+_RE_STRENGTH_NXN = _rx("strength_nxn", r"\b(\d+)\s*x\s*(\d+)\b")
+_RE_STRENGTH_WEIGHT = _rx("strength_weight", r"(\d+(?:\.\d+)?)\s*(kg|lbs?|pounds?)\s*(?:dumbbells?|barbell)?")
+
+# Common exercise names for strength sessions
+_EXERCISE_PATTERNS = [
+    (_rx(f"exercise:{name}", pat), name)
+    for pat, name in [
+        (r"(bench\s*press)", "Bench Press"),
+        (r"(squats?)", "Squats"),
+        (r"(deadlifts?)", "Deadlifts"),
+        (r"(leg\s*press)", "Leg Press"),
+        (r"(lunges?)", "Lunges"),
+        (r"(pull[-\s]?ups?)", "Pull-ups"),
+        (r"(push[-\s]?ups?)", "Push-ups"),
+        (r"(bent\s*(?:over\s+)?rows?)", "Bent Rows"),
+        (r"(curls?)", "Curls"),
+        (r"(shoulder\s*press)", "Shoulder Press"),
+        (r"(overhead\s*press)", "Overhead Press"),
+        (r"(plank)", "Plank"),
+        (r"(sit[-\s]?ups?)", "Sit-ups"),
+        (r"(crunches?)", "Crunches"),
+        (r"(dips?)\b", "Dips"),
+        (r"(lat\s*pull\s*downs?)", "Lat Pulldowns"),
+    ]
+]
+
+
+@_memoized
+def _extract_strength_details(ctx: ParseContext) -> dict:
     """Extract sets, reps, weight, and individual exercises."""
     result = {}
-    text_lower = text.lower()
+    text_lower = ctx.lower
 
     # Global sets/reps: "5 sets of 5 reps" or "5x5" or "4 sets of 8"
-    m = re.search(r"(\d+)\s*(?:sets?\s*(?:of|x)\s*)(\d+)\s*(?:reps?)?", text_lower)
+    m = _RE_STRENGTH_SETS_OF.search(text_lower)
     if m:
         result["sets"] = m.group(1)
         result["reps"] = m.group(2)
 
     if not m:
         # "5x5" pattern
-        m = re.search(r"\b(\d+)\s*x\s*(\d+)\b", text_lower)
+        m = _RE_STRENGTH_NXN.search(text_lower)
         if m:
             result["sets"] = m.group(1)
             result["reps"] = m.group(2)
@@ -432,7 +640,7 @@ def _extract_strength_details(text: str) -> dict:
         result["reps"] = "To failure"
 
     # Weight: "80kg", "30 kg", "80 lbs", "30kg dumbbells"
-    m = re.search(r"(\d+(?:\.\d+)?)\s*(kg|lbs?|pounds?)\s*(?:dumbbells?|barbell)?", text_lower)
+    m = _RE_STRENGTH_WEIGHT.search(text_lower)
     if m:
         val = m.group(1)
         unit = m.group(2)
@@ -444,26 +652,8 @@ def _extract_strength_details(text: str) -> dict:
 
     # Individual exercises: look for common exercise names
     exercises = []
-    exercise_patterns = [
-        (r"(bench\s*press)", "Bench Press"),
-        (r"(squats?)", "Squats"),
-        (r"(deadlifts?)", "Deadlifts"),
-        (r"(leg\s*press)", "Leg Press"),
-        (r"(lunges?)", "Lunges"),
-        (r"(pull[-\s]?ups?)", "Pull-ups"),
-        (r"(push[-\s]?ups?)", "Push-ups"),
-        (r"(bent\s*(?:over\s+)?rows?)", "Bent Rows"),
-        (r"(curls?)", "Curls"),
-        (r"(shoulder\s*press)", "Shoulder Press"),
-        (r"(overhead\s*press)", "Overhead Press"),
-        (r"(plank)", "Plank"),
-        (r"(sit[-\s]?ups?)", "Sit-ups"),
-        (r"(crunches?)", "Crunches"),
-        (r"(dips?)\b", "Dips"),
-        (r"(lat\s*pull\s*downs?)", "Lat Pulldowns"),
-    ]
-    for pattern, name in exercise_patterns:
-        if re.search(pattern, text_lower):
+    for pattern, name in _EXERCISE_PATTERNS:
+        if pattern.search(text_lower):
             exercises.append(name)
 
     if exercises:
@@ -472,44 +662,52 @@ def _extract_strength_details(text: str) -> dict:
     return result
 
 
-def _extract_hiit_details(text: str) -> dict:
+_RE_HIIT_WORK = _rx("hiit_work", r"(\d+)\s*(?:seconds?|secs?|s)\s*(?:work|on)")
+_RE_HIIT_REST = _rx("hiit_rest", r"(\d+)\s*(?:seconds?|secs?|s)\s*(?:rest|off)")
+_RE_HIIT_ROUNDS = _rx("hiit_rounds", r"(\d+)\s*rounds?")
+_RE_HIIT_TOTAL = _rx("hiit_total", r"total\s+(\d+)\s*(minutes?|mins?)")
+
+
+@_memoized
+def _extract_hiit_details(ctx: ParseContext) -> dict:
     """Extract HIIT-specific details: work/rest durations, rounds."""
     result = {}
-    text_lower = text.lower()
+    text_lower = ctx.lower
 
     # Work duration: "30 seconds work"
-    m = re.search(r"(\d+)\s*(?:seconds?|secs?|s)\s*(?:work|on)", text_lower)
+    m = _RE_HIIT_WORK.search(text_lower)
     if m:
         result["work_duration"] = f"{m.group(1)} seconds"
 
     # Rest duration: "15 seconds rest"
-    m = re.search(r"(\d+)\s*(?:seconds?|secs?|s)\s*(?:rest|off)", text_lower)
+    m = _RE_HIIT_REST.search(text_lower)
     if m:
         result["rest_duration"] = f"{m.group(1)} seconds"
 
     # Rounds: "20 rounds" or "for 20 rounds"
-    m = re.search(r"(\d+)\s*rounds?", text_lower)
+    m = _RE_HIIT_ROUNDS.search(text_lower)
     if m:
         result["rounds"] = m.group(1)
 
     # Total duration
-    m = re.search(r"total\s+(\d+)\s*(minutes?|mins?)", text_lower)
+    m = _RE_HIIT_TOTAL.search(text_lower)
     if m:
         result["total_duration"] = f"{m.group(1)} minutes"
 
     return result
 
 
-def _extract_multiple_days(text: str) -> list[str] | None:
+@_memoized
+def _extract_multiple_days(ctx: ParseContext) -> list[str] | None:
     """Check for multiple day mentions like 'Monday Wednesday Friday'."""
-    text_lower = text.lower()
     found_days = []
     today = datetime.now()
+    words = ctx.words
 
     for day_name, day_num in DAY_MAP.items():
         if len(day_name) <= 3:
             continue  # skip abbreviations to avoid double-counting
-        if re.search(rf"\b{day_name}\b", text_lower):
+        if day_name in words:
             days_ahead = (day_num - today.weekday()) % 7
             if days_ahead == 0:
                 days_ahead = 7
@@ -522,61 +720,80 @@ def _extract_multiple_days(text: str) -> list[str] | None:
     return None
 
 
-def _extract_heart_rate(text: str) -> str | None:
+_RE_HR_NOT_EXCEED = _rx("hr_not_exceed", r"not\s+exceed(?:ing)?\s+(\d{2,3})")
+_RE_HR_BELOW = _rx("hr_below", r"(?:heart\s*rate|hr)\s*(?:below|under|less\s*than|<|max|not\s+exceeding)\s*(\d{2,3})")
+_RE_HR_ABOVE = _rx("hr_above", r"(?:heart\s*rate|hr)\s*(?:above|over|more\s*than|>|min)\s*(\d{2,3})")
+_RE_HR_ZONE_RANGE = _rx("hr_zone_range", r"zone\s*(\d)\s*(?:to|-|and)\s*(\d)")
+_RE_HR_ZONE_WORK = _rx("hr_zone_work", r"zone\s*(\d)\s*(?:work|during\s*work|on|active)")
+_RE_HR_ZONE_REST = _rx("hr_zone_rest", r"zone\s*(\d)\s*(?:rest|during\s*rest|off|recovery)")
+_RE_HR_ZONE = _rx("hr_zone", r"zone\s*(\d)")
+_RE_HR_BPM = _rx("hr_bpm", r"(?:heart\s*rate|hr)\s*(?:at|around)?\s*(\d{2,3})\s*(?:bpm|beats)?")
+
+
+@_memoized
+def _extract_heart_rate(ctx: ParseContext) -> str | None:
     """Extract heart rate targets, zones, ranges, and constraints."""
-    text_lower = text.lower()
+    text_lower = ctx.lower
 
     # "not exceeding 160", "should not exceed 160"
-    m = re.search(r"not\s+exceed(?:ing)?\s+(\d{2,3})", text_lower)
+    m = _RE_HR_NOT_EXCEED.search(text_lower)
     if m:
         return f"Below {m.group(1)} bpm"
 
     # "heart rate below/under 150"
-    m = re.search(r"(?:heart\s*rate|hr)\s*(?:below|under|less\s*than|<|max|not\s+exceeding)\s*(\d{2,3})", text_lower)
+    m = _RE_HR_BELOW.search(text_lower)
     if m:
         return f"Below {m.group(1)} bpm"
 
     # "heart rate above/over 120"
-    m = re.search(r"(?:heart\s*rate|hr)\s*(?:above|over|more\s*than|>|min)\s*(\d{2,3})", text_lower)
+    m = _RE_HR_ABOVE.search(text_lower)
     if m:
         return f"Above {m.group(1)} bpm"
 
     # Range zones: "zone 3 to 4", "zone 3-4", "zones 3 and 4"
-    m = re.search(r"zone\s*(\d)\s*(?:to|-|and)\s*(\d)", text_lower)
+    m = _RE_HR_ZONE_RANGE.search(text_lower)
     if m:
         return f"Zone {m.group(1)}-{m.group(2)}"
 
     # Dual zones: "zone 4 work, zone 2 rest" or "zone 4 during work zone 2 during rest"
-    m1 = re.search(r"zone\s*(\d)\s*(?:work|during\s*work|on|active)", text_lower)
-    m2 = re.search(r"zone\s*(\d)\s*(?:rest|during\s*rest|off|recovery)", text_lower)
+    m1 = _RE_HR_ZONE_WORK.search(text_lower)
+    m2 = _RE_HR_ZONE_REST.search(text_lower)
     if m1 and m2:
         return f"Zone {m1.group(1)} (work) / Zone {m2.group(1)} (rest)"
 
     # Single zone: "zone 2", "HR zone 3"
-    m = re.search(r"zone\s*(\d)", text_lower)
+    m = _RE_HR_ZONE.search(text_lower)
     if m:
         return f"Zone {m.group(1)}"
 
     # Specific BPM: "heart rate at 150"
-    m = re.search(r"(?:heart\s*rate|hr)\s*(?:at|around)?\s*(\d{2,3})\s*(?:bpm|beats)?", text_lower)
+    m = _RE_HR_BPM.search(text_lower)
     if m:
         return f"{m.group(1)} bpm"
 
     return None
 
 
-def _extract_swimming_details(text: str) -> dict:
+_RE_SWIM_SETS_OF = _rx("swim_sets_of", r"(\d+)\s*(?:sets?\s*(?:of|x)\s*)(\d+)\s*(?:m(?:eters?)?|metres?)")
+_RE_SWIM_NXN = _rx("swim_nxn", r"(\d+)\s*x\s*(\d+)\s*(?:m(?:eters?)?|metres?)?")
+_RE_SWIM_COMPLETE_IN = _rx("swim_complete_in", r"(?:complete|finish)\s*(?:in|within)\s*(\d+)\s*(?:minutes?|mins?)")
+_RE_SWIM_MAX = _rx("swim_max", r"(\d+)\s*(?:minutes?|mins?)\s*(?:maximum|max|limit|cap)")
+_RE_SWIM_UNDER = _rx("swim_under", r"(?:under|within|less\s*than)\s*(\d+)\s*(?:minutes?|mins?)")
+
+
+@_memoized
+def _extract_swimming_details(ctx: ParseContext) -> dict:
     """Extract swimming-specific details: sets, stroke, max duration."""
     result = {}
-    text_lower = text.lower()
+    text_lower = ctx.lower
 
     # Sets: "30 sets of 100 meters", "10x100m", "20 sets of 50m"
-    m = re.search(r"(\d+)\s*(?:sets?\s*(?:of|x)\s*)(\d+)\s*(?:m(?:eters?)?|metres?)", text_lower)
+    m = _RE_SWIM_SETS_OF.search(text_lower)
     if m:
         result["sets"] = m.group(1)
         result["set_distance"] = f"{m.group(2)}m"
     else:
-        m = re.search(r"(\d+)\s*x\s*(\d+)\s*(?:m(?:eters?)?|metres?)?", text_lower)
+        m = _RE_SWIM_NXN.search(text_lower)
         if m:
             result["sets"] = m.group(1)
             result["set_distance"] = f"{m.group(2)}m"
@@ -589,45 +806,57 @@ def _extract_swimming_details(text: str) -> dict:
             break
 
     # Max/target duration: "complete in 75 minutes", "75 minutes maximum", "under 60 min"
-    m = re.search(r"(?:complete|finish)\s*(?:in|within)\s*(\d+)\s*(?:minutes?|mins?)", text_lower)
+    m = _RE_SWIM_COMPLETE_IN.search(text_lower)
     if m:
         result["max_duration"] = f"{m.group(1)} minutes"
     else:
-        m = re.search(r"(\d+)\s*(?:minutes?|mins?)\s*(?:maximum|max|limit|cap)", text_lower)
+        m = _RE_SWIM_MAX.search(text_lower)
         if m:
             result["max_duration"] = f"{m.group(1)} minutes"
         else:
-            m = re.search(r"(?:under|within|less\s*than)\s*(\d+)\s*(?:minutes?|mins?)", text_lower)
+            m = _RE_SWIM_UNDER.search(text_lower)
             if m:
                 result["max_duration"] = f"{m.group(1)} minutes"
 
     return result
 
 
-def _extract_equipment(text: str) -> str | None:
+_RE_EQUIPMENT_BRING = _rx("equipment_bring", r"bring\s+(?:your\s+)?([\w\s]+?)(?:\s+and\s+([\w\s]+?))?(?:[,.]|$)")
+_RE_EQUIPMENT_MANDATORY = _rx("equipment_mandatory", r"(\w[\w\s]{2,20})\s+(?:are|is)\s+(?:mandatory|required|compulsory)")
+_RE_EQUIPMENT_BELT = _rx("equipment_belt", r"\bbelt\b")
+_RE_EQUIPMENT_STRAPS = _rx("equipment_straps", r"\bstraps\b")
+_RE_EQUIPMENT_MAT = _rx("equipment_mat", r"\bmat\b")
+_RE_EQUIPMENT_MEET = _rx("equipment_meet", r"meet\s+(?:at\s+)?(.{3,30}?)(?:\s+gate|\s*[,.]|$)")
+_RE_EQUIPMENT_TRANSITION = _rx("equipment_transition", r"transition\s+time\s+(?:under|less\s+than|within|<)\s*(\d+)\s*(?:minutes?|mins?)")
+
+# Equipment keywords (matched directly in text)
+_EQUIPMENT_KEYWORDS = [
+    ("knee sleeves", "Knee sleeves"), ("knee sleeve", "Knee sleeves"),
+    ("lifting belt", "Lifting belt"),
+    ("lifting straps", "Lifting straps"),
+    ("foam roller", "Foam roller"),
+    ("yoga mat", "Yoga mat"),
+    ("water bottle", "Water bottle"),
+    ("energy gel", "Energy gels"), ("energy gels", "Energy gels"),
+    ("electrolyte drink", "Electrolyte drink"), ("electrolyte", "Electrolyte drink"),
+    ("lifting gloves", "Lifting gloves"), ("gloves", "Gloves"),
+    ("spike shoes", "Spikes"), ("spikes", "Spikes"),
+]
+
+
+@_memoized
+def _extract_equipment(ctx: ParseContext) -> str | None:
     """Extract equipment, gear, and logistics mentions."""
-    text_lower = text.lower()
+    text_lower = ctx.lower
+    found = _keyword_hits(ctx)[0]
     items = []
 
-    # Equipment keywords (matched directly in text)
-    equipment_kw = [
-        ("knee sleeves", "Knee sleeves"), ("knee sleeve", "Knee sleeves"),
-        ("lifting belt", "Lifting belt"),
-        ("lifting straps", "Lifting straps"),
-        ("foam roller", "Foam roller"),
-        ("yoga mat", "Yoga mat"),
-        ("water bottle", "Water bottle"),
-        ("energy gel", "Energy gels"), ("energy gels", "Energy gels"),
-        ("electrolyte drink", "Electrolyte drink"), ("electrolyte", "Electrolyte drink"),
-        ("lifting gloves", "Lifting gloves"), ("gloves", "Gloves"),
-        ("spike shoes", "Spikes"), ("spikes", "Spikes"),
-    ]
-    for kw, label in equipment_kw:
-        if kw in text_lower and label not in items:
+    for kw, label in _EQUIPMENT_KEYWORDS:
+        if kw in found and label not in items:
             items.append(label)
 
     # "bring X and Y" → try to capture specific objects
-    m = re.search(r"bring\s+(?:your\s+)?([\w\s]+?)(?:\s+and\s+([\w\s]+?))?(?:[,.]|$)", text_lower)
+    m = _RE_EQUIPMENT_BRING.search(text_lower)
     if m:
         for grp in [m.group(1), m.group(2)]:
             if grp:
@@ -639,127 +868,163 @@ def _extract_equipment(text: str) -> str | None:
                         items.append(label)
 
     # "X are/is mandatory/required"
-    m = re.search(r"(\w[\w\s]{2,20})\s+(?:are|is)\s+(?:mandatory|required|compulsory)", text_lower)
+    m = _RE_EQUIPMENT_MANDATORY.search(text_lower)
     if m:
         item = m.group(1).strip().capitalize()
         if not any(item.lower() in existing.lower() for existing in items):
             items.append(f"{item} (mandatory)")
 
     # "belt" standalone (lifting context)
-    if re.search(r"\bbelt\b", text_lower) and "Lifting belt" not in items:
+    if _RE_EQUIPMENT_BELT.search(text_lower) and "Lifting belt" not in items:
         # Only add in strength context
         if any(w in text_lower for w in ["squat", "deadlift", "gym", "strength", "leg"]):
             items.append("Lifting belt")
 
     # "straps" standalone
-    if re.search(r"\bstraps\b", text_lower) and "Lifting straps" not in items:
+    if _RE_EQUIPMENT_STRAPS.search(text_lower) and "Lifting straps" not in items:
         if any(w in text_lower for w in ["pull", "row", "gym", "strength", "upper"]):
             items.append("Lifting straps")
 
     # "mat" standalone (yoga/mobility context)
-    if re.search(r"\bmat\b", text_lower) and "Yoga mat" not in items and "Mat" not in items:
+    if _RE_EQUIPMENT_MAT.search(text_lower) and "Yoga mat" not in items and "Mat" not in items:
         if any(w in text_lower for w in ["yoga", "mobility", "stretch", "foam"]):
             items.append("Mat")
 
     # Meeting point: "meet at X gate", "sports complex gate"
-    m = re.search(r"meet\s+(?:at\s+)?(.{3,30}?)(?:\s+gate|\s*[,.]|$)", text_lower)
+    m = _RE_EQUIPMENT_MEET.search(text_lower)
     if m:
         loc = m.group(1).strip()
         if len(loc) > 2:
             items.append(f"Meet at: {loc.capitalize()}")
 
     # Transition time: "transition time under 3 minutes"
-    m = re.search(r"transition\s+time\s+(?:under|less\s+than|within|<)\s*(\d+)\s*(?:minutes?|mins?)", text_lower)
+    m = _RE_EQUIPMENT_TRANSITION.search(text_lower)
     if m:
         items.append(f"Transition time < {m.group(1)} min")
 
     return "; ".join(items) if items else None
 
 
-def _extract_cadence(text: str) -> str | None:
+_RE_CADENCE_RPM_RANGE = _rx("cadence_rpm_range", r"(?:cadence\s+)?(\d{2,3})\s*[-–to]+\s*(\d{2,3})\s*rpm")
+_RE_CADENCE_RANGE = _rx("cadence_range", r"cadence\s+(\d{2,3})\s*(?:to|-)\s*(\d{2,3})")
+_RE_CADENCE_RPM = _rx("cadence_rpm", r"(\d{2,3})\s*rpm")
+
+
+@_memoized
+def _extract_cadence(ctx: ParseContext) -> str | None:
     """Extract cadence/RPM targets."""
-    text_lower = text.lower()
+    text_lower = ctx.lower
     # "85-90 rpm", "cadence 85 to 90"
-    m = re.search(r"(?:cadence\s+)?(\d{2,3})\s*[-–to]+\s*(\d{2,3})\s*rpm", text_lower)
+    m = _RE_CADENCE_RPM_RANGE.search(text_lower)
     if m:
         return f"{m.group(1)}-{m.group(2)} rpm"
-    m = re.search(r"cadence\s+(\d{2,3})\s*(?:to|-)\s*(\d{2,3})", text_lower)
+    m = _RE_CADENCE_RANGE.search(text_lower)
     if m:
         return f"{m.group(1)}-{m.group(2)} rpm"
-    m = re.search(r"(\d{2,3})\s*rpm", text_lower)
+    m = _RE_CADENCE_RPM.search(text_lower)
     if m:
         return f"{m.group(1)} rpm"
     return None
 
 
-def _extract_notes(text: str) -> str | None:
+# Plain keyword notes: any of the keywords (as a substring) adds the label
+_NOTE_KEYWORDS = [
+    (("nothing intense", "not intense"), "Recovery - not intense"),
+    (("warm up", "warmup"), "Include warm-up"),
+    (("cool down", "cooldown"), "Include cool-down"),
+    (("stretch",), "Include stretching"),
+]
+
+# Phrase tables below are (anchor, pattern, label): every match of the
+# pattern starts with the literal anchor, so it only runs when the keyword
+# automaton has seen the anchor.
+
+# Preparation/purpose phrases
+_NOTE_PREP_PATTERNS = [
+    (anchor, _rx(f"note_prep:{i}", pat), label)
+    for i, (anchor, pat, label) in enumerate([
+        ("marathon", r"marathon\s+preparation|marathon\s+prep", "Marathon preparation"),
+        ("race", r"race\s+(?:day\s+)?prep(?:aration)?", "Race preparation"),
+        ("base", r"base\s+building", "Base building"),
+        ("speed", r"speed\s+(?:block\s+)?(?:work|training)", "Speed work"),
+        ("endurance", r"endurance\s+training", "Endurance training"),
+        ("active", r"active\s+recovery", "Active recovery"),
+        ("form", r"form\s+(?:work|drill|focus)", "Form focus"),
+        ("technique", r"technique\s+(?:work|drill|focus)", "Technique focus"),
+        ("lactate", r"lactate\s+threshold\s+(?:work|training|run)", "Lactate threshold work"),
+        ("tempo", r"tempo\s+(?:work|training|run)", "Tempo work"),
+        ("race", r"race\s+day\s+simulation", "Race day simulation"),
+        ("equally", r"equally\s+important\s+as", "Equally important as hard training"),
+    ])
+]
+
+# Coaching emphasis
+_NOTE_COACHING_PATTERNS = [
+    (anchor, _rx(f"note_coaching:{i}", pat), label)
+    for i, (anchor, pat, label) in enumerate([
+        ("no", r"no\s+skipping\b", "No skipping"),
+        ("no", r"no\s+excuses?\b", "No excuses"),
+        ("strictly", r"\bstrictly\b", "Strict adherence"),
+        ("not", r"not\s+one\s+minute\s+late", "Be on time"),
+        ("be", r"be\s+(?:there\s+)?on\s+time", "Be on time"),
+        ("no", r"no\s+shortcuts?", "No shortcuts"),
+    ])
+]
+
+# Instruction phrases
+_NOTE_INSTRUCTION_PATTERNS = [
+    (anchor, _rx(f"note_instruction:{i}", pat), label)
+    for i, (anchor, pat, label) in enumerate([
+        ("do", r"do\s+not\s+push\s+beyond\b.*?pace", "Do not push beyond given pace"),
+        ("do", r"do\s+not\s+go\s+faster\b", "Do not go faster than prescribed"),
+        ("do", r"do\s+not\s+skip\b", "Do not skip"),
+    ])
+]
+
+_RE_FULL_FOCUS = _rx("full_focus", r"full\s+focus\s+(?:required|needed|mandatory)")
+_RE_COACH_PRESENT = _rx("coach_present", r"i\s+will\s+be\s+(?:there|watching|present|observing)")
+_RE_COACH_OBSERVE = _rx("coach_observe", r"i\s+(?:will|shall)\s+(?:observe|watch|monitor)")
+_RE_ONLY_QUALIFIER = _rx("only_qualifier", r"(\w[\w\s]{3,30})\s+only\s*[.,!]?\s*$")
+
+
+@_memoized
+def _extract_notes(ctx: ParseContext) -> str | None:
     """Extract special instructions, intentions, and notes."""
-    text_lower = text.lower()
+    text_lower = ctx.lower
+    found = _keyword_hits(ctx)[0]
     notes = []
 
-    if "nothing intense" in text_lower or "not intense" in text_lower:
-        notes.append("Recovery - not intense")
-    if "warm up" in text_lower or "warmup" in text_lower:
-        notes.append("Include warm-up")
-    if "cool down" in text_lower or "cooldown" in text_lower:
-        notes.append("Include cool-down")
-    if "stretch" in text_lower:
-        notes.append("Include stretching")
+    for keywords, label in _NOTE_KEYWORDS:
+        if any(kw in found for kw in keywords):
+            notes.append(label)
 
     # Preparation/purpose phrases
-    prep_patterns = [
-        (r"marathon\s+preparation|marathon\s+prep", "Marathon preparation"),
-        (r"race\s+(?:day\s+)?prep(?:aration)?", "Race preparation"),
-        (r"base\s+building", "Base building"),
-        (r"speed\s+(?:block\s+)?(?:work|training)", "Speed work"),
-        (r"endurance\s+training", "Endurance training"),
-        (r"active\s+recovery", "Active recovery"),
-        (r"form\s+(?:work|drill|focus)", "Form focus"),
-        (r"technique\s+(?:work|drill|focus)", "Technique focus"),
-        (r"lactate\s+threshold\s+(?:work|training|run)", "Lactate threshold work"),
-        (r"tempo\s+(?:work|training|run)", "Tempo work"),
-        (r"race\s+day\s+simulation", "Race day simulation"),
-        (r"equally\s+important\s+as", "Equally important as hard training"),
-    ]
-    for pat, label in prep_patterns:
-        if re.search(pat, text_lower):
+    for anchor, pattern, label in _NOTE_PREP_PATTERNS:
+        if anchor in found and pattern.search(text_lower):
             notes.append(label)
 
     # Full focus / motivation
-    if re.search(r"full\s+focus\s+(?:required|needed|mandatory)", text_lower):
+    if _RE_FULL_FOCUS.search(text_lower):
         notes.append("Full focus required")
 
     # Coaching emphasis: "no skipping", "no excuses", "strictly", "mandatory"
-    coaching_patterns = [
-        (r"no\s+skipping\b", "No skipping"),
-        (r"no\s+excuses?\b", "No excuses"),
-        (r"\bstrictly\b", "Strict adherence"),
-        (r"not\s+one\s+minute\s+late", "Be on time"),
-        (r"be\s+(?:there\s+)?on\s+time", "Be on time"),
-        (r"no\s+shortcuts?", "No shortcuts"),
-    ]
-    for pat, label in coaching_patterns:
-        if re.search(pat, text_lower):
+    for anchor, pattern, label in _NOTE_COACHING_PATTERNS:
+        if anchor in found and pattern.search(text_lower):
             notes.append(label)
 
     # Instruction phrases: "do not push beyond", "do not go faster"
-    instruction_patterns = [
-        (r"do\s+not\s+push\s+beyond\b.*?pace", "Do not push beyond given pace"),
-        (r"do\s+not\s+go\s+faster\b", "Do not go faster than prescribed"),
-        (r"do\s+not\s+skip\b", "Do not skip"),
-    ]
-    for pat, label in instruction_patterns:
-        if re.search(pat, text_lower):
+    for anchor, pattern, label in _NOTE_INSTRUCTION_PATTERNS:
+        if anchor in found and pattern.search(text_lower):
             notes.append(label)
 
     # Observer presence: "I will be there", "I shall observe"
-    if re.search(r"i\s+will\s+be\s+(?:there|watching|present|observing)", text_lower):
+    if _RE_COACH_PRESENT.search(text_lower):
         notes.append("Coach will be present")
-    if re.search(r"i\s+(?:will|shall)\s+(?:observe|watch|monitor)", text_lower):
+    if _RE_COACH_OBSERVE.search(text_lower):
         notes.append("Coach will observe")
 
     # "only" qualifier at end
-    m = re.search(r"(\w[\w\s]{3,30})\s+only\s*[.,!]?\s*$", text_lower)
+    m = _RE_ONLY_QUALIFIER.search(text_lower)
     if m:
         phrase = m.group(1).strip()
         already_covered = False
@@ -784,23 +1049,93 @@ def _extract_notes(text: str) -> str | None:
     return "; ".join(unique_notes) if unique_notes else None
 
 
-def _extract_progressive_paces(text: str) -> tuple[str | None, str | None]:
+_RE_CLOCK_PACE = _rx("clock_pace", r"(\d{1,2}:\d{2})")
+
+
+@_memoized
+def _extract_progressive_paces(ctx: ParseContext) -> tuple[str | None, str | None]:
     """Extract starting and finishing pace for progressive runs."""
-    text_lower = text.lower()
+    text_lower = ctx.lower
     if "progressive" not in text_lower:
         return None, None
 
-    paces = re.findall(r"(\d{1,2}:\d{2})", text_lower)
+    paces = _RE_CLOCK_PACE.findall(text_lower)
     if len(paces) >= 2:
         return f"{paces[0]}/km", f"{paces[1]}/km"
     return None, None
 
 
+_RE_REST_AFTER = _rx("rest_after", r"(?:rest|recovery)\s+(\d+)\s*(seconds?|secs?|s|minutes?|mins?)")
+_RE_REST_BEFORE = _rx("rest_before", r"(\d+)\s*(seconds?|secs?|s|minutes?|mins?)\s*(?:rest|recovery|between)")
+
+
+@_memoized
+def _extract_rest(ctx: ParseContext) -> str | None:
+    """Extract the rest period between efforts (non-HIIT) — seconds or minutes."""
+    text_lower = ctx.lower
+    m = _RE_REST_AFTER.search(text_lower)
+    if not m:
+        m = _RE_REST_BEFORE.search(text_lower)
+    if m:
+        val = m.group(1)
+        unit = m.group(2)
+        if unit.startswith("min"):
+            return f"{val} minutes"
+        return f"{val} seconds"
+    return None
+
+
+# One automaton over every keyword table above, plus the anchors of the
+# phrase tables, so each input is scanned for all of them in a single pass.
+_KEYWORDS = _KeywordMatcher(
+    "keywords",
+    [kw for _, keywords in _ACTIVITY_PRIORITY for kw in keywords]
+    + list(_LOCATION_KEYWORDS)
+    + [kw for kw, _ in _EQUIPMENT_KEYWORDS]
+    + [kw for keywords, _ in _NOTE_KEYWORDS for kw in keywords]
+    + [anchor for anchor, _, _ in _QUALIFIED_LOCATION_PATTERNS]
+    + [anchor for anchor, _, _ in _NOTE_PREP_PATTERNS]
+    + [anchor for anchor, _, _ in _NOTE_COACHING_PATTERNS]
+    + [anchor for anchor, _, _ in _NOTE_INSTRUCTION_PATTERNS]
+)
+
+
+@_memoized
+def _keyword_hits(ctx: ParseContext) -> tuple[frozenset[str], frozenset[str]]:
+    """(keywords found anywhere, keywords found as whole words) in the text."""
+    return _KEYWORDS.scan(ctx.lower)
+
+
 # ─── Main Parser ─────────────────────────────────────────────────────────────
 
-def _build_assignment(athlete: str, text: str, doc, activity: str | None,
+def _build_assignment(athlete: str, ctx: ParseContext, activity: str | None,
                       date_override: str | None = None) -> dict:
-    """Build a single assignment dict with dynamic attributes."""
+    """Build a single assignment dict with dynamic attributes.
+
+    The attributes are extracted once per (context, activity) and cloned
+    here, so fanning out over athletes and days only costs a copy each.
+    """
+    key = ("_extract_attributes", activity)
+    template = ctx.results.get(key)
+    if template is None:
+        template = ctx.results[key] = _extract_attributes(ctx, activity)
+    shared_attrs, date_index = template
+
+    attrs = [dict(a) for a in shared_attrs]
+    attrs[0]["value"] = athlete or "Unspecified"
+    if date_override:
+        attrs[date_index]["value"] = date_override
+
+    return {"attributes": attrs}
+
+
+def _extract_attributes(ctx: ParseContext, activity: str | None) -> tuple[list[dict], int]:
+    """Extract the attribute list shared by every assignment built from `ctx`.
+
+    Returns the attributes plus the index of the Date slot. Name and Date
+    are always present (possibly None) so _build_assignment can override
+    them per athlete and per day.
+    """
     attrs = []
 
     def add(key, value):
@@ -808,17 +1143,17 @@ def _build_assignment(athlete: str, text: str, doc, activity: str | None,
             attrs.append({"key": key, "value": value})
 
     # Core fields
-    add("Name", athlete or "Unspecified")
+    attrs.append({"key": "Name", "value": None})
 
     if not activity:
-        activity = _detect_activity(text)
+        activity = _detect_activity(ctx)
     add("Activity", activity or "General")
 
     # Build task description
-    distance = _extract_distance(text, doc)
-    pace = _extract_pace(text, doc)
-    intensity = _extract_intensity(text)
-    duration = _extract_duration(text)
+    distance = _extract_distance(ctx)
+    pace = _extract_pace(ctx)
+    intensity = _extract_intensity(ctx)
+    duration = _extract_duration(ctx)
 
     # Compose task string
     task_parts = []
@@ -836,7 +1171,7 @@ def _build_assignment(athlete: str, text: str, doc, activity: str | None,
     if pace:
         task_parts.append(f"@ {pace}")
 
-    task_desc = " ".join(task_parts).strip().capitalize() if task_parts else text.strip()
+    task_desc = " ".join(task_parts).strip().capitalize() if task_parts else ctx.text.strip()
     add("Task", task_desc)
 
     # Distance & pace
@@ -844,7 +1179,7 @@ def _build_assignment(athlete: str, text: str, doc, activity: str | None,
     add("Pace", pace)
 
     # Progressive paces
-    start_pace, finish_pace = _extract_progressive_paces(text)
+    start_pace, finish_pace = _extract_progressive_paces(ctx)
     if start_pace:
         add("Starting Pace", start_pace)
         add("Finishing Pace", finish_pace)
@@ -857,26 +1192,26 @@ def _build_assignment(athlete: str, text: str, doc, activity: str | None,
     add("Intensity", intensity)
 
     # Time & Date
-    time_val = _infer_time(text)
+    time_val = _infer_time(ctx)
     add("Time", time_val)
 
-    date_val = date_override or _infer_date(text)
-    add("Date", date_val)
+    date_index = len(attrs)
+    attrs.append({"key": "Date", "value": _infer_date(ctx)})
 
     # Location
-    add("Location", _extract_location(text))
+    add("Location", _extract_location(ctx))
 
     # Calories
-    add("Calories", _extract_calories(text))
+    add("Calories", _extract_calories(ctx))
 
     # Heart rate
-    add("Heart Rate", _extract_heart_rate(text))
+    add("Heart Rate", _extract_heart_rate(ctx))
 
     # Strength-specific
     if activity == "Strength Training":
-        strength = _extract_strength_details(text)
+        strength = _extract_strength_details(ctx)
         if strength.get("exercises") and len(strength["exercises"]) > 1:
-            ex_details = _parse_exercise_details(text, strength["exercises"])
+            ex_details = _parse_exercise_details(ctx, strength["exercises"])
             for i, (ex_name, detail) in enumerate(ex_details, 1):
                 add(f"Exercise {i}", detail)
         else:
@@ -888,18 +1223,18 @@ def _build_assignment(athlete: str, text: str, doc, activity: str | None,
 
     # Swimming-specific
     if activity == "Swimming":
-        swim = _extract_swimming_details(text)
+        swim = _extract_swimming_details(ctx)
         add("Sets", f"{swim['sets']} × {swim['set_distance']}" if swim.get("sets") else None)
         add("Stroke", swim.get("stroke"))
         add("Max Duration", swim.get("max_duration"))
 
     # Cycling-specific
     if activity == "Cycling":
-        add("Cadence", _extract_cadence(text))
+        add("Cadence", _extract_cadence(ctx))
 
     # HIIT-specific
     if activity == "HIIT":
-        hiit = _extract_hiit_details(text)
+        hiit = _extract_hiit_details(ctx)
         add("Work Duration", hiit.get("work_duration"))
         add("Rest Duration", hiit.get("rest_duration"))
         add("Rounds", hiit.get("rounds"))
@@ -907,62 +1242,73 @@ def _build_assignment(athlete: str, text: str, doc, activity: str | None,
 
     # Rest period (non-HIIT) — seconds or minutes
     if activity != "HIIT":
-        m = re.search(r"(?:rest|recovery)\s+(\d+)\s*(seconds?|secs?|s|minutes?|mins?)", text.lower())
-        if not m:
-            m = re.search(r"(\d+)\s*(seconds?|secs?|s|minutes?|mins?)\s*(?:rest|recovery|between)", text.lower())
-        if m:
-            val = m.group(1)
-            unit = m.group(2)
-            if unit.startswith("min"):
-                add("Rest", f"{val} minutes")
-            else:
-                add("Rest", f"{val} seconds")
+        add("Rest", _extract_rest(ctx))
 
     # Equipment & logistics
-    add("Equipment", _extract_equipment(text))
+    add("Equipment", _extract_equipment(ctx))
 
     # Notes
-    add("Notes", _extract_notes(text))
+    add("Notes", _extract_notes(ctx))
+
+    return attrs, date_index
 
-    return {"attributes": attrs}
+
+def _exercise_detail_patterns(ex: str) -> dict[str, re.Pattern]:
+    """Compile the per-exercise detail patterns used by _parse_exercise_details."""
+    ex_lower = ex.lower().replace("-", "[-\\s]?")
+    return {
+        # "squats 4 sets of 8"
+        "sets_after": _rx(
+            f"exercise_sets_after:{ex}",
+            rf"{ex_lower}\s*[-,:]?\s*(\d+)\s*sets?\s*(?:of|x)\s*(\d+)\s*(?:reps?)?",
+        ),
+        # "4 sets of 8 squats"
+        "sets_before": _rx(
+            f"exercise_sets_before:{ex}",
+            rf"(\d+)\s*sets?\s*(?:of|x)\s*(\d+)\s*(?:reps?)?\s*[-,:]?\s*{ex_lower}",
+        ),
+        "failure": _rx(f"exercise_failure:{ex}", rf"{ex_lower}\s*.*?(?:to|til)\s*failure"),
+        "sets_near": _rx(f"exercise_sets_near:{ex}", rf"(\d+)\s*sets?\s*.*?{ex_lower}"),
+        "weight": _rx(
+            f"exercise_weight:{ex}",
+            rf"{ex_lower}\s*.*?(\d+(?:\.\d+)?)\s*(kg|lbs?)\s*(?:dumbbells?|barbell)?",
+        ),
+    }
 
 
-def _parse_exercise_details(text: str, exercises: list[str]) -> list[tuple[str, str]]:
+_EXERCISE_DETAIL_PATTERNS = {name: _exercise_detail_patterns(name) for _, name in _EXERCISE_PATTERNS}
+
+
+def _parse_exercise_details(ctx: ParseContext, exercises: list[str]) -> list[tuple[str, str]]:
     """Try to extract per-exercise details (sets x reps) from text."""
     results = []
-    text_lower = text.lower()
+    text_lower = ctx.lower
 
     for ex in exercises:
+        patterns = _EXERCISE_DETAIL_PATTERNS[ex]
+
         # Look for pattern near the exercise name: "squats 4 sets of 8"
-        ex_lower = ex.lower().replace("-", "[-\\s]?")
-        m = re.search(
-            rf"{ex_lower}\s*[-,:]?\s*(\d+)\s*sets?\s*(?:of|x)\s*(\d+)\s*(?:reps?)?",
-            text_lower
-        )
+        m = patterns["sets_after"].search(text_lower)
         if m:
             detail = f"{ex} - {m.group(1)} sets × {m.group(2)} reps"
         else:
             # Check for "X sets of Y" immediately before the exercise name
-            m2 = re.search(
-                rf"(\d+)\s*sets?\s*(?:of|x)\s*(\d+)\s*(?:reps?)?\s*[-,:]?\s*{ex_lower}",
-                text_lower
-            )
+            m2 = patterns["sets_before"].search(text_lower)
             if m2:
                 detail = f"{ex} - {m2.group(1)} sets × {m2.group(2)} reps"
             else:
                 # Check for "to failure"
-                m3 = re.search(rf"{ex_lower}\s*.*?(?:to|til)\s*failure", text_lower)
+                m3 = patterns["failure"].search(text_lower)
                 if m3:
                     # Find sets count nearby
-                    m4 = re.search(rf"(\d+)\s*sets?\s*.*?{ex_lower}", text_lower)
+                    m4 = patterns["sets_near"].search(text_lower)
                     sets_str = f"{m4.group(1)} sets " if m4 else ""
                     detail = f"{ex} - {sets_str}to failure"
                 else:
                     detail = ex
 
         # Append weight if found near exercise
-        m_w = re.search(rf"{ex_lower}\s*.*?(\d+(?:\.\d+)?)\s*(kg|lbs?)\s*(?:dumbbells?|barbell)?",
-                        text_lower)
+        m_w = patterns["weight"].search(text_lower)
         if m_w:
             detail += f" @ {m_w.group(1)}{m_w.group(2)}"
             # Also check for equipment
@@ -974,10 +1320,45 @@ def _parse_exercise_details(text: str, exercises: list[str]) -> list[tuple[str,
     return results
 
 
-def _split_into_segments(text: str) -> list[dict] | None:
+_RE_TRANSITION_SPLIT = _rx(
+    "transition_split",
+    r"(?:,\s*)?(?:then\s+|followed\s+by\s+|transition\s+to\s+|after\s+that\s+|next\s+)",
+    re.IGNORECASE,
+)
+_RE_PHASE_SPLIT = _rx(
+    "phase_split",
+    r"(?:,\s*)?(?:then\s+|followed\s+by\s+|after\s+that\s+|(?<=,\s)last\s+)",
+    re.IGNORECASE,
+)
+_RE_SEGMENT_MARKER = _rx("segment_marker", r"\b(?:first|last)\s+\d+\s*(?:km?|miles?|k)\b")
+
+
+def _split_spans(pattern: re.Pattern, text: str) -> list[tuple[int, int]]:
+    """Like [p.strip() for p in pattern.split(text)], as (start, end) offsets."""
+    spans = []
+    pos = 0
+    for m in pattern.finditer(text):
+        spans.append((pos, m.start()))
+        pos = m.end()
+    spans.append((pos, len(text)))
+
+    stripped = []
+    for start, end in spans:
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        stripped.append((start, end))
+    return stripped
+
+
+@_memoized
+def _split_into_segments(ctx: ParseContext) -> list[dict] | None:
     """Split text into workout segments for multi-activity or phased workouts.
-    Returns a list of dicts with 'text' and optional 'label' keys, or None."""
-    text_lower = text.lower()
+    Returns a list of dicts with 'text', 'ctx' (a ParseContext over the
+    segment, sharing the full-text doc) and optional 'label' keys, or None."""
+    text, text_lower = ctx.text, ctx.lower
+    whole_words = _keyword_hits(ctx)[1]
 
     # Check for multi-activity transition markers
     # Pattern: "swim X ... transition/then bike Y ... then run Z"
@@ -986,65 +1367,358 @@ def _split_into_segments(text: str) -> list[dict] | None:
         if activity in ("Rest", "Match/Game", "Cardio", "HIIT"):
             continue
         for kw in keywords:
-            if re.search(rf"\b{re.escape(kw)}\b", text_lower):
+            if kw in whole_words:
                 activities_found.append(activity)
                 break
 
     # Multi-activity (e.g., Triathlon): split by transition words
     if len(activities_found) >= 2:
         # Try to split by transition phrases
-        parts = re.split(
-            r"(?:,\s*)?(?:then\s+|followed\s+by\s+|transition\s+to\s+|after\s+that\s+|next\s+)",
-            text, flags=re.IGNORECASE
-        )
+        parts = _split_spans(_RE_TRANSITION_SPLIT, text)
         if len(parts) >= 2:
             segments = []
-            for part in parts:
-                part = part.strip()
-                if len(part) < 5:
+            for start, end in parts:
+                if end - start < 5:
                     continue
-                activity = _detect_activity(part)
+                seg_ctx = ctx.segment(start, end)
+                activity = _detect_activity(seg_ctx)
                 if activity:
-                    segments.append({"text": part, "activity": activity})
+                    segments.append({"text": seg_ctx.text, "ctx": seg_ctx, "activity": activity})
             if len(segments) >= 2:
                 return segments
 
     # Phase-based: "first X ... then Y ... last Z" — same activity, different phases
-    phase_parts = re.split(
-        r"(?:,\s*)?(?:then\s+|followed\s+by\s+|after\s+that\s+|(?<=,\s)last\s+)",
-        text, flags=re.IGNORECASE
-    )
+    phase_parts = _split_spans(_RE_PHASE_SPLIT, text)
     if len(phase_parts) >= 2:
-        has_segment_markers = bool(re.search(
-            r"\b(?:first|last)\s+\d+\s*(?:km?|miles?|k)\b", text_lower
-        ))
+        has_segment_markers = bool(_RE_SEGMENT_MARKER.search(text_lower))
         if has_segment_markers:
             # Detect the primary activity for the whole workout
-            parent_activity = _detect_activity(text)
+            parent_activity = _detect_activity(ctx)
             segments = []
-            for i, part in enumerate(phase_parts):
-                part = part.strip()
-                if len(part) < 5:
+            for i, (start, end) in enumerate(phase_parts):
+                if end - start < 5:
                     continue
-                if i == 0 or "warmup" in part.lower() or "warm up" in part.lower():
+                seg_ctx = ctx.segment(start, end)
+                part_lower = seg_ctx.lower
+                if i == 0 or "warmup" in part_lower or "warm up" in part_lower:
                     label = "Warmup"
-                elif i == len(phase_parts) - 1 or "cooldown" in part.lower() or "cool down" in part.lower():
+                elif i == len(phase_parts) - 1 or "cooldown" in part_lower or "cool down" in part_lower:
                     label = "Cooldown"
                 else:
                     label = "Main"
-                if "easy" in part.lower():
+                if "easy" in part_lower:
                     if i == 0:
                         label = "Warmup"
                     elif i == len(phase_parts) - 1:
                         label = "Cooldown"
                 # Use parent activity for all segments (they're the same sport)
-                segments.append({"text": part, "label": label, "activity": parent_activity})
+                segments.append({
+                    "text": seg_ctx.text, "ctx": seg_ctx,
+                    "label": label, "activity": parent_activity,
+                })
             if len(segments) >= 2:
                 return segments
 
     return None
 
 
+# ─── Model Loading ───────────────────────────────────────────────────────────
+
+MODEL_PATH = "./output/model-best"
+FALLBACK_MODEL = "en_core_web_sm"
+
+# Run through the full parse once before the model goes live so the first
+# real request does not pay for cold caches
+_WARMUP_TEXTS = [
+    "Ravi needs to run 8km tomorrow at 6am, easy 5:30/km pace, heart rate below 150",
+    "Neha and Sam swim 1500m then bike 40km then run 10km Saturday morning",
+    "Priya, squats 4 sets of 8 at 80kg, bench press 3 sets of 10 on Monday",
+]
+
+_model_state = {"state": "not_started", "model": None, "pipes": [], "error": None, "timings": {}}
+_model_thread: threading.Thread | None = None
+_model_thread_lock = threading.Lock()
+
+
+def _prune_to_ner(model) -> list[str]:
+    """Disable every pipe except ner and the tok2vec/transformer it listens to.
+
+    The extractors only ever read doc.ents, so on the generic model the
+    tagger, parser, lemmatizer and attribute_ruler are wasted work. Returns
+    the pipes left enabled.
+    """
+    if "ner" not in model.pipe_names:
+        return model.pipe_names
+    keep = {"ner"}
+    for name, pipe in model.pipeline:
+        if "ner" in getattr(pipe, "listener_map", {}):
+            keep.add(name)
+    model.select_pipes(enable=[name for name in model.pipe_names if name in keep])
+    return model.pipe_names
+
+
+def load_model(ner_only: bool = True) -> dict:
+    """Load and warm up the spaCy model, then publish it as `nlp`.
+
+    With `ner_only`, components the extractors don't read are disabled.
+    Blocks until done and returns model_status(). Falls back to regex-only
+    parsing when spaCy or both models are missing.
+    """
+    global nlp
+    timings = _model_state["timings"]
+    _model_state["state"] = "loading"
+
+    start = time.perf_counter()
+    try:
+        import spacy
+    except ImportError:
+        _model_state["state"] = "unavailable"
+        print("SpaCy not installed — using regex-only parsing")
+        return model_status()
+    timings["import"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    try:
+        if os.path.exists(MODEL_PATH):
+            model, name = spacy.load(MODEL_PATH), MODEL_PATH
+            print(f"Loaded custom model from {MODEL_PATH}")
+        else:
+            try:
+                model, name = spacy.load(FALLBACK_MODEL), FALLBACK_MODEL
+                print(f"Loaded generic model {FALLBACK_MODEL}")
+            except OSError:
+                _model_state["state"] = "unavailable"
+                print("No spaCy base model found, using regex-only parsing")
+                return model_status()
+        timings["load"] = time.perf_counter() - start
+
+        if ner_only:
+            _prune_to_ner(model)
+        _model_state["pipes"] = list(model.pipe_names)
+
+        start = time.perf_counter()
+        for text in _WARMUP_TEXTS:
+            _parse_doc(text, model(text))
+        timings["warmup"] = time.perf_counter() - start
+    except Exception as e:
+        # Covers warm-up too, so /ready never stays at "loading"
+        _model_state.update(state="failed", error=str(e))
+        print(f"Failed to load spaCy model, using regex-only parsing: {e}")
+        return model_status()
+
+    nlp = model
+    _model_state.update(state="ready", model=name)
+    breakdown = ", ".join(f"{k} {v * 1000:.0f} ms" for k, v in timings.items())
+    print(f"NER ready ({breakdown})")
+    return model_status()
+
+
+def start_model_loading(ner_only: bool = True) -> threading.Thread:
+    """Run load_model() on a daemon thread; later calls return the same thread."""
+    global _model_thread
+    with _model_thread_lock:
+        if _model_thread is None:
+            _model_state["state"] = "loading"
+            _model_thread = threading.Thread(
+                target=load_model, args=(ner_only,), name="spacy-loader", daemon=True
+            )
+            _model_thread.start()
+        return _model_thread
+
+
+def model_status() -> dict:
+    """Where model loading is: not_started, loading, ready, unavailable or failed."""
+    return {
+        "state": _model_state["state"],
+        "ner": nlp is not None,
+        "model": _model_state["model"],
+        "pipes": _model_state["pipes"],
+        "error": _model_state["error"],
+        "timings_ms": {k: round(v * 1000, 1) for k, v in _model_state["timings"].items()},
+    }
+
+
+# ─── Result Cache ────────────────────────────────────────────────────────────
+
+# Coaches repeat the same instruction a lot, so finished parses are kept in a
+# bounded LRU keyed on (whitespace-normalized text, model, reference date).
+# The model is part of the key so regex-only results from before NER went live
+# are not served afterwards. The date is there because "tomorrow", "next week"
+# and weekday names resolve against today; the first lookup on a new day drops
+# the previous day's entries.
+
+DEFAULT_CACHE_SIZE = 1024
+
+
+class _ResultCache:
+    """Thread-safe LRU of parse results. A maxsize of 0 disables it."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[tuple, dict] = OrderedDict()
+        self._day: date | None = None
+        self._lock = threading.Lock()
+
+    def _roll_day(self, day: date):
+        if day != self._day:
+            self.evictions += len(self._entries)
+            self._entries.clear()
+            self._day = day
+
+    def get(self, key: tuple) -> dict | None:
+        if not self.maxsize:
+            return None
+        with self._lock:
+            self._roll_day(key[-1])
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: tuple, result: dict):
+        if not self.maxsize:
+            return
+        with self._lock:
+            self._roll_day(key[-1])
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def resize(self, maxsize: int):
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._entries) > maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.maxsize > 0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_RESULT_CACHE = _ResultCache(DEFAULT_CACHE_SIZE)
+
+
+def configure_result_cache(maxsize: int):
+    """Set the result cache size; 0 switches caching off and empties it."""
+    if maxsize < 0:
+        raise ValueError("cache size must be >= 0")
+    _RESULT_CACHE.resize(maxsize)
+
+
+def cache_stats() -> dict:
+    return _RESULT_CACHE.stats()
+
+
+def _normalize_text(text: str) -> str:
+    """Collapse whitespace runs; stray spaces and newlines throw off the
+    name and phrase patterns, so the normalized form is what gets parsed."""
+    return " ".join(text.split())
+
+
+def _cache_key(normalized: str, model) -> tuple:
+    return (normalized, id(model) if model is not None else None, datetime.now().date())
+
+
+def _with_original_text(result: dict, text: str) -> dict:
+    """Independent copy of a cached result that echoes the caller's text."""
+    result = copy.deepcopy(result)
+    result["original_text"] = text
+    return result
+
+
+# ─── Stage Timings ───────────────────────────────────────────────────────────
+
+# Entry points record how long NER and the regex extraction took per text,
+# and whether the result cache answered. collect_stage_times() hands them back
+# with the result, so they reach the API's metrics from worker processes too.
+# A sample of parses is also logged as one JSON line with the entities found.
+
+_stage_times = threading.local()
+_entity_log_rate = 0.0
+
+
+def configure_entity_logging(sample_rate: float):
+    """Log the detected entities of `sample_rate` (0..1) of parses."""
+    global _entity_log_rate
+    _entity_log_rate = sample_rate
+
+
+def collect_stage_times(fn, *args):
+    """(fn(*args), timings) for a parser entry point, where timings is
+    {"ner": [seconds...], "regex": [seconds...], "cache_hits": n,
+    "cache_misses": n}."""
+    _stage_times.current = {"ner": [], "regex": [], "cache_hits": 0, "cache_misses": 0}
+    try:
+        return fn(*args), _stage_times.current
+    finally:
+        _stage_times.current = None
+
+
+def _count_cache_lookup(hit: bool):
+    current = getattr(_stage_times, "current", None)
+    if current is not None:
+        current["cache_hits" if hit else "cache_misses"] += 1
+
+
+def _observe_parse(text: str, doc, ner_seconds: float | None, regex_seconds: float):
+    current = getattr(_stage_times, "current", None)
+    if current is not None:
+        if ner_seconds is not None:
+            current["ner"].append(ner_seconds)
+        current["regex"].append(regex_seconds)
+    if _entity_log_rate and random.random() < _entity_log_rate:
+        print(json.dumps({
+            "event": "parse_sample",
+            "chars": len(text),
+            "entities": [[ent.text, ent.label_] for ent in doc.ents] if doc else None,
+            "ner_ms": round(ner_seconds * 1000, 2) if ner_seconds is not None else None,
+            "regex_ms": round(regex_seconds * 1000, 2),
+        }, ensure_ascii=False))
+
+
+# ─── Worker Processes ────────────────────────────────────────────────────────
+
+def init_worker(ner_only: bool = True, cache_size: int = DEFAULT_CACHE_SIZE,
+                entity_log_rate: float = 0.0):
+    """ProcessPoolExecutor initializer: each parse worker sizes its own result
+    cache and loads its own model before taking work."""
+    configure_result_cache(cache_size)
+    configure_entity_logging(entity_log_rate)
+    load_model(ner_only)
+
+
+# ─── Entry Points ────────────────────────────────────────────────────────────
+
+def _is_too_short(text: str) -> bool:
+    return not text or len(text.strip()) < 5
+
+
+def _no_speech_result(text: str) -> dict:
+    return {
+        "assignments": [],
+        "error": "No significant speech detected.",
+        "original_text": text,
+    }
+
+
 def parse_workout_text(text: str) -> dict:
     """
     Dynamic workout parser. Returns:
@@ -1054,56 +1728,114 @@ def parse_workout_text(text: str) -> dict:
         "confidence": "High" | "Medium" | "Low"
     }
     """
-    if not text or len(text.strip()) < 5:
-        return {
-            "assignments": [],
-            "error": "No significant speech detected.",
-            "original_text": text,
-        }
+    if _is_too_short(text):
+        return _no_speech_result(text)
+
+    model = nlp
+    normalized = _normalize_text(text)
+    key = _cache_key(normalized, model)
+    cached = _RESULT_CACHE.get(key)
+    _count_cache_lookup(cached is not None)
+    if cached is not None:
+        return _with_original_text(cached, text)
+
+    start = time.perf_counter()
+    doc = model(normalized) if model else None
+    ner_done = time.perf_counter()
+    result = _parse_doc(normalized, doc)
+    _observe_parse(normalized, doc, ner_done - start if model else None, time.perf_counter() - ner_done)
+    _RESULT_CACHE.put(key, result)
+    return _with_original_text(result, text)
+
+
+def parse_workout_texts(texts: list[str], batch_size: int | None = None) -> list[dict]:
+    """Parse many texts at once, in input order.
+
+    NER runs over all of them through nlp.pipe in batches of `batch_size`
+    (default: the model's own [nlp] batch_size), then each doc goes through
+    the same extraction as parse_workout_text. Cached texts skip the model.
+    """
+    model = nlp
+    results = [None] * len(texts)
+    pending = []
+    for i, text in enumerate(texts):
+        if _is_too_short(text):
+            results[i] = _no_speech_result(text)
+            continue
+        normalized = _normalize_text(text)
+        key = _cache_key(normalized, model)
+        cached = _RESULT_CACHE.get(key)
+        _count_cache_lookup(cached is not None)
+        if cached is not None:
+            results[i] = _with_original_text(cached, text)
+        else:
+            pending.append((i, normalized, key))
+
+    if model:
+        docs = model.pipe((p[1] for p in pending), batch_size=batch_size or model.batch_size)
+    else:
+        docs = (None for _ in pending)
+
+    # nlp.pipe does its work a batch at a time as docs are pulled, so NER time
+    # is totalled and spread evenly over the docs afterwards
+    ner_seconds = 0.0
+    parsed = []
+    for i, normalized, key in pending:
+        start = time.perf_counter()
+        doc = next(docs)
+        ner_done = time.perf_counter()
+        result = _parse_doc(normalized, doc)
+        ner_seconds += ner_done - start
+        parsed.append((normalized, doc, time.perf_counter() - ner_done))
+        _RESULT_CACHE.put(key, result)
+        results[i] = _with_original_text(result, texts[i])
+    for normalized, doc, regex_seconds in parsed:
+        _observe_parse(normalized, doc, ner_seconds / len(parsed) if model else None, regex_seconds)
+    return results
 
-    doc = nlp(text) if nlp else None
 
-    if doc:
-        print(f"DEBUG: Detected Entities: {[(ent.text, ent.label_) for ent in doc.ents]}")
+def _parse_doc(text: str, doc) -> dict:
+    """Run every extractor over `text` and its (optional) spaCy doc."""
+    ctx = ParseContext(text, doc)
 
     # ── Check for multi-athlete scenario ────────────────────────────────
-    multi_athletes = _extract_multiple_athletes(text)
-    multi_days = _extract_multiple_days(text)
+    multi_athletes = _extract_multiple_athletes(ctx)
+    multi_days = _extract_multiple_days(ctx)
 
-    activity = _detect_activity(text)
+    activity = _detect_activity(ctx)
     if doc:
         for ent in doc.ents:
             if ent.label_ == "ACTIVITY" and not activity:
                 activity = ent.text
 
     # ── Check for multi-activity / segmented workout ────────────────────
-    segments = _split_into_segments(text)
-    athlete = _extract_athlete(text, doc)
+    segments = _split_into_segments(ctx)
+    athlete = _extract_athlete(ctx)
 
     assignments = []
 
     if segments and len(segments) >= 2:
         # Multi-activity or segmented workout
         # Shared attributes: name, time, date, heart rate, calories, equipment, notes
-        time_val = _infer_time(text)
-        date_val = _infer_date(text)
-        hr_val = _extract_heart_rate(text)
-        cal_val = _extract_calories(text)
-        equip_val = _extract_equipment(text)
-        notes_val = _extract_notes(text)
+        time_val = _infer_time(ctx)
+        date_val = _infer_date(ctx)
+        hr_val = _extract_heart_rate(ctx)
+        cal_val = _extract_calories(ctx)
+        equip_val = _extract_equipment(ctx)
+        notes_val = _extract_notes(ctx)
 
         for seg in segments:
-            seg_text = seg["text"]
-            seg_activity = seg.get("activity") or _detect_activity(seg_text) or activity
-            seg_doc = nlp(seg_text) if nlp else None
+            # Segment contexts are spans into `doc`: no extra NER pass here
+            seg_ctx = seg["ctx"]
+            seg_activity = seg.get("activity") or _detect_activity(seg_ctx) or activity
 
             assignment = _build_assignment(
-                athlete, seg_text, seg_doc, seg_activity
+                athlete, seg_ctx, seg_activity
             )
 
             # Override shared fields from full text
             attrs = assignment["attributes"]
-            attr_keys = {a["key"] for a in attrs}
+            attr_keys = {a["key"] for a in attrs if a["value"] is not None}
 
             if "Time" not in attr_keys and time_val:
                 attrs.append({"key": "Time", "value": time_val})
@@ -1135,20 +1867,20 @@ def parse_workout_text(text: str) -> dict:
             if multi_days:
                 for day in multi_days:
                     assignments.append(
-                        _build_assignment(ath, text, doc, activity, date_override=day)
+                        _build_assignment(ath, ctx, activity, date_override=day)
                     )
             else:
                 assignments.append(
-                    _build_assignment(ath, text, doc, activity)
+                    _build_assignment(ath, ctx, activity)
                 )
     elif multi_days:
         for day in multi_days:
             assignments.append(
-                _build_assignment(athlete, text, doc, activity, date_override=day)
+                _build_assignment(athlete, ctx, activity, date_override=day)
             )
     else:
         assignments.append(
-            _build_assignment(athlete, text, doc, activity)
+            _build_assignment(athlete, ctx, activity)
         )
 
     # ── Calculate confidence ─────────────────────────────────────────────
@@ -0,0 +1,61 @@
+import asyncio
+
+# Request coalescing: a double-tap or a client retry often sends the same
+# text or audio again while the first request is still being worked on.
+# Concurrent calls with the same key wait for the first one's result
+# instead of repeating the NER pass or the paid transcription call.
+
+
+class SingleFlight:
+    """At most one in-flight computation per key.
+
+    do(key, fn) runs `fn()` unless a call with `key` is already running, in
+    which case it waits for that call and gets its result (or exception).
+    If the call that is doing the work is cancelled (its client went away),
+    a waiting caller takes over and runs `fn()` itself.
+    """
+
+    def __init__(self):
+        self._in_flight: dict = {}
+        self.computed = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        while (shared := self._in_flight.get(key)) is not None:
+            try:
+                result = await asyncio.shield(shared)
+            except asyncio.CancelledError:
+                if shared.cancelled() and not asyncio.current_task().cancelling():
+                    continue  # the leader was cancelled, not us
+                raise
+            except BaseException:
+                self.coalesced += 1
+                raise
+            self.coalesced += 1
+            return result
+
+        shared = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = shared
+        self.computed += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            shared.cancel()
+            raise
+        except BaseException as e:
+            shared.set_exception(e)
+            shared.exception()  # retrieved, even when nobody else was waiting
+            raise
+        else:
+            shared.set_result(result)
+            return result
+        finally:
+            if self._in_flight.get(key) is shared:
+                del self._in_flight[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._in_flight),
+            "computed": self.computed,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import random
+import wave
+
+from fastapi import FastAPI, File, Form, UploadFile
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+import uvicorn
+
+# Local stand-in for Groq's /openai/v1/audio/transcriptions endpoint, for
+# exercising the client pool, retries and circuit breaker without the real
+# API. Run it and start the backend with
+#   GROQ_API_URL=http://127.0.0.1:9000/openai/v1/audio/transcriptions
+# Failure modes can be changed at runtime through POST /_control. A second
+# one on another STUB_PORT can stand in for TRANSCRIBE_SECONDARY_URL.
+
+# ── Config ─────────────────────────────────────────────────────────────────────
+
+STUB_TEXT = os.environ.get(
+    "STUB_TEXT", "Ravi needs to run 8km tomorrow at 6am, easy 5:30/km pace"
+)
+
+# ── App Setup ──────────────────────────────────────────────────────────────────
+
+class ControlRequest(BaseModel):
+    latency_ms: float | None = None
+    jitter_ms: float | None = None
+    tail_rate: float | None = None
+    tail_ms: float | None = None
+    rtf: float | None = None
+    fail_rate: float | None = None
+    fail_status: int | None = None
+    hang: bool | None = None
+
+
+def _wav_seconds(file: UploadFile) -> float:
+    file.file.seek(0)
+    try:
+        with wave.open(file.file, "rb") as w:
+            return w.getnframes() / w.getframerate()
+    except (wave.Error, EOFError):
+        return 0.0
+    finally:
+        file.file.seek(0)
+
+
+def create_app() -> FastAPI:
+    """One stub with its own control and stats, so several can run side by
+    side (e.g. a primary and a secondary for hedging)."""
+    app = FastAPI(title="Stub Transcriber")
+    control = app.state.control = {
+        "latency_ms": float(os.environ.get("STUB_LATENCY_MS", 0)),
+        "jitter_ms": float(os.environ.get("STUB_JITTER_MS", 0)),  # uniform 0..jitter_ms added
+        "tail_rate": float(os.environ.get("STUB_TAIL_RATE", 0)),  # 0..1 of requests also get tail_ms
+        "tail_ms": float(os.environ.get("STUB_TAIL_MS", 0)),
+        "rtf": float(os.environ.get("STUB_RTF", 0)),  # extra seconds per second of WAV audio
+        "fail_rate": float(os.environ.get("STUB_FAIL_RATE", 0)),  # 0..1, answered with fail_status
+        "fail_status": int(os.environ.get("STUB_FAIL_STATUS", 503)),
+        "hang": False,  # never answer, to trigger client timeouts
+    }
+    stats = app.state.stats = {"requests": 0, "failed": 0, "cancelled": 0, "bytes": 0, "audio_seconds": 0.0}
+
+    @app.post("/openai/v1/audio/transcriptions")
+    async def transcribe(file: UploadFile = File(...), model: str = Form(...), language: str = Form("en")):
+        stats["requests"] += 1
+        stats["audio_seconds"] += _wav_seconds(file)
+        stats["bytes"] += file.size or 0
+
+        latency = (control["latency_ms"] + random.uniform(0, control["jitter_ms"])) / 1000
+        if random.random() < control["tail_rate"]:
+            latency += control["tail_ms"] / 1000
+        if control["rtf"]:
+            latency += control["rtf"] * _wav_seconds(file)
+        try:
+            if control["hang"]:
+                await asyncio.sleep(3600)
+            if latency:
+                await asyncio.sleep(latency)
+        except asyncio.CancelledError:
+            # The client went away (e.g. a hedged request that lost)
+            stats["cancelled"] += 1
+            raise
+        if random.random() < control["fail_rate"]:
+            stats["failed"] += 1
+            return JSONResponse(status_code=control["fail_status"], content={"error": "stub failure"})
+
+        return {"text": STUB_TEXT}
+
+    @app.post("/_control")
+    def set_control(request: ControlRequest):
+        """Change latency / failure behaviour; omitted fields stay as they are."""
+        control.update({k: v for k, v in request.model_dump().items() if v is not None})
+        return control
+
+    @app.get("/_stats")
+    def get_stats():
+        return stats
+
+    return app
+
+
+app = create_app()
+control = app.state.control
+stats = app.state.stats
+
+
+# ── Entry Point ────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    port = int(os.environ.get("STUB_PORT", 9000))
+    uvicorn.run(app, host="127.0.0.1", port=port)
@@ -0,0 +1,52 @@
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import pytest
+import uvicorn
+
+# The backend modules import each other flat (`from metrics import ...`)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep tests that start the app from writing next to the code
+os.environ.setdefault("TRAINING_LOG_DB", os.path.join(tempfile.mkdtemp(), "parse_log.db"))
+
+import stub_transcriber  # noqa: E402
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="session")
+def stub_server():
+    """A stub_transcriber app served on a real port, for the whole session."""
+    app = stub_transcriber.create_app()
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    app.state.url = f"http://127.0.0.1:{port}/openai/v1/audio/transcriptions"
+    yield app
+    server.should_exit = True
+    thread.join(5)
+
+
+@pytest.fixture
+def stub(stub_server):
+    """The session stub with its control and stats reset for one test."""
+    defaults = stub_transcriber.create_app().state
+    stub_server.state.control.update(defaults.control)
+    stub_server.state.stats.update(defaults.stats)
+    return stub_server.state
+
+
+def run(coro):
+    return asyncio.run(coro)
@@ -0,0 +1,88 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected, BoundedExecutor
+from conftest import run
+
+
+def test_idle_pool_admits_after_one_slow_call():
+    async def scenario():
+        with ThreadPoolExecutor(1) as pool:
+            executor = BoundedExecutor(pool, workers=1, deadline=0.5)
+            await executor.run(time.sleep, 0.7)  # longer than the deadline on its own
+            assert executor.avg_exec > executor.deadline
+            for _ in range(3):
+                await executor.run(time.sleep, 0.01)
+            return executor
+
+    executor = run(scenario())
+    assert executor.completed == 4
+    assert executor.predicted_late == 0
+
+
+def test_sheds_when_the_predicted_wait_misses_the_deadline():
+    async def scenario():
+        with ThreadPoolExecutor(1) as pool:
+            executor = BoundedExecutor(pool, workers=1, deadline=0.5)
+            await executor.run(time.sleep, 0.3)
+            running = asyncio.create_task(executor.run(time.sleep, 0.3))
+            queued = asyncio.create_task(executor.run(time.sleep, 0.3))
+            await asyncio.sleep(0.05)
+            with pytest.raises(AdmissionRejected) as rejected:
+                await executor.run(time.sleep, 0.3)  # ~0.6 s of wait ahead of it
+            await asyncio.gather(running, queued)
+            return executor, rejected.value
+
+    executor, rejected = run(scenario())
+    assert rejected.status_code == 503 and rejected.retry_after >= 1
+    assert executor.predicted_late == 1 and executor.completed == 3
+
+
+def test_queue_full_and_unshed_calls():
+    async def scenario():
+        with ThreadPoolExecutor(1) as pool:
+            executor = BoundedExecutor(pool, workers=1, max_queue=1, deadline=0)
+            running = asyncio.create_task(executor.run(time.sleep, 0.2))
+            queued = asyncio.create_task(executor.run(time.sleep, 0.01))
+            await asyncio.sleep(0.05)
+            with pytest.raises(AdmissionRejected):
+                await executor.run(time.sleep, 0.01)
+            # shed=False is never rejected
+            await executor.run(time.sleep, 0.01, shed=False)
+            await asyncio.gather(running, queued)
+            return executor
+
+    executor = run(scenario())
+    assert executor.queue_full == 1 and executor.completed == 3
+
+
+def test_slot_queue_and_timeout():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=0.1)
+        async with admission.slot():
+            waiter = asyncio.create_task(admission.slot().__aenter__())
+            await asyncio.sleep(0)
+            with pytest.raises(AdmissionRejected) as full:
+                async with admission.slot():
+                    pass
+            with pytest.raises(AdmissionRejected) as timed_out:
+                await waiter
+        return admission, full.value, timed_out.value
+
+    admission, full, timed_out = run(scenario())
+    assert full.status_code == timed_out.status_code == 503
+    assert admission.queue_full == 1 and admission.queue_timeouts == 1
+    assert admission.in_flight == 0 and admission.waiting == 0
+
+
+def test_rate_limit_per_client():
+    admission = AdmissionController(rate=1.0, burst=2)
+    admission.check_rate("a")
+    admission.check_rate("a")
+    with pytest.raises(AdmissionRejected) as limited:
+        admission.check_rate("a")
+    admission.check_rate("b")
+    assert limited.value.status_code == 429 and 0 < limited.value.retry_after <= 1
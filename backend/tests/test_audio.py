@@ -0,0 +1,64 @@
+import io
+import struct
+import wave
+
+import pytest
+from fastapi import UploadFile
+
+from audio import preprocess_upload, preprocess_wav, split_wav
+
+
+def _wav(fmt: bytes, data: bytes | None = b"\0" * 64) -> bytes:
+    body = b"WAVE" + b"fmt " + struct.pack("<I", 16) + fmt
+    if data is not None:
+        body += b"data" + struct.pack("<I", len(data)) + data
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+@pytest.mark.parametrize("data", [
+    _wav(b"\1\0\1\0", data=None),  # fmt chunk cut off by the end of the file
+    _wav(struct.pack("<HHIIHH", 1, 1, 0, 0, 2, 16)),  # sample rate 0
+])
+def test_malformed_wav_is_passed_through(data):
+    upload = UploadFile(io.BytesIO(data), size=len(data), filename="broken.wav")
+    prepared, report = preprocess_upload(upload)
+    assert prepared is upload
+    assert report["bytes_out"] in (None, len(data))
+    assert upload.file.tell() == 0
+
+
+@pytest.mark.parametrize("rate, chunk_seconds", [
+    (0, 30.0),  # would make every chunk zero frames long
+    (8000, 0.001),  # chunk shorter than a silence-detection frame
+])
+def test_split_wav_falls_back_to_whole_file(rate, chunk_seconds):
+    data = _wav(struct.pack("<HHIIHH", 1, 1, rate, rate * 2, 2, 16), b"\1\0" * 4000)
+    assert split_wav(data, chunk_seconds=chunk_seconds) is None
+
+
+def test_split_wav_covers_long_audio():
+    rate = 8000
+    data = _wav(struct.pack("<HHIIHH", 1, 1, rate, rate * 2, 2, 16), b"\1\0" * rate * 70)
+    chunks = split_wav(data, chunk_seconds=30.0, overlap_seconds=1.0)
+    assert len(chunks) == 3
+
+
+@pytest.mark.parametrize("declared", [0, 0xFFFFFFFF])
+def test_placeholder_data_size_reads_to_end_of_file(declared):
+    rate = 48000
+    samples = b"\0\x10" * rate  # one second, 48 kHz mono
+    data = _wav(struct.pack("<HHIIHH", 1, 1, rate, rate * 2, 2, 16), samples)
+    data = data[:40] + struct.pack("<I", declared) + data[44:]
+    converted = preprocess_wav(data, trim_silence=False)
+    assert converted is not None and len(converted) > 44
+    assert _frames(converted) == 16000
+
+
+def test_empty_data_chunk_is_not_replaced():
+    data = _wav(struct.pack("<HHIIHH", 1, 1, 48000, 96000, 2, 16), b"")
+    assert preprocess_wav(data) is None
+
+
+def _frames(data: bytes) -> int:
+    with wave.open(io.BytesIO(data)) as w:
+        return w.getnframes()
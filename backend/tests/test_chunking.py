@@ -0,0 +1,97 @@
+import asyncio
+import io
+import struct
+import wave
+
+import pytest
+from fastapi import UploadFile
+
+from audio import split_wav
+from conftest import run
+from stub_transcriber import STUB_TEXT
+from transcription import (
+    GroqTranscriber, TranscriptionBackend, TranscriptionError, make_client, stitch_transcripts,
+    transcribe_chunks,
+)
+
+
+def test_stitch_drops_words_both_chunks_heard():
+    assert stitch_transcripts([
+        "Ravi runs 8km tomorrow at six",
+        "tomorrow at six, easy pace please",
+    ]) == "Ravi runs 8km tomorrow at six easy pace please"
+
+
+def test_stitch_matches_words_ignoring_case_and_punctuation():
+    assert stitch_transcripts(["then four repeats.", "Four repeats of 400m"]) == "then four repeats. of 400m"
+
+
+def test_stitch_keeps_a_single_repeated_word():
+    # One shared word is as likely to be said twice as to be overlap
+    assert stitch_transcripts(["run run", "run fast"]) == "run run run fast"
+
+
+def test_stitch_skips_empty_chunks():
+    assert stitch_transcripts(["", "  Ravi runs", "", "tomorrow", " "]) == "Ravi runs tomorrow"
+    assert stitch_transcripts(["", " "]) == ""
+
+
+def _long_wav(seconds: int, rate: int = 8000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(struct.pack("<h", 1000) * rate * seconds)
+    return buffer.getvalue()
+
+
+def test_chunked_transcription_against_the_stub(stub):
+    chunks = split_wav(_long_wav(70), chunk_seconds=30.0)
+
+    async def transcribe():
+        async with make_client() as client:
+            backend = GroqTranscriber(client, url=stub.url, api_key="", model="whisper", retries=0)
+            return await transcribe_chunks(backend, chunks)
+
+    assert len(chunks) == 3
+    # Every chunk hears the same sentence, so only the last words repeat
+    assert run(transcribe()).startswith(STUB_TEXT)
+    assert stub.stats["requests"] == 3
+    assert stub.stats["audio_seconds"] == pytest.approx(70 + 4, abs=0.1)  # 1 s overlap per side of each cut
+
+
+class _FailFirst(TranscriptionBackend):
+    def __init__(self):
+        self.started = []
+        self.cancelled = []
+        self.finished = []
+
+    async def transcribe(self, upload: UploadFile) -> str:
+        index = int(upload.filename.split("-")[0])
+        self.started.append(index)
+        if index == 0:
+            await asyncio.sleep(0.01)
+            raise TranscriptionError(502, "upstream error")
+        try:
+            await asyncio.sleep(0.5)
+        except asyncio.CancelledError:
+            self.cancelled.append(index)
+            raise
+        self.finished.append(index)
+        return "text"
+
+
+def test_first_failure_cancels_the_other_chunks():
+    backend = _FailFirst()
+
+    async def transcribe():
+        with pytest.raises(TranscriptionError) as failed:
+            await transcribe_chunks(backend, [b"a", b"b", b"c", b"d", b"e"], concurrency=4)
+        # Checked the moment the call returns, while the caller still holds its slot
+        assert sorted(backend.cancelled) == sorted(i for i in backend.started if i)
+        assert len(backend.cancelled) >= 3
+        return failed.value
+
+    assert run(transcribe()).status_code == 502
+    assert backend.finished == []
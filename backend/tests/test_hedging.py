@@ -0,0 +1,67 @@
+import asyncio
+import io
+
+from fastapi import UploadFile
+
+from admission import AdmissionController
+from conftest import run
+from transcription import HedgedTranscriber, TranscriptionBackend
+
+
+class _Backend(TranscriptionBackend):
+    """Holds an admission slot per call, like GroqTranscriber(slot=...)."""
+
+    def __init__(self, name: str, delay: float, admission: AdmissionController):
+        self.name = name
+        self.delay = delay
+        self.admission = admission
+        self.finished = 0
+        self.cancelled = 0
+
+    async def transcribe(self, upload: UploadFile) -> str:
+        async with self.admission.slot():
+            try:
+                await asyncio.sleep(self.delay)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+            data = upload.file.read()  # fails on a closed upload
+            self.finished += 1
+            return f"{self.name}: {data.decode()}"
+
+
+def _hedged(measure_rate: float):
+    admission = AdmissionController(max_in_flight=4)
+    primary = _Backend("primary", 0.2, admission)
+    secondary = _Backend("secondary", 0.0, admission)
+    hedged = HedgedTranscriber(primary, secondary, initial_delay=0.05, min_samples=100,
+                               measure_rate=measure_rate)
+    return admission, primary, hedged
+
+
+def test_measured_loser_reads_its_own_copy_and_keeps_its_slot():
+    async def scenario():
+        admission, primary, hedged = _hedged(measure_rate=1.0)
+        upload = UploadFile(io.BytesIO(b"easy run"), filename="a.wav")
+        assert await hedged.transcribe(upload) == "secondary: easy run"
+        await upload.close()
+        assert admission.in_flight == 1  # the primary, still running and counted
+        await asyncio.sleep(0.3)
+        assert admission.in_flight == 0
+        return primary, hedged
+
+    primary, hedged = run(scenario())
+    assert primary.finished == 1
+    assert hedged.measured_wins == 1 and hedged.stats()["saved_ms_per_win"] > 0
+
+
+def test_unmeasured_loser_is_cancelled():
+    async def scenario():
+        admission, primary, hedged = _hedged(measure_rate=0.0)
+        await hedged.transcribe(UploadFile(io.BytesIO(b"x"), filename="a.wav"))
+        await asyncio.sleep(0)
+        assert admission.in_flight == 0
+        return primary, hedged
+
+    primary, hedged = run(scenario())
+    assert primary.cancelled == 1 and primary.finished == 0 and hedged.measured_wins == 0
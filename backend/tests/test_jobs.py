@@ -0,0 +1,39 @@
+import inspect
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from stub_transcriber import STUB_TEXT
+
+
+@pytest.fixture
+def client(stub, monkeypatch):
+    monkeypatch.setattr(main, "GROQ_API_URL", stub.url)
+    with TestClient(main.app) as client:
+        yield client
+
+
+def test_job_result_by_polling_and_events(client):
+    submitted = client.post("/transcribe/jobs", files={"file": ("a.webm", b"job audio")})
+    assert submitted.status_code == 202
+    job_id = submitted.json()["job_id"]
+
+    with client.stream("GET", f"/transcribe/jobs/{job_id}/events") as events:
+        body = "".join(events.iter_text())
+    assert "event: done" in body and STUB_TEXT in body
+
+    job = client.get(f"/transcribe/jobs/{job_id}").json()
+    assert job["status"] == "done" and job["result"] == {"text": STUB_TEXT}
+    assert client.get("/transcribe/stats").json()["jobs"]["completed"] >= 1
+    assert client.get("/transcribe/jobs/unknown").status_code == 404
+
+
+def test_loop_owned_state_is_read_on_the_event_loop():
+    # JobQueue, AdmissionController and BoundedExecutor are not thread-safe,
+    # so endpoints reading them must not run on the threadpool
+    paths = {"/transcribe/stats", "/transcribe/jobs/{job_id}", "/transcribe/jobs/{job_id}/events",
+             "/parse/executor", "/admission", "/metrics"}
+    endpoints = {route.path: route.endpoint for route in main.app.routes if route.path in paths}
+    assert endpoints.keys() == paths
+    assert all(inspect.iscoroutinefunction(endpoint) for endpoint in endpoints.values())
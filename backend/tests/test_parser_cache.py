@@ -0,0 +1,76 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+import parser
+
+TEXT = "Ravi needs to run 8km tomorrow at 6am"
+
+
+class _Clock(datetime):
+    current = datetime(2026, 3, 9, 23, 59)
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(parser, "_RESULT_CACHE", parser._ResultCache(8))
+    monkeypatch.setattr(parser, "nlp", None)
+    monkeypatch.setattr(parser, "datetime", _Clock)
+    monkeypatch.setattr(_Clock, "current", datetime(2026, 3, 9, 23, 59))
+    return parser._RESULT_CACHE
+
+
+def _date(result: dict) -> str:
+    attributes = result["assignments"][0]["attributes"]
+    return next(a["value"] for a in attributes if a["key"] == "Date")
+
+
+def test_repeat_is_served_from_cache_with_the_callers_text(cache):
+    first = parser.parse_workout_text(TEXT)
+    second = parser.parse_workout_text("  Ravi needs to run 8km\ntomorrow at 6am ")
+    assert second["assignments"] == first["assignments"]
+    assert second["original_text"] == "  Ravi needs to run 8km\ntomorrow at 6am "
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_relative_dates_are_not_served_stale_after_midnight(cache):
+    assert _date(parser.parse_workout_text(TEXT)) == "Tuesday, March 10, 2026"
+    _Clock.current = datetime(2026, 3, 10, 0, 1)
+    assert _date(parser.parse_workout_text(TEXT)) == "Wednesday, March 11, 2026"
+    assert cache.hits == 0 and cache.evictions == 1  # yesterday's entry was dropped
+
+
+def test_size_zero_disables_the_cache(cache):
+    parser.parse_workout_text(TEXT)
+    parser.configure_result_cache(0)
+    parser.parse_workout_text(TEXT)
+    parser.parse_workout_text(TEXT)
+    stats = cache.stats()
+    assert not stats["enabled"] and stats["size"] == 0 and stats["hits"] == 0
+
+
+def test_evictions_are_counted(cache):
+    cache.resize(2)
+    for distance in (5, 6, 7):
+        parser.parse_workout_text(f"Ravi needs to run {distance}km tomorrow")
+    assert cache.stats()["size"] == 2 and cache.evictions == 1
+    parser.parse_workout_text("Ravi needs to run 5km tomorrow")  # the evicted one
+    assert cache.hits == 0
+
+
+def test_key_changes_when_the_model_goes_live(cache, monkeypatch):
+    parser.parse_workout_text(TEXT)
+    monkeypatch.setattr(parser, "nlp", lambda text: SimpleNamespace(ents=()))
+    parser.parse_workout_text(TEXT)
+    parser.parse_workout_text(TEXT)
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_negative_size_is_rejected():
+    with pytest.raises(ValueError):
+        parser.configure_result_cache(-1)
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from conftest import run
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_computation():
+    async def scenario():
+        flights, calls = SingleFlight(), []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "parsed"
+
+        results = await asyncio.gather(*(flights.do("key", compute) for _ in range(5)))
+        return flights, calls, results
+
+    flights, calls, results = run(scenario())
+    assert results == ["parsed"] * 5 and len(calls) == 1
+    assert flights.stats() == {"in_flight": 0, "computed": 1, "coalesced": 4}
+
+
+def test_error_reaches_every_waiter_and_is_not_cached():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.05)
+            raise ValueError("upstream down")
+
+        results = await asyncio.gather(*(flights.do("key", fail) for _ in range(3)), return_exceptions=True)
+
+        async def succeed():
+            return "ok"
+
+        return flights, results, await flights.do("key", succeed)
+
+    flights, results, retried = run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert retried == "ok" and flights.computed == 2
+
+
+def test_waiter_takes_over_when_the_leader_is_cancelled():
+    async def scenario():
+        flights, calls = SingleFlight(), []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return len(calls)
+
+        leader = asyncio.create_task(flights.do("key", compute))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(flights.do("key", compute))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return flights, await waiter
+
+    flights, result = run(scenario())
+    assert result == 2  # the waiter ran compute itself
+    assert flights.computed == 2 and flights.coalesced == 0
+
+
+def test_cancelled_waiter_leaves_the_leader_running():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def compute():
+            await asyncio.sleep(0.1)
+            return "parsed"
+
+        leader = asyncio.create_task(flights.do("key", compute))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(flights.do("key", compute))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await leader
+
+    assert run(scenario()) == "parsed"
@@ -0,0 +1,52 @@
+import threading
+
+from conftest import run
+from transcript_cache import TranscriptCache
+
+KEY = ("0" * 64, "whisper", "en")
+
+
+def test_disk_tier_survives_restart_and_runs_off_the_loop(tmp_path, monkeypatch):
+    run(TranscriptCache(disk_dir=str(tmp_path)).put(KEY, "easy 5k"))
+
+    cache = TranscriptCache(disk_dir=str(tmp_path))
+    threads = []
+    disk_get = cache._disk_get
+
+    def recording_disk_get(key):
+        threads.append(threading.current_thread())
+        return disk_get(key)
+
+    monkeypatch.setattr(cache, "_disk_get", recording_disk_get)
+
+    async def lookups():
+        return [await cache.get(KEY), await cache.get(KEY), await cache.get(("1" * 64, "whisper", "en"))]
+
+    assert run(lookups()) == ["easy 5k", "easy 5k", None]
+    assert len(threads) == 2 and threading.main_thread() not in threads  # the memory hit skipped disk
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = TranscriptCache(max_entries=0, disk_dir=str(tmp_path), max_disk_entries=2)
+
+    async def fill():
+        for i in range(3):
+            await cache.put((str(i), "whisper", "en"), f"note {i}")
+        return [await cache.get((str(i), "whisper", "en")) for i in range(3)]
+
+    assert run(fill()) == [None, "note 1", "note 2"]
+    assert len(list(tmp_path.glob("*.json"))) == 2
+    assert cache.stats()["evictions"] == 1
+
+
+def test_empty_transcripts_are_not_cached(tmp_path):
+    cache = TranscriptCache(disk_dir=str(tmp_path))
+
+    async def put_and_get():
+        await cache.put(KEY, "  ")
+        return await cache.get(KEY)
+
+    assert run(put_and_get()) is None
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,165 @@
+import asyncio
+import io
+import time
+
+import httpx
+import pytest
+from fastapi import UploadFile
+
+from admission import AdmissionController
+from conftest import run
+from stub_transcriber import STUB_TEXT
+from transcription import (
+    CircuitBreaker, GroqTranscriber, TranscriptionError, make_client, transcribe_chunks,
+)
+
+
+def _upload() -> UploadFile:
+    data = b"not really audio"
+    return UploadFile(io.BytesIO(data), size=len(data), filename="note.webm")
+
+
+async def _transcribe(stub, calls: int = 1, breaker: CircuitBreaker | None = None, **kwargs):
+    """Results (text or TranscriptionError) of `calls` sequential requests."""
+    kwargs.setdefault("retries", 2)
+    kwargs.setdefault("backoff", 0.0)
+    results = []
+    async with make_client(timeout=kwargs.pop("timeout", 5.0)) as client:
+        backend = GroqTranscriber(client, url=stub.url, api_key="", model="whisper",
+                                  breaker=breaker, **kwargs)
+        for _ in range(calls):
+            try:
+                results.append(await backend.transcribe(_upload()))
+            except TranscriptionError as e:
+                results.append(e)
+        assert not client.is_closed  # shared; transcribe() never closes it
+    return backend, results
+
+
+def test_success(stub):
+    backend, [text] = run(_transcribe(stub))
+    assert text == STUB_TEXT
+    assert stub.stats["requests"] == 1
+    assert backend.retried == 0
+
+
+@pytest.mark.parametrize("status", [503, 429])
+def test_retries_then_gives_up(stub, status):
+    stub.control.update(fail_rate=1.0, fail_status=status)
+    backend, [error] = run(_transcribe(stub))
+    assert isinstance(error, TranscriptionError) and error.status_code == status
+    assert stub.stats["requests"] == 3
+    assert backend.retried == 2 and backend.failed == 1
+
+
+def test_429_does_not_trip_breaker(stub):
+    stub.control.update(fail_rate=1.0, fail_status=429)
+    backend, _ = run(_transcribe(stub, calls=3, breaker=CircuitBreaker(failure_threshold=1)))
+    assert backend.breaker.state == "closed"
+    assert stub.stats["requests"] == 9
+
+
+def test_client_error_is_not_retried(stub):
+    stub.control.update(fail_rate=1.0, fail_status=400)
+    backend, [error] = run(_transcribe(stub))
+    assert error.status_code == 400
+    assert stub.stats["requests"] == 1
+    assert backend.breaker.state == "closed"
+
+
+def test_timeout_is_retried(stub):
+    stub.control.update(hang=True)
+    backend, [error] = run(_transcribe(stub, retries=1, timeout=0.2))
+    assert error.status_code == 504
+    assert backend.retried == 1
+    assert backend.breaker.failures == 1
+
+
+def test_breaker_opens_and_fails_fast(stub):
+    stub.control.update(fail_rate=1.0)
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    backend, results = run(_transcribe(stub, calls=4, breaker=breaker, retries=0))
+    assert [e.status_code for e in results] == [503, 503, 503, 503]
+    assert stub.stats["requests"] == 2  # the last two never reached the stub
+    assert breaker.state == "open" and breaker.rejected == 2
+    assert results[-1].retry_after >= 1
+
+
+def test_breaker_half_open_trial_closes_or_reopens(stub):
+    stub.control.update(fail_rate=1.0)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+    run(_transcribe(stub, breaker=breaker, retries=0))
+    assert breaker.state == "open"
+
+    # Trial call after the reset timeout fails: open again
+    time.sleep(0.15)
+    run(_transcribe(stub, breaker=breaker, retries=0))
+    assert breaker.state == "open" and breaker.times_opened == 2
+
+    # Trial call succeeds: closed
+    stub.control.update(fail_rate=0.0)
+    time.sleep(0.15)
+    _, [text] = run(_transcribe(stub, breaker=breaker, retries=0))
+    assert text == STUB_TEXT
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_lifespan_shares_and_closes_one_client(stub, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import main
+
+    monkeypatch.setattr(main, "GROQ_API_URL", stub.url)
+    monkeypatch.setattr(main, "GROQ_API_KEY", "test")
+    with TestClient(main.app) as client:
+        shared = main._http_client
+        assert main._transcriber.client is shared
+        for i in range(2):
+            response = client.post("/transcribe", files={"file": ("a.webm", f"note {i}".encode())})
+            assert response.status_code == 200, response.text
+        assert main._http_client is shared and not shared.is_closed
+    assert shared.is_closed
+
+
+
+def test_pool_exhaustion_is_local_saturation_not_an_upstream_failure(stub):
+    stub.control.update(latency_ms=300)
+
+    async def scenario():
+        client = httpx.AsyncClient(timeout=httpx.Timeout(5.0, pool=0.05),
+                                   limits=httpx.Limits(max_connections=1))
+        async with client:
+            backend = GroqTranscriber(client, url=stub.url, api_key="", model="whisper",
+                                      breaker=CircuitBreaker(failure_threshold=1), backoff=0.0)
+            results = await asyncio.gather(backend.transcribe(_upload()), backend.transcribe(_upload()),
+                                           return_exceptions=True)
+            return backend, results
+
+    backend, results = run(scenario())
+    errors = [r for r in results if isinstance(r, TranscriptionError)]
+    assert STUB_TEXT in results and [e.status_code for e in errors] == [503]
+    assert backend.breaker.state == "closed" and backend.retried == 0
+    assert stub.stats["requests"] == 1
+
+
+def test_each_upstream_call_holds_its_own_admission_slot(stub):
+    stub.control.update(latency_ms=100)
+    admission = AdmissionController(max_in_flight=8)
+    peak = 0
+
+    async def watch():
+        nonlocal peak
+        while True:
+            peak = max(peak, admission.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        async with make_client() as client:
+            backend = GroqTranscriber(client, url=stub.url, api_key="", model="whisper",
+                                      slot=admission.slot)
+            watcher = asyncio.create_task(watch())
+            await transcribe_chunks(backend, [b"a", b"b", b"c", b"d", b"e"], concurrency=3)
+            watcher.cancel()
+
+    run(scenario())
+    assert peak == 3 and admission.admitted == 5 and admission.in_flight == 0
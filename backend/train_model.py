@@ -303,6 +303,30 @@ def process_gap_json(json_path):
     return training_data
 
 
+def process_parse_log(db_path, since=None, athlete=None, activity=None, limit=None):
+    """
+    Pull logged API parses from the SQLite parse log (see training_log.py)
+    and auto-label them like the gap dataset. Filters go through the log's
+    indexes, so only the selected rows are read.
+    """
+    from training_log import SqliteTrainingSink
+
+    log = SqliteTrainingSink(db_path)
+    try:
+        rows = log.query(since=since, athlete=athlete, activity=activity, limit=limit)
+    finally:
+        log.close()
+
+    training_data = []
+    for row in rows:
+        text = row["transcription"].strip()
+        entities = _auto_label_text(text)
+        if entities:
+            training_data.append((text, entities))
+
+    return training_data
+
+
 def train_spacy_model(data):
     db = DocBin()
     
@@ -354,6 +378,15 @@ if __name__ == "__main__":
     else:
         print("Warning: Gap-filling dataset not found, skipping.")
 
+    # ── Source 3: Parses logged by the API ──
+    parse_log_db = os.environ.get("TRAINING_LOG_DB", "parse_log.db")
+    if os.path.exists(parse_log_db):
+        since = os.environ.get("PARSE_LOG_SINCE")
+        print(f"Processing parse log: {parse_log_db}" + (f" since {since}" if since else "") + "...")
+        log_data = process_parse_log(parse_log_db, since=since)
+        print(f"  → {len(log_data)} examples from parse log")
+        all_data.extend(log_data)
+
     print(f"\nTotal combined training examples: {len(all_data)}")
 
     if not all_data:
@@ -0,0 +1,309 @@
+import csv
+import glob
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+from sqlalchemy import (
+    Column, ForeignKey, Integer, MetaData, String, Table, Text, create_engine, event,
+    insert, select,
+)
+
+# Parse results are collected as training data off the request path: handlers
+# only enqueue, and a background thread writes batches to a sink.
+
+
+# ── Sinks ──────────────────────────────────────────────────────────────────────
+
+class TrainingSink(ABC):
+    """Where logged records end up. write() gets a batch of records, each
+    {"timestamp": str, "transcription": str, "parsed": dict}."""
+
+    @abstractmethod
+    def write(self, records: list[dict]):
+        ...
+
+    def close(self):
+        pass
+
+
+class CsvTrainingSink(TrainingSink):
+    """Appends to a CSV file (timestamp, transcription, parsed_json).
+
+    Once the file reaches `max_bytes` it is gzipped to
+    <name>.<timestamp>.csv.gz and a fresh file is started; only the newest
+    `backups` archives are kept.
+    """
+
+    HEADER = ["timestamp", "transcription", "parsed_json"]
+
+    def __init__(self, path: str = "training_data.csv", max_bytes: int = 50 * 1024 * 1024,
+                 backups: int = 5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._file = None
+        self._writer = None
+
+    def _open(self):
+        self._file = open(self.path, mode="a", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        if self._file.tell() == 0:
+            self._writer.writerow(self.HEADER)
+
+    def _rotate(self):
+        self.close()
+        stem, ext = os.path.splitext(self.path)
+        archive = f"{stem}.{datetime.now():%Y%m%d-%H%M%S-%f}{ext}.gz"
+        with open(self.path, "rb") as src, gzip.open(archive, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(self.path)
+
+        archives = sorted(glob.glob(f"{glob.escape(stem)}.*{ext}.gz"))
+        for old in archives[:-self.backups] if self.backups else archives:
+            os.remove(old)
+
+    def write(self, records: list[dict]):
+        if self._file is None:
+            self._open()
+        for record in records:
+            self._writer.writerow([
+                record["timestamp"],
+                record["transcription"],
+                json.dumps(record["parsed"], ensure_ascii=False),
+            ])
+        self._file.flush()
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+
+# One row per logged parse, plus one per assignment so multi-athlete and
+# multi-activity messages can be filtered on any of their athletes/activities
+_metadata = MetaData()
+
+parse_log = Table(
+    "parse_log", _metadata,
+    Column("id", Integer, primary_key=True),
+    Column("timestamp", String(32), nullable=False, index=True),  # ISO 8601
+    Column("transcription", Text, nullable=False),
+    Column("confidence", String(16)),
+    Column("parsed_json", Text, nullable=False),
+)
+
+parse_log_assignments = Table(
+    "parse_log_assignments", _metadata,
+    Column("id", Integer, primary_key=True),
+    Column("log_id", Integer, ForeignKey("parse_log.id"), nullable=False, index=True),
+    Column("athlete", String(128), index=True),
+    Column("activity", String(64), index=True),
+)
+
+
+def _set_sqlite_pragmas(dbapi_conn, _record):
+    # WAL lets readers (train_model.py, queries) run while the logger writes
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+def _attribute(assignment: dict, key: str) -> str | None:
+    for attr in assignment.get("attributes", []):
+        if attr["key"] == key:
+            return attr["value"]
+    return None
+
+
+class SqliteTrainingSink(TrainingSink):
+    """Stores records in a SQLite database (WAL mode), one transaction per batch."""
+
+    def __init__(self, path: str = "parse_log.db"):
+        self.path = path
+        self.engine = create_engine(f"sqlite:///{path}")
+        event.listen(self.engine, "connect", _set_sqlite_pragmas)
+        _metadata.create_all(self.engine)
+
+    def write(self, records: list[dict]):
+        rows = [{
+            "timestamp": record["timestamp"],
+            "transcription": record["transcription"],
+            "confidence": record["parsed"].get("confidence"),
+            "parsed_json": json.dumps(record["parsed"], ensure_ascii=False),
+        } for record in records]
+
+        with self.engine.begin() as conn:
+            ids = conn.execute(
+                insert(parse_log).returning(parse_log.c.id, sort_by_parameter_order=True),
+                rows,
+            ).scalars().all()
+            assignments = [
+                {
+                    "log_id": log_id,
+                    "athlete": _attribute(assignment, "Name"),
+                    "activity": _attribute(assignment, "Activity"),
+                }
+                for log_id, record in zip(ids, records)
+                for assignment in record["parsed"].get("assignments", [])
+            ]
+            if assignments:
+                conn.execute(insert(parse_log_assignments), assignments)
+
+    def query(self, since: str | None = None, until: str | None = None,
+              athlete: str | None = None, activity: str | None = None,
+              limit: int | None = 100) -> list[dict]:
+        """Logged parses, newest first, filtered through the indexed columns.
+
+        `since`/`until` are ISO timestamps (inclusive/exclusive); `athlete`
+        and `activity` must match the same assignment.
+        """
+        stmt = select(
+            parse_log.c.id, parse_log.c.timestamp, parse_log.c.transcription,
+            parse_log.c.confidence, parse_log.c.parsed_json,
+        )
+        if since is not None:
+            stmt = stmt.where(parse_log.c.timestamp >= since)
+        if until is not None:
+            stmt = stmt.where(parse_log.c.timestamp < until)
+        if athlete is not None or activity is not None:
+            matching = select(parse_log_assignments.c.log_id)
+            if athlete is not None:
+                matching = matching.where(parse_log_assignments.c.athlete == athlete)
+            if activity is not None:
+                matching = matching.where(parse_log_assignments.c.activity == activity)
+            stmt = stmt.where(parse_log.c.id.in_(matching))
+        stmt = stmt.order_by(parse_log.c.timestamp.desc(), parse_log.c.id.desc())
+        if limit is not None:
+            stmt = stmt.limit(limit)
+
+        with self.engine.connect() as conn:
+            return [
+                {
+                    "id": row.id,
+                    "timestamp": row.timestamp,
+                    "transcription": row.transcription,
+                    "confidence": row.confidence,
+                    "parsed": json.loads(row.parsed_json),
+                }
+                for row in conn.execute(stmt)
+            ]
+
+    def close(self):
+        self.engine.dispose()
+
+
+# ── Logger ─────────────────────────────────────────────────────────────────────
+
+class TrainingLogger:
+    """Bounded queue + background writer thread in front of a TrainingSink.
+
+    log() never blocks: when the queue is full the record is dropped and
+    counted. The writer flushes once `batch_size` records are waiting or
+    `flush_interval` seconds after the first one arrived, and stop() drains
+    whatever is still queued.
+    """
+
+    def __init__(self, sink: TrainingSink, max_queue: int = 10000, batch_size: int = 200,
+                 flush_interval: float = 2.0):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self.logged = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.errors = 0
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="training-log", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Flush everything queued, then close the sink."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout)
+            self._thread = None
+        self.sink.close()
+
+    def log(self, results: list[dict]):
+        """Queue the successful parses in `results`; only the caller's
+        enqueue happens on the request path."""
+        timestamp = datetime.now().isoformat()
+        for result in results:
+            if not result.get("original_text") or result.get("error"):
+                continue
+            try:
+                self._queue.put_nowait({
+                    "timestamp": timestamp,
+                    "transcription": result["original_text"],
+                    "parsed": result,
+                })
+            except queue.Full:
+                self.dropped += 1
+
+    def _next_batch(self) -> list[dict]:
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self) -> list[dict]:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: list[dict]):
+        try:
+            self.sink.write(batch)
+            self.logged += len(batch)
+            self.flushes += 1
+        except Exception as e:
+            self.errors += 1
+            print(f"Training log write failed, {len(batch)} record(s) lost: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._flush(batch)
+        while batch := self._drain():
+            self._flush(batch)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "logged": self.logged,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "errors": self.errors,
+        }
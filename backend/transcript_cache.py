@@ -0,0 +1,172 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import UploadFile
+
+# Transcripts keyed by (sha256 of the audio bytes, model, language), so a
+# re-uploaded recording is answered without another Whisper call. The memory
+# tier is an LRU; the optional disk tier keeps one small JSON file per entry
+# and survives restarts. Both expire entries after `ttl` seconds.
+
+_HASH_CHUNK = 1024 * 1024
+
+
+def _hash_file(f) -> str:
+    f.seek(0)
+    digest = hashlib.sha256()
+    while chunk := f.read(_HASH_CHUNK):
+        digest.update(chunk)
+    f.seek(0)
+    return digest.hexdigest()
+
+
+async def hash_upload(upload: UploadFile) -> str:
+    """sha256 of the spooled upload, read in chunks off the event loop."""
+    return await asyncio.to_thread(_hash_file, upload.file)
+
+
+class TranscriptCache:
+    """Two-tier (memory, optional disk) LRU of transcripts with a TTL.
+
+    get() and put() are coroutines: the memory tier is used inline, the disk
+    tier's file I/O runs on a worker thread so a slow disk cannot stall the
+    event loop.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 7 * 24 * 3600,
+                 disk_dir: str | None = None, max_disk_entries: int = 10000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self._memory: OrderedDict[tuple, tuple[str, float]] = OrderedDict()
+        self._disk: OrderedDict[str, float] = OrderedDict()  # file name -> last use
+        self._lock = threading.Lock()  # memory tier and counters; never held during I/O
+        self._disk_lock = threading.Lock()  # disk index; only taken on worker threads
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            entries = sorted(
+                (e.stat().st_mtime, e.name) for e in os.scandir(disk_dir) if e.name.endswith(".json")
+            )
+            for mtime, name in entries:
+                self._disk[name] = mtime
+
+    @staticmethod
+    def _file_name(key: tuple) -> str:
+        return hashlib.sha256("\0".join(key).encode()).hexdigest() + ".json"
+
+    def _expired(self, created: float) -> bool:
+        return bool(self.ttl) and time.time() - created > self.ttl
+
+    def _memory_get(self, key: tuple) -> str | None:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[1]):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self._memory[key]
+            return None
+
+    async def get(self, key: tuple) -> str | None:
+        text = self._memory_get(key)
+        if text is not None:
+            return text
+        entry = await asyncio.to_thread(self._disk_get, key) if self.disk_dir else None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._memory_put(key, *entry)
+        return entry[0]
+
+    async def put(self, key: tuple, text: str):
+        if not text.strip():
+            return  # an empty transcript is more likely a bad upload than silence
+        created = time.time()
+        with self._lock:
+            self._memory_put(key, text, created)
+        if self.disk_dir:
+            await asyncio.to_thread(self._disk_put, key, text, created)
+
+    def _memory_put(self, key: tuple, text: str, created: float):
+        if not self.max_entries:
+            return
+        self._memory[key] = (text, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_get(self, key: tuple) -> tuple[str, float] | None:
+        name = self._file_name(key)
+        with self._disk_lock:
+            if name not in self._disk:
+                return None
+            path = os.path.join(self.disk_dir, name)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                self._disk.pop(name, None)
+                return None
+            if self._expired(entry["created"]):
+                self._disk_remove(name)
+                return None
+            now = time.time()
+            os.utime(path, (now, now))
+            self._disk[name] = now
+            self._disk.move_to_end(name)
+            return entry["text"], entry["created"]
+
+    def _disk_put(self, key: tuple, text: str, created: float):
+        name = self._file_name(key)
+        path = os.path.join(self.disk_dir, name)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"text": text, "created": created, "model": key[1], "language": key[2]}, f)
+        os.replace(tmp, path)
+        with self._disk_lock:
+            self._disk[name] = created
+            self._disk.move_to_end(name)
+            evicted = 0
+            while len(self._disk) > self.max_disk_entries:
+                self._disk_remove(next(iter(self._disk)))
+                evicted += 1
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+
+    def _disk_remove(self, name: str):
+        self._disk.pop(name, None)
+        try:
+            os.remove(os.path.join(self.disk_dir, name))
+        except OSError:
+            pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                "memory_entries": len(self._memory),
+                "disk_entries": len(self._disk),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "memory_hit_ratio": self.memory_hits / lookups if lookups else 0.0,
+            }
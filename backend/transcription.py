@@ -0,0 +1,512 @@
+import asyncio
+import io
+import os
+import random
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import nullcontext
+
+import httpx
+from fastapi import UploadFile
+
+from metrics import Histogram
+
+# Audio goes to the transcription API straight from Starlette's spooled
+# upload buffer (memory up to 1 MB, then its own temp file): httpx reads the
+# file object in chunks while sending, so there is no copy to a temp file of
+# ours and no second in-memory buffer.
+
+
+class TranscriptionError(Exception):
+    """Transcription failed; status_code is what the API should answer with."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float | None = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class _SpoolReader:
+    """read/seek/tell view of a spooled upload.
+
+    httpx sizes file parts through fileno() when it exists, and calling
+    fileno() on an in-memory SpooledTemporaryFile rolls it over to disk.
+    Without fileno() httpx falls back to seek/tell.
+    """
+
+    def __init__(self, f):
+        self._f = f
+
+    def read(self, size: int = -1) -> bytes:
+        return self._f.read(size)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self._f.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._f.tell()
+
+
+def upload_size(upload: UploadFile) -> int:
+    """Size of the spooled upload in bytes, without reading it."""
+    if upload.size is not None:
+        return upload.size
+    f = upload.file
+    pos = f.tell()
+    size = f.seek(0, os.SEEK_END)
+    f.seek(pos)
+    return size
+
+
+def check_upload_size(upload: UploadFile, max_bytes: int) -> int:
+    size = upload_size(upload)
+    if max_bytes and size > max_bytes:
+        raise TranscriptionError(413, f"Audio file too large ({size} bytes, max {max_bytes})")
+    return size
+
+
+def _retry_after_seconds(response: httpx.Response) -> float | None:
+    try:
+        return float(response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None  # absent, or an HTTP date
+
+
+async def transcribe_upload(client: httpx.AsyncClient, upload: UploadFile, *, url: str,
+                            api_key: str, model: str, language: str = "en") -> str:
+    """Send the upload to a Whisper-compatible endpoint and return the text."""
+    upload.file.seek(0)
+    response = await client.post(
+        url,
+        headers={"Authorization": f"Bearer {api_key}"} if api_key else None,
+        files={
+            "file": (
+                upload.filename or "audio.wav",
+                _SpoolReader(upload.file),
+                upload.content_type or "audio/wav",
+            ),
+        },
+        data={
+            "model": model,
+            "language": language,
+        },
+    )
+
+    if response.status_code != 200:
+        raise TranscriptionError(
+            response.status_code, f"Groq API error: {response.text}",
+            retry_after=_retry_after_seconds(response),
+        )
+
+    return response.json().get("text", "").strip()
+
+
+# ── Backends ───────────────────────────────────────────────────────────────────
+
+class TranscriptionBackend(ABC):
+    """Turns an audio upload into text. transcribe() raises
+    TranscriptionError carrying the status the API should answer with."""
+
+    name = "backend"
+
+    @abstractmethod
+    async def transcribe(self, upload: UploadFile) -> str:
+        ...
+
+    def stats(self) -> dict:
+        return {}
+
+
+UPSTREAM_SECONDS = Histogram(
+    "transcription_upstream_seconds",
+    "Upstream transcription API call latency per attempt, by backend and HTTP status "
+    "(timeout / network_error when there was no answer)",
+    ("backend", "status"),
+)
+
+
+# ── Pooled Client ──────────────────────────────────────────────────────────────
+
+def make_client(max_connections: int = 20, max_keepalive: int = 10,
+                keepalive_expiry: float = 30.0, timeout: float = 60.0) -> httpx.AsyncClient:
+    """One long-lived client per app, so TCP/TLS connections are reused."""
+    return httpx.AsyncClient(
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        ),
+    )
+
+
+class CircuitBreaker:
+    """Fails fast once the upstream keeps failing.
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    calls are refused for `reset_timeout` seconds; then one trial call is let
+    through (half-open) and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+
+    def before_call(self):
+        if self.state == "closed":
+            return
+        remaining = self.opened_at + self.reset_timeout - time.monotonic()
+        if remaining <= 0:
+            # Let one trial call through; if it never reports back (cancelled),
+            # another is allowed after a further reset_timeout
+            self.state = "half-open"
+            self.opened_at = time.monotonic()
+            return
+        self.rejected += 1
+        raise TranscriptionError(
+            503, "Transcription service unavailable, failing fast",
+            retry_after=max(remaining, 1.0),
+        )
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half-open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+class GroqTranscriber(TranscriptionBackend):
+    """transcribe_upload() over a shared client, with retries and a breaker.
+    Works against any Whisper-compatible endpoint, not only Groq's.
+
+    5xx answers, timeouts and network errors are retried up to `retries`
+    times with full-jitter exponential backoff and count as breaker failures.
+    429 is retried too, waiting at least its Retry-After (up to backoff_max),
+    but does not trip the breaker; other 4xx answers are returned to the
+    caller as they are. Waiting too long for a connection from the client's
+    own pool is local saturation: 503 straight away, breaker untouched.
+
+    With `slot` (e.g. AdmissionController.slot) each call, retries
+    included, holds one slot from it, so admission counts upstream calls
+    rather than recordings, however many chunks or hedges one recording
+    fans out to.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, *, url: str, api_key: str, model: str,
+                 language: str = "en", retries: int = 2, backoff: float = 0.5,
+                 backoff_max: float = 4.0, breaker: CircuitBreaker | None = None,
+                 name: str = "groq", slot=None):
+        self.name = name
+        self.slot = slot
+        self.client = client
+        self.url = url
+        self.api_key = api_key
+        self.model = model
+        self.language = language
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.requests = 0
+        self.retried = 0
+        self.failed = 0
+
+    def _delay(self, attempt: int, retry_after: float | None = None) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+        if retry_after:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    async def transcribe(self, upload: UploadFile) -> str:
+        self.breaker.before_call()
+        async with self.slot() if self.slot is not None else nullcontext():
+            return await self._transcribe(upload)
+
+    async def _transcribe(self, upload: UploadFile) -> str:
+        self.requests += 1
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retried += 1
+                await asyncio.sleep(self._delay(attempt - 1, error.retry_after))
+            start = time.perf_counter()
+            status = "error"
+            try:
+                text = await transcribe_upload(
+                    self.client, upload,
+                    url=self.url, api_key=self.api_key, model=self.model, language=self.language,
+                )
+            except TranscriptionError as e:
+                status = str(e.status_code)
+                if e.status_code < 500 and e.status_code != 429:
+                    self.breaker.record_success()  # upstream is up, the request was bad
+                    raise
+                error = e
+            except httpx.PoolTimeout:
+                status = "pool_timeout"
+                self.failed += 1
+                raise TranscriptionError(
+                    503, "Too many transcriptions in progress", retry_after=1.0
+                ) from None
+            except httpx.TimeoutException:
+                status = "timeout"
+                error = TranscriptionError(504, "Transcription timed out")
+            except (httpx.NetworkError, httpx.RemoteProtocolError) as e:
+                status = "network_error"
+                error = TranscriptionError(502, f"Transcription service unreachable: {e}")
+            except asyncio.CancelledError:
+                status = "cancelled"  # e.g. the losing side of a hedge
+                raise
+            else:
+                status = "200"
+                self.breaker.record_success()
+                return text
+            finally:
+                UPSTREAM_SECONDS.observe(time.perf_counter() - start, (self.name, status))
+
+        self.failed += 1
+        if error.status_code == 429:
+            self.breaker.record_success()  # throttled, not down
+        else:
+            self.breaker.record_failure()
+        raise error
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "requests": self.requests,
+            "retried": self.retried,
+            "failed": self.failed,
+            "breaker": self.breaker.stats(),
+        }
+
+
+# ── Chunked Transcription ──────────────────────────────────────────────────────
+
+_WORD = re.compile(r"[\w']+")
+
+
+def _words(text: str) -> list[str]:
+    return [w.lower() for w in _WORD.findall(text)]
+
+
+def stitch_transcripts(texts: list[str], max_overlap_words: int = 6) -> str:
+    """Join chunk transcripts, dropping words the overlap made both chunks
+    hear: the longest run (2..max_overlap_words words) that ends one chunk
+    and starts the next is kept only once."""
+    stitched = ""
+    for text in texts:
+        text = text.strip()
+        if not text:
+            continue
+        if stitched:
+            tail, head = _words(stitched), _words(text)
+            for n in range(min(max_overlap_words, len(tail), len(head)), 1, -1):
+                if tail[-n:] == head[:n]:
+                    # Drop the first n words of `text`, keeping its original casing
+                    cut = list(_WORD.finditer(text))[n - 1].end()
+                    text = text[cut:].lstrip(" ,.;:")
+                    break
+            stitched = f"{stitched} {text}" if text else stitched
+        else:
+            stitched = text
+    return stitched
+
+
+async def transcribe_chunks(transcriber: TranscriptionBackend, chunks: list[bytes], *,
+                            filename: str = "chunk.wav", concurrency: int = 4,
+                            overlap_seconds: float = 1.0) -> str:
+    """Transcribe WAV chunks concurrently (at most `concurrency` in flight)
+    and stitch the results in order. The first failure cancels the chunks
+    still running, so none outlives the caller's admission slot."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int, data: bytes) -> str:
+        upload = UploadFile(io.BytesIO(data), size=len(data), filename=f"{i}-{filename}")
+        async with semaphore:
+            return await transcriber.transcribe(upload)
+
+    tasks = [asyncio.create_task(one(i, data)) for i, data in enumerate(chunks)]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Wait for the cancellations to land before the slot is given back
+        await asyncio.gather(*tasks, return_exceptions=True)
+    texts = [task.result() for task in tasks]  # raises the first failed chunk's error
+    # ~3 spoken words per second, plus slack for a word cut at each edge
+    return stitch_transcripts(texts, max_overlap_words=max(3, int(overlap_seconds * 3) + 2))
+
+
+# ── Hedging ────────────────────────────────────────────────────────────────────
+
+def _copy_upload(upload: UploadFile) -> UploadFile:
+    """In-memory copy of an upload that another request may be streaming.
+
+    Runs without awaiting, so the other request's read position is restored
+    before it reads again.
+    """
+    f = upload.file
+    pos = f.tell()
+    f.seek(0)
+    data = f.read()
+    f.seek(pos)
+    return UploadFile(io.BytesIO(data), size=len(data), filename=upload.filename,
+                      headers=upload.headers)
+
+
+def _discard_result(task: asyncio.Task):
+    if not task.cancelled():
+        task.exception()  # a loser that failed before the cancel landed
+
+
+class HedgedTranscriber(TranscriptionBackend):
+    """Sends to `primary`; if it has not answered by the hedge deadline, sends
+    the same audio to `secondary` too, returns whichever answers first and
+    cancels the other.
+
+    The deadline is the `percentile` of recent primary latencies (clamped to
+    min_delay..max_delay; `initial_delay` until `min_samples` are seen), so
+    about (100 - percentile)% of requests are hedged. A primary 5xx before
+    the deadline fails over to the secondary straight away.
+
+    A cancelled primary's real latency is unknown, so for `measure_rate` of
+    secondary wins it is left to finish in the background instead; the time
+    saved on those is measured and extrapolated to the rest. Such a primary
+    reads its own copy of the audio (the caller may close the upload once
+    this returns) and keeps whatever admission slot its backend's call holds.
+    """
+
+    name = "hedged"
+
+    def __init__(self, primary: TranscriptionBackend, secondary: TranscriptionBackend, *,
+                 percentile: float = 95.0, min_delay: float = 0.5, max_delay: float = 10.0,
+                 initial_delay: float = 3.0, window: int = 200, min_samples: int = 20,
+                 measure_rate: float = 0.1):
+        self.primary = primary
+        self.secondary = secondary
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.measure_rate = measure_rate
+        self._latencies = deque(maxlen=window)  # primary, seconds
+        self.requests = 0
+        self.hedged = 0
+        self.secondary_wins = 0
+        self.failovers = 0
+        self.measured_wins = 0
+        self.measured_saved = 0.0
+
+    def deadline(self) -> float:
+        if len(self._latencies) < self.min_samples:
+            return self.initial_delay
+        ordered = sorted(self._latencies)
+        rank = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return min(self.max_delay, max(self.min_delay, ordered[rank]))
+
+    def _measure_loser(self, primary: asyncio.Task, start: float, won_at: float):
+        def done(task: asyncio.Task):
+            if task.cancelled() or task.exception() is not None:
+                return
+            finished = time.monotonic() - start
+            self._latencies.append(finished)
+            self.measured_wins += 1
+            self.measured_saved += finished - won_at
+
+        primary.add_done_callback(done)
+
+    async def transcribe(self, upload: UploadFile) -> str:
+        self.requests += 1
+        deadline = self.deadline()
+        start = time.monotonic()
+        # Decided up front: a primary that may outlive this call needs its own bytes
+        measure = self.measure_rate and random.random() < self.measure_rate
+        primary = asyncio.create_task(
+            self.primary.transcribe(_copy_upload(upload) if measure else upload)
+        )
+        secondary = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=deadline)
+            if done:
+                try:
+                    text = primary.result()
+                except TranscriptionError as e:
+                    if e.status_code < 500:
+                        raise
+                    self.failovers += 1
+                    return await self.secondary.transcribe(_copy_upload(upload))
+                self._latencies.append(time.monotonic() - start)
+                return text
+
+            self.hedged += 1
+            secondary = asyncio.create_task(self.secondary.transcribe(_copy_upload(upload)))
+            pending = {primary, secondary}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                        continue
+                    elapsed = time.monotonic() - start
+                    if task is secondary:
+                        self.secondary_wins += 1
+                        if primary in pending and measure:
+                            self._measure_loser(primary, start, elapsed)
+                            primary = None  # not cancelled below
+                        elif primary in pending:
+                            # What the primary had taken is a lower bound on
+                            # its latency, and keeps the window from forgetting the tail
+                            self._latencies.append(elapsed)
+                    else:
+                        self._latencies.append(elapsed)
+                    return task.result()
+            raise error
+        finally:
+            for task in (primary, secondary):
+                if task is not None and not task.done():
+                    task.cancel()
+                    task.add_done_callback(_discard_result)
+
+    def stats(self) -> dict:
+        saved_per_win = self.measured_saved / self.measured_wins if self.measured_wins else None
+        return {
+            "name": self.name,
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+            "secondary_wins": self.secondary_wins,
+            "failovers": self.failovers,
+            "deadline_ms": self.deadline() * 1000,
+            # Measured on the sampled wins whose primary was left to finish
+            "saved_ms_per_win": saved_per_win * 1000 if saved_per_win is not None else None,
+            "saved_ms_estimate": saved_per_win * self.secondary_wins * 1000 if saved_per_win is not None else None,
+            "saved_samples": self.measured_wins,
+            "primary": self.primary.stats(),
+            "secondary": self.secondary.stats(),
+        }
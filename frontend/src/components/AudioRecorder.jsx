@@ -53,17 +53,13 @@ const AudioRecorder = ({ onAnalysisComplete }) => {
         formData.append('file', audioBlob, 'recording.wav');
 
         try {
-            // 1. Transcribe
-            const transcribeResponse = await axios.post(`${API_BASE_URL}/transcribe`, formData, {
+            // Transcribe and parse in one round-trip
+            const response = await axios.post(`${API_BASE_URL}/transcribe-and-parse`, formData, {
                 headers: { 'Content-Type': 'multipart/form-data' }
             });
 
-            const text = transcribeResponse.data.text;
-            setTranscript(text);
-
-            // 2. Parse
-            const parseResponse = await axios.post(`${API_BASE_URL}/parse`, { text });
-            onAnalysisComplete(parseResponse.data);
+            setTranscript(response.data.text);
+            onAnalysisComplete(response.data.parsed);
 
         } catch (error) {
             console.error("Error processing audio:", error);